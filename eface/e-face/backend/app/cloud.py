@@ -7,9 +7,9 @@ from datetime import datetime, timezone
 from typing import Any, Dict
 
 import jwt
-import requests
 
-from .core import read_config
+from . import ha_http
+from .core import get_config_snapshot
 
 
 DEFAULT_CLOUD_SETTINGS = {
@@ -46,7 +46,7 @@ def _coerce_bool(value: Any) -> bool:
 
 
 def get_cloud_settings() -> Dict[str, Any]:
-    data = read_config()
+    data = get_config_snapshot()
     cloud = data.get("cloud") if isinstance(data.get("cloud"), dict) else {}
     merged: Dict[str, Any] = {**DEFAULT_CLOUD_SETTINGS, **(cloud or {})}
     merged["enabled"] = _coerce_bool(merged.get("enabled"))
@@ -79,7 +79,7 @@ def _call_introspection(settings: Dict[str, Any], token: str, instance_id: str |
     if client_secret:
         payload["client_secret"] = client_secret
     try:
-        resp = requests.post(url, json=payload, timeout=float(settings.get("timeout", 8)))
+        resp = ha_http.get_session(url).post(url, json=payload, timeout=float(settings.get("timeout", 8)))
         resp.raise_for_status()
     except Exception as exc:
         raise CloudAuthError(f"Cloud introspection request failed: {exc}") from exc
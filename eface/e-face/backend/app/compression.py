@@ -0,0 +1,219 @@
+"""Response compression negotiated from Accept-Encoding (zstd, br, gzip).
+
+Only complete bodies (plain Response/JSON, HLS playlists) are compressed;
+streaming responses (MJPEG, MPEG-TS segments) and media types that are
+already compressed go out untouched.  brotli and zstandard are optional;
+gzip is always available.  Large bodies are compressed off the event loop
+and the last results are kept, since many panels fetch the same payload.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger("e-face.compression")
+
+ENABLED = os.environ.get("EFACE_COMPRESSION", "1").lower() not in ("0", "false", "no", "off")
+MIN_SIZE = max(0, int(os.environ.get("EFACE_COMPRESSION_MIN_SIZE", "1024")))
+GZIP_LEVEL = min(9, max(1, int(os.environ.get("EFACE_GZIP_LEVEL", "5"))))
+BROTLI_QUALITY = min(11, max(0, int(os.environ.get("EFACE_BROTLI_QUALITY", "4"))))
+ZSTD_LEVEL = min(22, max(1, int(os.environ.get("EFACE_ZSTD_LEVEL", "3"))))
+# bodies above this size are compressed in a worker thread
+THREAD_MIN_SIZE = 64 * 1024
+CACHE_ENTRIES = max(0, int(os.environ.get("EFACE_COMPRESSION_CACHE", "32")))
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/vnd.apple.mpegurl',
+    'application/x-mpegurl',
+    'application/manifest+json',
+    'image/svg+xml',
+)
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def _zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+# server preference, best first
+_ENCODERS = {}
+if zstandard is not None:
+    _ENCODERS['zstd'] = _zstd
+if brotli is not None:
+    _ENCODERS['br'] = _brotli
+_ENCODERS['gzip'] = _gzip
+
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'compressed': 0, 'cache_hits': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def _accepted(accept_encoding: str) -> dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Best available encoding the client accepts, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in _ENCODERS:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.split(';', 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith('+json')
+
+
+def _compress_cached(encoding: str, body: bytes) -> bytes:
+    key = None
+    if CACHE_ENTRIES:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+                _stats['cache_hits'] += 1
+                return cached
+    compressed = _ENCODERS[encoding](body)
+    if key is not None:
+        with _cache_lock:
+            _cache[key] = compressed
+            while len(_cache) > CACHE_ENTRIES:
+                _cache.popitem(last=False)
+    return compressed
+
+
+async def compress(encoding: str, body: bytes) -> bytes:
+    if len(body) >= THREAD_MIN_SIZE:
+        return await anyio.to_thread.run_sync(_compress_cached, encoding, body)
+    return _compress_cached(encoding, body)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete, compressible HTTP responses."""
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('method') == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                if (
+                    message['status'] < 200
+                    or message['status'] in (204, 206, 304)
+                    or 'content-encoding' in headers
+                    or 'content-range' in headers
+                    or not is_compressible(headers.get('content-type'))
+                ):
+                    passthrough = True
+                    _stats['skipped'] += 1
+                    await send(message)
+                    return
+                # wait for the body before deciding
+                start_message = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < self.minimum_size:
+                # streaming responses stay as they are
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            compressed = await compress(encoding, body)
+            _stats['compressed'] += 1
+            _stats['bytes_in'] += len(body)
+            _stats['bytes_out'] += len(compressed)
+            headers = MutableHeaders(raw=start_message['headers'])
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(compressed))
+            headers.add_vary_header('Accept-Encoding')
+            etag = headers.get('etag')
+            if etag and not etag.startswith('W/'):
+                # the encoded body is a different representation
+                headers['ETag'] = 'W/' + etag
+            await send(start_message)
+            await send({'type': 'http.response.body', 'body': compressed, 'more_body': False})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def get_status() -> dict:
+    with _cache_lock:
+        cached = len(_cache)
+    return {
+        'enabled': ENABLED,
+        'encodings': list(_ENCODERS),
+        'min_size': MIN_SIZE,
+        'cache_entries': cached,
+        **_stats,
+    }
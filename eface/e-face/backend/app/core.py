@@ -3,17 +3,20 @@ import json
 import asyncio
 import re
 import copy
-import requests
 from collections import defaultdict
 from fastapi import Header, HTTPException
 from datetime import datetime, timedelta
 import jwt
 import logging
 from typing import List
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from urllib.parse import quote
 
 from .registry_cache import get_registry_snapshot, set_registry_snapshot
+from . import fast_json, ha_http, state_store, weather_cache
 
 API_TOKEN = os.environ.get("EFACE_API_TOKEN", "devtoken123")
 JWT_SECRET = os.environ.get("EFACE_JWT_SECRET", "dev_jwt_secret_change_me")
@@ -24,19 +27,233 @@ JWT_EXPIRES_MINUTES = int(os.environ.get("EFACE_JWT_EXP_MIN", "129600"))
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, "config_store.json")
 REGISTRY_CACHE_TTL = max(0, int(os.environ.get("EFACE_REGISTRY_TTL", "0")))
+# Config mutations made within this window (seconds) are coalesced into one file write.
+CONFIG_WRITE_DELAY = max(0.0, float(os.environ.get("EFACE_CONFIG_WRITE_DELAY", "0.5")))
+# Threads for the CPU-bound and legacy sync parts of HA requests (room builds,
+# snapshot refresh). Kept apart from Starlette's threadpool so slow HA calls
+# can never starve unrelated endpoints.
+HA_WORKERS = max(1, int(os.environ.get("EFACE_HA_WORKERS", "4")))
+# Seconds a built rooms payload is reused by identical requests (single-flight window).
+ROOMS_FRESHNESS = max(0.0, float(os.environ.get("EFACE_ROOMS_FRESHNESS", "1.0")))
 
+logger = logging.getLogger('e-face.core')
+_ha_executor = ThreadPoolExecutor(max_workers=HA_WORKERS, thread_name_prefix='e-face-ha')
 
-def read_config():
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "w") as f:
-            json.dump({"site_name": "e-face demo", "advanced": {}, "devices": [], "users": [], "admin": {"username": "admin", "password_hash": ""}}, f)
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking HA helper on the dedicated HA worker threads."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ha_executor, partial(fn, *args, **kwargs))
+
+
+class _FrozenDict(dict):
+    """Read-only dict used for shared config snapshots."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("config snapshot is read-only; use read_config() to modify")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+
+
+class _FrozenList(list):
+    """Read-only list used for shared config snapshots."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("config snapshot is read-only; use read_config() to modify")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return _FrozenList(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_thaw(item) for item in value]
+    return value
+
+
+# Parsed config_store.json shared by every request. Reloaded when os.stat
+# reports a different mtime/inode/size, so edits made by hand are still picked
+# up without a restart. Mutations are applied here first and written to disk
+# by a single writer thread; 'dirty' is set until the latest text is on disk.
+_config_lock = threading.Lock()
+_config_changed = threading.Condition(_config_lock)
+_config_flush_lock = threading.Lock()
+_config_cache = {'signature': None, 'text': None, 'snapshot': None, 'version': 0, 'dirty': False}
+_config_writer: threading.Thread | None = None
+
+
+def _config_file_signature():
+    try:
+        st = os.stat(CONFIG_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _atomic_write(path: str, text: str):
+    """Write text to path via a temp file, fsync and rename, so readers never see a torn file."""
+    directory = os.path.dirname(path) or '.'
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def _refresh_config_locked():
+    if _config_cache['dirty']:
+        # in-memory changes not flushed yet are newer than the file
+        return
+    signature = _config_file_signature()
+    if signature is not None and signature == _config_cache['signature']:
+        return
+    if signature is None:
+        _atomic_write(CONFIG_PATH, json.dumps({"site_name": "e-face demo", "advanced": {}, "devices": [], "users": [], "admin": {"username": "admin", "password_hash": ""}}))
+        signature = _config_file_signature()
+    # the signature is taken before reading, so a write racing with this read
+    # leaves a stale signature behind and the next call reloads again
     with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        if _config_cache['snapshot'] is None:
+            raise
+        logger.warning("config_store.json is not valid JSON; serving the last good snapshot")
+        return
+    _config_cache['signature'] = signature
+    _config_cache['text'] = text
+    _config_cache['snapshot'] = _freeze(data)
+    _config_cache['version'] += 1
+
+
+def get_config_snapshot():
+    """Return the shared, read-only config snapshot.
+
+    The snapshot is parsed once per config change and shared between callers;
+    mutating it raises TypeError. Use read_config() when the result is going
+    to be modified and written back.
+    """
+    with _config_lock:
+        _refresh_config_locked()
+        return _config_cache['snapshot']
+
+
+def get_config_version() -> int:
+    """Counter bumped whenever the config snapshot is reloaded or rewritten."""
+    with _config_lock:
+        _refresh_config_locked()
+        return _config_cache['version']
+
+
+def read_config():
+    """Return a private, mutable copy of the config."""
+    with _config_lock:
+        _refresh_config_locked()
+        text = _config_cache['text']
+    return json.loads(text)
+
+
+def _commit_config_locked(text: str):
+    global _config_writer
+    _config_cache['text'] = text
+    _config_cache['snapshot'] = _freeze(json.loads(text))
+    _config_cache['version'] += 1
+    _config_cache['dirty'] = True
+    if _config_writer is None or not _config_writer.is_alive():
+        _config_writer = threading.Thread(target=_config_writer_loop, name='e-face-config-writer', daemon=True)
+        _config_writer.start()
+    _config_changed.notify()
+
+
+def _config_writer_loop():
+    while True:
+        with _config_changed:
+            while not _config_cache['dirty']:
+                _config_changed.wait()
+        # let mutations arriving within the window land in the same write
+        time.sleep(CONFIG_WRITE_DELAY)
+        try:
+            flush_config()
+        except Exception:
+            logger.exception("Failed to write config_store.json; retrying")
+            time.sleep(max(CONFIG_WRITE_DELAY, 1.0))
+
+
+def flush_config():
+    """Write pending config changes to disk now (used on shutdown)."""
+    with _config_flush_lock:
+        with _config_lock:
+            if not _config_cache['dirty']:
+                return
+            text = _config_cache['text']
+        _atomic_write(CONFIG_PATH, text)
+        with _config_lock:
+            _config_cache['signature'] = _config_file_signature()
+            # a mutation committed during the write keeps the cache dirty
+            if _config_cache['text'] is text:
+                _config_cache['dirty'] = False
+
+
+def update_config(fn):
+    """Apply fn to a private copy of the config and commit the result.
+
+    fn mutates the dict it receives in place; its return value is returned.
+    Updates are serialized, so concurrent read-modify-write callers never
+    lose each other's changes. Raising inside fn aborts without writing and
+    an unchanged config is not rewritten. The new config is visible to
+    readers immediately and reaches disk after CONFIG_WRITE_DELAY.
+    """
+    with _config_lock:
+        _refresh_config_locked()
+        data = json.loads(_config_cache['text'])
+        result = fn(data)
+        text = json.dumps(data, indent=2)
+        if text != _config_cache['text']:
+            _commit_config_locked(text)
+    return result
 
 
 def write_config(data):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(data, f, indent=2)
+    """Replace the whole config; prefer update_config for read-modify-write."""
+    text = json.dumps(data, indent=2)
+    with _config_lock:
+        _commit_config_locked(text)
 
 
 def create_access_token(subject: str, is_admin: bool = False, must_change: bool = False, expires_minutes: int | None = None):
@@ -96,7 +313,7 @@ def require_token(authorization: str = Header(None)):
 def verify_admin_password(password: str) -> bool:
     # read stored hash from config and compare sha256
     import hashlib
-    data = read_config()
+    data = get_config_snapshot()
     admin = data.get("admin", {})
     stored = admin.get("password_hash")
     if not stored:
@@ -111,7 +328,7 @@ def hash_password(password: str) -> str:
 
 
 def get_user(username: str):
-    data = read_config()
+    data = get_config_snapshot()
     users = data.get('users', [])
     for u in users:
         if u.get('username') == username:
@@ -120,19 +337,22 @@ def get_user(username: str):
 
 
 def create_user(username: str, password: str, must_change: bool = True, is_admin: bool = False):
-    data = read_config()
-    users = data.get('users', [])
-    if any(u.get('username') == username for u in users):
-        return False
-    users.append({
-        'username': username,
-        'password_hash': hash_password(password),
-        'must_change': bool(must_change),
-        'is_admin': bool(is_admin)
-    })
-    data['users'] = users
-    write_config(data)
-    return True
+    password_hash = hash_password(password)
+
+    def _add(data):
+        users = data.get('users', [])
+        if any(u.get('username') == username for u in users):
+            return False
+        users.append({
+            'username': username,
+            'password_hash': password_hash,
+            'must_change': bool(must_change),
+            'is_admin': bool(is_admin)
+        })
+        data['users'] = users
+        return True
+
+    return update_config(_add)
 
 
 def verify_user_password(username: str, password: str) -> bool:
@@ -143,71 +363,104 @@ def verify_user_password(username: str, password: str) -> bool:
 
 
 def set_user_password(username: str, new_password: str, must_change: bool = False):
-    data = read_config()
-    users = data.get('users', [])
-    for u in users:
-        if u.get('username') == username:
-            u['password_hash'] = hash_password(new_password)
-            u['must_change'] = bool(must_change)
-            data['users'] = users
-            write_config(data)
-            return True
-    return False
+    password_hash = hash_password(new_password)
+
+    def _set(data):
+        users = data.get('users', [])
+        for u in users:
+            if u.get('username') == username:
+                u['password_hash'] = password_hash
+                u['must_change'] = bool(must_change)
+                data['users'] = users
+                return True
+        return False
 
+    return update_config(_set)
 
-def load_registry_snapshot(integration: dict, allow_ws_fallback: bool = True) -> dict:
-    """Load Home Assistant area/device/entity registries.
-    Prefers cached data, then REST endpoints, finally websocket fallback when necessary.
-    """
-    import requests
+
+_REGISTRY_ENDPOINTS = (
+    ('/api/config/area_registry/list', '/api/areas'),
+    ('/api/config/device_registry/list', '/api/devices'),
+    ('/api/config/entity_registry/list', '/api/config/entity_registry/list'),
+)
+_REGISTRY_HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+
+
+def _fresh_registry_snapshot():
     cached = get_registry_snapshot()
     ttl = REGISTRY_CACHE_TTL
     if cached and ttl > 0:
         ts = cached.get('ts')
         if isinstance(ts, (int, float)) and (time.time() - ts) < ttl:
             return cached
+    return None
+
+
+def _integration_credentials(integration: dict) -> tuple[str, str]:
     if not integration:
         raise Exception("integration not configured")
     host = integration.get('host')
     token = integration.get('token')
     if not host or not token:
         raise Exception("integration missing host or token")
+    return host, token
+
+
+def _registry_list(resp) -> list | None:
+    if resp.status_code == 200:
+        data = fast_json.loads(resp.content) or []
+        if isinstance(data, list):
+            return data
+    return None
+
+
+def _store_registry(raw: list) -> dict | None:
+    areas_raw, devices_raw, entities_raw = raw
+    if areas_raw or devices_raw or entities_raw:
+        snapshot = _compose_registry_snapshot(areas_raw, devices_raw, entities_raw)
+        set_registry_snapshot(snapshot)
+        return snapshot
+    return None
+
+
+def _empty_registry(cached: dict | None) -> dict:
+    if cached:
+        return cached
+    snapshot = _compose_registry_snapshot([], [], [])
+    set_registry_snapshot(snapshot)
+    return snapshot
 
+
+def load_registry_snapshot(integration: dict, allow_ws_fallback: bool = True) -> dict:
+    """Load Home Assistant area/device/entity registries.
+    Prefers cached data, then REST endpoints, finally websocket fallback when necessary.
+    """
+    fresh = _fresh_registry_snapshot()
+    if fresh:
+        return fresh
+    cached = get_registry_snapshot()
+    host, token = _integration_credentials(integration)
     base = host.rstrip('/')
-    headers = {
-        'Authorization': f"Bearer {token}",
-        'Accept': 'application/json',
-        'Content-Type': 'application/json'
-    }
+    session = ha_http.get_session(host, token)
 
     def _fetch(path: str, fallback_path: str | None = None):
-        url = base + path
         try:
-            resp = requests.post(url, headers=headers, json={}, timeout=8)
-            if resp.status_code == 200:
-                data = resp.json() or []
-                if isinstance(data, list):
-                    return data
+            data = _registry_list(session.post(base + path, headers=_REGISTRY_HEADERS, json={}, timeout=8))
+            if data is not None:
+                return data
         except Exception:
             pass
         if fallback_path:
             try:
-                resp = requests.get(base + fallback_path, headers=headers, timeout=8)
-                if resp.status_code == 200:
-                    data = resp.json() or []
-                    if isinstance(data, list):
-                        return data
+                data = _registry_list(session.get(base + fallback_path, headers=_REGISTRY_HEADERS, timeout=8))
+                if data is not None:
+                    return data
             except Exception:
                 pass
         return []
 
-    areas_raw = _fetch('/api/config/area_registry/list', '/api/areas')
-    devices_raw = _fetch('/api/config/device_registry/list', '/api/devices')
-    entities_raw = _fetch('/api/config/entity_registry/list', '/api/config/entity_registry/list')
-
-    if areas_raw or devices_raw or entities_raw:
-        snapshot = _compose_registry_snapshot(areas_raw, devices_raw, entities_raw)
-        set_registry_snapshot(snapshot)
+    snapshot = _store_registry([_fetch(path, fallback) for path, fallback in _REGISTRY_ENDPOINTS])
+    if snapshot:
         return snapshot
 
     if allow_ws_fallback:
@@ -216,12 +469,50 @@ def load_registry_snapshot(integration: dict, allow_ws_fallback: bool = True) ->
             set_registry_snapshot(snapshot)
             return snapshot
 
-    if cached:
-        return cached
+    return _empty_registry(cached)
 
-    snapshot = _compose_registry_snapshot([], [], [])
-    set_registry_snapshot(snapshot)
-    return snapshot
+
+async def load_registry_snapshot_async(integration: dict, allow_ws_fallback: bool = True) -> dict:
+    """Non-blocking load_registry_snapshot; the three registries are fetched concurrently."""
+    fresh = _fresh_registry_snapshot()
+    if fresh:
+        return fresh
+    cached = get_registry_snapshot()
+    host, token = _integration_credentials(integration)
+    base = host.rstrip('/')
+    client = ha_http.get_async_client(host, token)
+
+    async def _fetch(path: str, fallback_path: str | None = None):
+        try:
+            data = _registry_list(await client.post(base + path, headers=_REGISTRY_HEADERS, json={}, timeout=8))
+            if data is not None:
+                return data
+        except Exception:
+            pass
+        if fallback_path:
+            try:
+                data = _registry_list(await client.get(base + fallback_path, headers=_REGISTRY_HEADERS, timeout=8))
+                if data is not None:
+                    return data
+            except Exception:
+                pass
+        return []
+
+    raw = await asyncio.gather(*(_fetch(path, fallback) for path, fallback in _REGISTRY_ENDPOINTS))
+    snapshot = _store_registry(list(raw))
+    if snapshot:
+        return snapshot
+
+    if allow_ws_fallback:
+        try:
+            snapshot = await _collect_registry_via_ws(_registry_ws_url(host), token)
+        except Exception:
+            snapshot = None
+        if snapshot:
+            set_registry_snapshot(snapshot)
+            return snapshot
+
+    return _empty_registry(cached)
 
 
 def _compose_registry_snapshot(areas_raw, devices_raw, entities_raw):
@@ -277,61 +568,65 @@ def _compose_registry_snapshot(areas_raw, devices_raw, entities_raw):
     }
 
 
-def _fetch_registry_via_ws(host: str, token: str) -> dict | None:
-    import json
-    try:
-        import websockets
-    except Exception:
-        return None
-
-    if not host or not token:
-        return None
-
+def _registry_ws_url(host: str) -> str:
     if host.startswith('https://'):
         ws_url = 'wss://' + host[len('https://'):]
     elif host.startswith('http://'):
         ws_url = 'ws://' + host[len('http://'):]
     else:
         ws_url = 'ws://' + host
-    ws_url = ws_url.rstrip('/') + '/api/websocket'
+    return ws_url.rstrip('/') + '/api/websocket'
 
-    async def _collect():
-        async with websockets.connect(ws_url, ping_interval=15, ping_timeout=10) as ws:
-            try:
-                await ws.recv()  # auth_required
-            except Exception:
-                pass
-            await ws.send(json.dumps({'type': 'auth', 'access_token': token}))
-            auth_resp = json.loads(await ws.recv())
-            if auth_resp.get('type') != 'auth_ok':
-                return None
-
-            reg_map = {
-                'areas': ('config/area_registry/list', 7001),
-                'devices': ('config/device_registry/list', 7002),
-                'entities': ('config/entity_registry/list', 7003)
-            }
-            for cmd, ident in [(v[0], v[1]) for v in reg_map.values()]:
-                await ws.send(json.dumps({'id': ident, 'type': cmd}))
 
-            pending = {v[1]: k for k, v in reg_map.items()}
-            results = {k: [] for k in reg_map.keys()}
+async def _collect_registry_via_ws(ws_url: str, token: str) -> dict | None:
+    import websockets
+    async with websockets.connect(ws_url, ping_interval=15, ping_timeout=10) as ws:
+        try:
+            await ws.recv()  # auth_required
+        except Exception:
+            pass
+        await ws.send(json.dumps({'type': 'auth', 'access_token': token}))
+        auth_resp = json.loads(await ws.recv())
+        if auth_resp.get('type') != 'auth_ok':
+            return None
+
+        reg_map = {
+            'areas': ('config/area_registry/list', 7001),
+            'devices': ('config/device_registry/list', 7002),
+            'entities': ('config/entity_registry/list', 7003)
+        }
+        for cmd, ident in [(v[0], v[1]) for v in reg_map.values()]:
+            await ws.send(json.dumps({'id': ident, 'type': cmd}))
+
+        pending = {v[1]: k for k, v in reg_map.items()}
+        results = {k: [] for k in reg_map.keys()}
 
-            while pending:
-                msg = await asyncio.wait_for(ws.recv(), timeout=10)
-                data = json.loads(msg)
-                if data.get('type') == 'result' and data.get('id') in pending:
-                    key = pending.pop(data['id'])
-                    results[key] = data.get('result') or []
+        while pending:
+            msg = await asyncio.wait_for(ws.recv(), timeout=10)
+            data = json.loads(msg)
+            if data.get('type') == 'result' and data.get('id') in pending:
+                key = pending.pop(data['id'])
+                results[key] = data.get('result') or []
+
+        return _compose_registry_snapshot(results['areas'], results['devices'], results['entities'])
+
+
+def _fetch_registry_via_ws(host: str, token: str) -> dict | None:
+    try:
+        import websockets  # noqa: F401
+    except Exception:
+        return None
 
-            return _compose_registry_snapshot(results['areas'], results['devices'], results['entities'])
+    if not host or not token:
+        return None
 
+    collect = partial(_collect_registry_via_ws, _registry_ws_url(host), token)
     try:
-        return asyncio.run(_collect())
+        return asyncio.run(collect())
     except RuntimeError:
         loop = asyncio.new_event_loop()
         try:
-            return loop.run_until_complete(_collect())
+            return loop.run_until_complete(collect())
         finally:
             loop.close()
     except Exception:
@@ -416,42 +711,138 @@ def _resolve_room_for_entity(registry_entry: dict | None, attrs: dict | None, de
     return None
 
 
-def _collect_camera_entities(state_map: dict, entity_registry: dict, device_map: dict) -> list[dict]:
-    cameras: list[dict] = []
-    if not isinstance(state_map, dict):
-        return cameras
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str) or not entity_id.startswith('camera.'):
-            continue
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        labels = _collect_labels(
+_SCENE_DOMAINS = {'button', 'input_button', 'scene'}
+_ENTITY_ROLES = ('light', 'scene', 'camera', 'security', 'cover', 'climate', 'temperature', 'gate', 'weather')
+
+
+def _classify_entity(entity_id: str, state: dict | None, registry_entry: dict | None, device_map: dict) -> dict:
+    """Compute labels, hidden flags, resolved room and roles of one entity.
+
+    Collectors read three label variants: the common one (labels, tags and
+    registry labels), the wide one used by cameras and gates and the one used
+    by security entities. The extra variants are only computed when the extra
+    attribute sources are present, otherwise they are the common list.
+    """
+    state = state or {}
+    attrs = state.get('attributes') or {}
+    registry_entry = registry_entry or {}
+    domain = entity_id.split('.', 1)[0] if '.' in entity_id else ''
+    labels = _collect_labels(attrs.get('labels'), attrs.get('tags'), registry_entry.get('labels'))
+    extra_label = attrs.get('label')
+    extra_tags = attrs.get('eface_tags') or attrs.get('custom_tags')
+    if extra_label or extra_tags:
+        wide_labels = _collect_labels(
             attrs.get('labels'),
             attrs.get('tags'),
-            attrs.get('label'),
+            extra_label,
             registry_entry.get('labels'),
             attrs.get('eface_tags'),
             attrs.get('custom_tags')
         )
-        if not _has_tvcc_label(labels):
+    else:
+        wide_labels = labels
+    if not extra_label:
+        security_labels = labels
+    elif not extra_tags:
+        security_labels = wide_labels
+    else:
+        security_labels = _collect_labels(attrs.get('labels'), attrs.get('tags'), extra_label, registry_entry.get('labels'))
+    attr_hidden = _should_hide_entity(attrs, registry_entry, [])
+
+    roles = set()
+    if domain in ('light', 'cover', 'climate', 'weather'):
+        roles.add(domain)
+    if domain == 'camera' and _has_tvcc_label(wide_labels):
+        roles.add('camera')
+    if domain in _SCENE_DOMAINS and 'light-scene' in labels:
+        roles.add('scene')
+    if domain == 'sensor' and 'room-temp' in labels:
+        roles.add('temperature')
+    security_category = _security_category(domain, attrs, security_labels) if security_labels else None
+    if security_category:
+        roles.add('security')
+    if any(label.startswith('gate') for label in wide_labels):
+        roles.add('gate')
+
+    return {
+        'entity_id': entity_id,
+        'domain': domain,
+        'state': state,
+        'attrs': attrs,
+        'registry': registry_entry,
+        'labels': labels,
+        'wide_labels': wide_labels,
+        'security_labels': security_labels,
+        'attr_hidden': attr_hidden,
+        'hidden': attr_hidden or 'hidden' in labels,
+        'wide_hidden': attr_hidden or 'hidden' in wide_labels,
+        'security_hidden': attr_hidden or 'hidden' in security_labels,
+        'security_category': security_category,
+        'room_id': _resolve_room_for_entity(registry_entry, attrs, device_map),
+        'roles': roles,
+    }
+
+
+def _classify_entities(state_map: dict, entity_registry: dict, device_map: dict) -> dict:
+    """Single pass over the state map bucketing every entity by role.
+
+    Only entities with at least one role are kept; ``by_id`` maps them back.
+    """
+    buckets: dict[str, list[dict]] = {role: [] for role in _ENTITY_ROLES}
+    by_id: dict[str, dict] = {}
+    if not isinstance(state_map, dict):
+        return {'buckets': buckets, 'by_id': by_id}
+    entity_registry = entity_registry or {}
+    for entity_id, state in state_map.items():
+        if not isinstance(entity_id, str) or not entity_id:
             continue
-        if _should_hide_entity(attrs, registry_entry, labels):
+        info = _classify_entity(entity_id, state, entity_registry.get(entity_id), device_map)
+        if not info['roles']:
             continue
-        room_id = _resolve_room_for_entity(registry_entry, attrs, device_map)
-        cameras.append({
-            'id': entity_id,
-            'entity_id': entity_id,
-            'name': attrs.get('friendly_name') or registry_entry.get('name') or entity_id,
-            'state': state.get('state'),
-            'labels': labels,
-            'room_id': room_id,
-            'attributes': {
-                'entity_picture': attrs.get('entity_picture'),
-                'frontend_stream_type': attrs.get('frontend_stream_type'),
-                'stream_type': attrs.get('stream_type'),
-                'supported_features': attrs.get('supported_features')
-            }
-        })
+        by_id[entity_id] = info
+        for role in info['roles']:
+            buckets[role].append(info)
+    # registry entries without a state can still provide light scenes
+    for entity_id, registry_entry in entity_registry.items():
+        if not entity_id or entity_id in state_map:
+            continue
+        if entity_id.split('.', 1)[0] not in _SCENE_DOMAINS:
+            continue
+        info = _classify_entity(entity_id, None, registry_entry, device_map)
+        if 'scene' in info['roles']:
+            by_id[entity_id] = info
+            buckets['scene'].append(info)
+    return {'buckets': buckets, 'by_id': by_id}
+
+
+def _shape_camera_entry(info: dict) -> dict | None:
+    if 'camera' not in info['roles'] or info['wide_hidden']:
+        return None
+    entity_id = info['entity_id']
+    attrs = info['attrs']
+    registry_entry = info['registry']
+    return {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'name': attrs.get('friendly_name') or registry_entry.get('name') or entity_id,
+        'state': info['state'].get('state'),
+        'labels': info['wide_labels'],
+        'room_id': info['room_id'],
+        'attributes': {
+            'entity_picture': attrs.get('entity_picture'),
+            'frontend_stream_type': attrs.get('frontend_stream_type'),
+            'stream_type': attrs.get('stream_type'),
+            'supported_features': attrs.get('supported_features')
+        }
+    }
+
+
+def _collect_camera_entities(classified: dict) -> list[dict]:
+    cameras: list[dict] = []
+    for info in classified['buckets']['camera']:
+        camera = _shape_camera_entry(info)
+        if camera:
+            cameras.append(camera)
     return cameras
 
 
@@ -509,6 +900,17 @@ def _has_doorbell_label(labels: list[str]) -> bool:
     return _has_tag_prefix(labels, 'doorbell')
 
 
+def doorbell_camera_ids(rooms: list) -> list[str]:
+    """Entity ids of the cameras in a rooms payload that carry a doorbell label."""
+    found: list[str] = []
+    for room in rooms or []:
+        for camera in room.get('cameras') or []:
+            entity_id = camera.get('entity_id')
+            if entity_id and entity_id not in found and _has_doorbell_label(camera.get('labels') or []):
+                found.append(entity_id)
+    return found
+
+
 def _has_gate_label(labels: list[str]) -> bool:
     return _has_tag_prefix(labels, 'gate')
 
@@ -527,56 +929,56 @@ def _looks_like_alarm_status(labels: list[str]) -> bool:
     return _has_alarm_status_label(labels)
 
 
-def _collect_security_entities(state_map: dict, entity_registry: dict, device_map: dict, area_map: dict) -> list[dict]:
+def _security_category(domain: str, attrs: dict, labels: list[str]) -> str | None:
+    if _looks_like_alarm_partition(domain, labels):
+        return 'partition'
+    if _looks_like_alarm_zone(domain, attrs, labels):
+        return 'zone'
+    if _looks_like_alarm_status(labels):
+        return 'status'
+    if _has_doorbell_label(labels) or _has_gate_label(labels):
+        return 'doorbell'
+    return None
+
+
+def _shape_security_entry(info: dict, area_map: dict) -> dict | None:
+    if 'security' not in info['roles'] or info['security_hidden']:
+        return None
+    entity_id = info['entity_id']
+    domain = info['domain']
+    attrs = info['attrs']
+    registry_entry = info['registry']
+    labels = info['security_labels']
+    state = info['state']
+    room_id = info['room_id']
+    area_label = area_map.get(room_id) if room_id else None
+    if not area_label:
+        area_label = attrs.get('room_name') or attrs.get('room') or attrs.get('area')
+    return {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'type': domain,
+        'domain': domain,
+        'category': info['security_category'],
+        'name': attrs.get('friendly_name') or registry_entry.get('original_name') or entity_id,
+        'state': state.get('state'),
+        'device_class': attrs.get('device_class'),
+        'area_id': room_id,
+        'area_name': area_label,
+        'labels': labels,
+        'tags': labels,
+        'attributes': attrs,
+        'last_changed': state.get('last_changed'),
+        'last_updated': state.get('last_updated')
+    }
+
+
+def _collect_security_entities(classified: dict, area_map: dict) -> list[dict]:
     entries: list[dict] = []
-    if not isinstance(state_map, dict):
-        return entries
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str):
-            continue
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            attrs.get('label'),
-            registry_entry.get('labels')
-        )
-        if _should_hide_entity(attrs, registry_entry, labels):
-            continue
-        domain = entity_id.split('.', 1)[0] if '.' in entity_id else ''
-        category = None
-        if _looks_like_alarm_partition(domain, labels):
-            category = 'partition'
-        elif _looks_like_alarm_zone(domain, attrs, labels):
-            category = 'zone'
-        elif _looks_like_alarm_status(labels):
-            category = 'status'
-        is_doorbell_related = _has_doorbell_label(labels) or _has_gate_label(labels)
-        if not category and not is_doorbell_related:
-            continue
-        entry_category = category or 'doorbell'
-        room_id = _resolve_room_for_entity(registry_entry, attrs, device_map)
-        area_label = area_map.get(room_id) if room_id else None
-        if not area_label:
-            area_label = attrs.get('room_name') or attrs.get('room') or attrs.get('area')
-        entries.append({
-            'id': entity_id,
-            'entity_id': entity_id,
-            'type': domain,
-            'domain': domain,
-            'category': entry_category,
-            'name': attrs.get('friendly_name') or registry_entry.get('original_name') or entity_id,
-            'state': state.get('state'),
-            'device_class': attrs.get('device_class'),
-            'area_id': room_id,
-            'area_name': area_label,
-            'labels': labels,
-            'tags': labels,
-            'attributes': attrs,
-            'last_changed': state.get('last_changed'),
-            'last_updated': state.get('last_updated')
-        })
+    for info in classified['buckets']['security']:
+        entry = _shape_security_entry(info, area_map)
+        if entry:
+            entries.append(entry)
     return entries
 
 
@@ -628,53 +1030,37 @@ def _room_hint_from_labels(labels: list[str]) -> str | None:
     return None
 
 
-def _append_light_scene(entity_id: str, domain: str, attrs: dict, registry_entry: dict, labels: list[str], device_map: dict, scenes_by_room: dict, fallback: list):
-    if not entity_id or domain not in {'button', 'input_button', 'scene'}:
-        return
-    if 'light-scene' not in labels:
-        return
-    if _should_hide_entity(attrs, registry_entry, labels):
-        return
-    room_id = _resolve_room_for_entity(registry_entry, attrs, device_map)
+def _shape_light_scene(info: dict) -> tuple[str | None, dict] | None:
+    """Return (room_id, scene) for a light-scene entity, or None if it does not qualify."""
+    if 'scene' not in info['roles'] or info['hidden']:
+        return None
+    entity_id = info['entity_id']
+    domain = info['domain']
+    attrs = info['attrs']
+    room_id = info['room_id']
     if not room_id:
-        room_id = _room_hint_from_labels(labels)
+        room_id = _room_hint_from_labels(info['labels'])
     scene = {
         'id': entity_id,
-        'name': attrs.get('friendly_name') or registry_entry.get('original_name') or entity_id,
+        'name': attrs.get('friendly_name') or info['registry'].get('original_name') or entity_id,
         'icon': attrs.get('icon'),
         'domain': domain,
         'service': 'press' if domain in {'button', 'input_button'} else 'turn_on'
     }
-    target = scenes_by_room.setdefault(room_id, []) if room_id else fallback
-    target.append(scene)
+    return room_id, scene
 
 
-def _gather_light_scenes(state_map: dict, entity_registry: dict, device_map: dict):
+def _gather_light_scenes(classified: dict):
     scenes_by_room: dict[str | None, list] = {}
     fallback: list = []
-    processed: set[str] = set()
-
-    for entity_id, ent in state_map.items():
-        if not entity_id:
-            continue
-        domain = entity_id.split('.', 1)[0]
-        attrs = (ent or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            registry_entry.get('labels')
-        )
-        _append_light_scene(entity_id, domain, attrs, registry_entry, labels, device_map, scenes_by_room, fallback)
-        processed.add(entity_id)
 
-    for entity_id, registry_entry in (entity_registry or {}).items():
-        if not entity_id or entity_id in processed:
+    for info in classified['buckets']['scene']:
+        shaped = _shape_light_scene(info)
+        if not shaped:
             continue
-        domain = entity_id.split('.', 1)[0]
-        labels = _collect_labels(registry_entry.get('labels'))
-        attrs = {}
-        _append_light_scene(entity_id, domain, attrs, registry_entry or {}, labels, device_map, scenes_by_room, fallback)
+        room_id, scene = shaped
+        target = scenes_by_room.setdefault(room_id, []) if room_id else fallback
+        target.append(scene)
 
     return scenes_by_room, fallback
 
@@ -712,7 +1098,7 @@ def _shape_weather_payload(entity_id: str, state: dict | None) -> dict | None:
         'entity_id': entity_id,
         'id': entity_id,
         'state': state.get('state'),
-        'attributes': attrs,
+        'attributes': dict(attrs),
         'last_changed': state.get('last_changed'),
         'last_updated': state.get('last_updated')
     }
@@ -738,7 +1124,6 @@ def _extract_weather_snapshot(state_map: dict, preferred_ids: list[str] | None =
 def _fetch_weather_forecast(host: str, token: str, entity_id: str, forecast_type: str | None = None):
     if not host or not token or not entity_id:
         return None
-    import requests
     base = host.rstrip('/')
     entity_segment = quote(entity_id, safe='')
     url = f"{base}/api/weather/forecast/{entity_segment}"
@@ -747,7 +1132,7 @@ def _fetch_weather_forecast(host: str, token: str, entity_id: str, forecast_type
         params['type'] = forecast_type
     headers = {'Authorization': f"Bearer {token}", 'Accept': 'application/json'}
     try:
-        resp = requests.get(url, headers=headers, params=params or None, timeout=6)
+        resp = ha_http.get_session(host, token).get(url, headers=headers, params=params or None, timeout=6)
         resp.raise_for_status()
         payload = resp.json()
         if isinstance(payload, dict):
@@ -762,93 +1147,119 @@ def _fetch_weather_forecast(host: str, token: str, entity_id: str, forecast_type
 
 
 def _enrich_weather_forecast(snapshot: dict, host: str, token: str) -> dict:
+    """Attach the cached forecasts; expired ones are refreshed in the background."""
     if not snapshot or not isinstance(snapshot, dict):
         return snapshot
     entity_id = snapshot.get('entity_id') or snapshot.get('id')
-    attrs = snapshot.get('attributes') or {}
-    hourly = _fetch_weather_forecast(host, token, entity_id, 'hourly')
-    daily = _fetch_weather_forecast(host, token, entity_id, 'daily')
-    if hourly:
-        attrs['forecast_hourly'] = hourly
-    if daily:
-        attrs['forecast_daily'] = daily
-    if not attrs.get('forecast') and hourly:
-        attrs['forecast'] = hourly
-    snapshot['attributes'] = attrs
-    return snapshot
+    weather_cache.request_refresh(host, token, entity_id)
+    return weather_cache.attach_forecasts(snapshot)
+
 
+def _shape_cover_entry(info: dict, device_map: dict) -> tuple[str, dict] | None:
+    """Return (area_id, cover) for a visible cover with an area, else None."""
+    if 'cover' not in info['roles'] or info['hidden']:
+        return None
+    entity_id = info['entity_id']
+    attrs = info['attrs']
+    registry_entry = info['registry']
+
+    dev_id = registry_entry.get('device_id') or attrs.get('device_id')
+    dev = device_map.get(dev_id) if dev_id else None
+    area_id = registry_entry.get('area_id') or (dev or {}).get('area_id') or attrs.get('area_id')
+
+    # Skip covers without area
+    if not area_id:
+        return None
+
+    return area_id, {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
+        'state': info['state'].get('state'),
+        'current_position': attrs.get('current_position'),
+        'current_tilt_position': attrs.get('current_tilt_position'),
+        'device_class': attrs.get('device_class'),
+        'supported_features': attrs.get('supported_features'),
+        'labels': info['labels'],
+        'attributes': {
+            'current_position': attrs.get('current_position'),
+            'current_tilt_position': attrs.get('current_tilt_position'),
+            'device_class': attrs.get('device_class'),
+            'supported_features': attrs.get('supported_features')
+        }
+    }
 
-def _collect_cover_entities(state_map: dict, entity_registry: dict, device_map: dict) -> dict:
+
+def _collect_cover_entities(classified: dict, device_map: dict) -> dict:
     """Collect cover entities (shutters, blinds) by room."""
     covers_by_room = defaultdict(list)
-    if not isinstance(state_map, dict):
-        return {}
-    
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str) or not entity_id.startswith('cover.'):
-            continue
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            registry_entry.get('labels')
-        )
-        if _should_hide_entity(attrs, registry_entry, labels):
-            continue
-        
-        dev_id = registry_entry.get('device_id') or attrs.get('device_id')
-        dev = device_map.get(dev_id) if dev_id else None
-        area_id = registry_entry.get('area_id') or (dev or {}).get('area_id') or attrs.get('area_id')
-        
-        # Skip covers without area
-        if not area_id:
-            continue
-        
-        cover_data = {
-            'id': entity_id,
-            'entity_id': entity_id,
-            'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
-            'state': state.get('state'),
-            'current_position': attrs.get('current_position'),
-            'current_tilt_position': attrs.get('current_tilt_position'),
-            'device_class': attrs.get('device_class'),
-            'supported_features': attrs.get('supported_features'),
-            'labels': labels,
-            'attributes': {
-                'current_position': attrs.get('current_position'),
-                'current_tilt_position': attrs.get('current_tilt_position'),
-                'device_class': attrs.get('device_class'),
-                'supported_features': attrs.get('supported_features')
-            }
-        }
-        covers_by_room[area_id].append(cover_data)
+    for info in classified['buckets']['cover']:
+        shaped = _shape_cover_entry(info, device_map)
+        if shaped:
+            area_id, cover_data = shaped
+            covers_by_room[area_id].append(cover_data)
     
     return dict(covers_by_room)
 
 
-def _collect_climate_entities(state_map: dict, entity_registry: dict, device_map: dict) -> dict:
+def _shape_climate_entry(info: dict) -> dict | None:
+    if 'climate' not in info['roles'] or info['hidden']:
+        return None
+    entity_id = info['entity_id']
+    attrs = info['attrs']
+    registry_entry = info['registry']
+    state = info['state']
+    return {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
+        'state': state.get('state'),
+        'current_temperature': attrs.get('current_temperature'),
+        'target_temperature': attrs.get('temperature'),
+        'target_temp_high': attrs.get('target_temp_high'),
+        'target_temp_low': attrs.get('target_temp_low'),
+        'hvac_mode': attrs.get('hvac_mode') or state.get('state'),
+        'hvac_modes': attrs.get('hvac_modes') or [],
+        'preset_mode': attrs.get('preset_mode'),
+        'preset_modes': attrs.get('preset_modes') or [],
+        'fan_mode': attrs.get('fan_mode'),
+        'fan_modes': attrs.get('fan_modes') or [],
+        'humidity': attrs.get('current_humidity'),
+        'labels': info['labels'],
+        'attributes': {
+            'current_temperature': attrs.get('current_temperature'),
+            'temperature': attrs.get('temperature'),
+            'target_temp_high': attrs.get('target_temp_high'),
+            'target_temp_low': attrs.get('target_temp_low'),
+            'hvac_modes': attrs.get('hvac_modes') or [],
+            'preset_modes': attrs.get('preset_modes') or [],
+            'fan_modes': attrs.get('fan_modes') or [],
+            'min_temp': attrs.get('min_temp'),
+            'max_temp': attrs.get('max_temp'),
+            'target_temp_step': attrs.get('target_temp_step'),
+            'supported_features': attrs.get('supported_features')
+        }
+    }
+
+
+def _collect_climate_entities(classified: dict) -> dict:
     """Collect climate entities (thermostats, HVAC) by room.
     
     ONLY adds climate entities that are explicitly configured in room templates.
     Does NOT auto-discover climate entities based on area_id.
     """
     climate_by_room = defaultdict(list)
-    if not isinstance(state_map, dict):
-        return {}
     
     # Check if we have a climate map from config
     if not hasattr(_collect_climate_entities, '_room_climate_map'):
         # No climate configured in any room, return empty
-        print("DEBUG Climate: No climate entities in configuration, skipping auto-discovery")
+        logger.debug("Climate: No climate entities in configuration, skipping auto-discovery")
         return {}
     
     climate_map_from_config = _collect_climate_entities._room_climate_map
     
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str) or not entity_id.startswith('climate.'):
-            continue
-        
+    for info in classified['buckets']['climate']:
+        entity_id = info['entity_id']
         # ONLY process climate entities that are explicitly in the configuration
         if entity_id not in climate_map_from_config:
             continue
@@ -857,168 +1268,220 @@ def _collect_climate_entities(state_map: dict, entity_registry: dict, device_map
         if not area_id:
             continue
         
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            registry_entry.get('labels')
-        )
-        if _should_hide_entity(attrs, registry_entry, labels):
+        climate_data = _shape_climate_entry(info)
+        if not climate_data:
             continue
-        
-        climate_data = {
-            'id': entity_id,
-            'entity_id': entity_id,
-            'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
-            'state': state.get('state'),
-            'current_temperature': attrs.get('current_temperature'),
-            'target_temperature': attrs.get('temperature'),
-            'target_temp_high': attrs.get('target_temp_high'),
-            'target_temp_low': attrs.get('target_temp_low'),
-            'hvac_mode': attrs.get('hvac_mode') or state.get('state'),
-            'hvac_modes': attrs.get('hvac_modes') or [],
-            'preset_mode': attrs.get('preset_mode'),
-            'preset_modes': attrs.get('preset_modes') or [],
-            'fan_mode': attrs.get('fan_mode'),
-            'fan_modes': attrs.get('fan_modes') or [],
-            'humidity': attrs.get('current_humidity'),
-            'labels': labels,
-            'attributes': {
-                'current_temperature': attrs.get('current_temperature'),
-                'temperature': attrs.get('temperature'),
-                'target_temp_high': attrs.get('target_temp_high'),
-                'target_temp_low': attrs.get('target_temp_low'),
-                'hvac_modes': attrs.get('hvac_modes') or [],
-                'preset_modes': attrs.get('preset_modes') or [],
-                'fan_modes': attrs.get('fan_modes') or [],
-                'min_temp': attrs.get('min_temp'),
-                'max_temp': attrs.get('max_temp'),
-                'target_temp_step': attrs.get('target_temp_step'),
-                'supported_features': attrs.get('supported_features')
-            }
-        }
         climate_by_room[area_id].append(climate_data)
-        print(f"DEBUG Climate {entity_id}: ADDED to room {area_id}")
+        logger.debug("Climate %s: ADDED to room %s", entity_id, area_id)
     
-    print(f"DEBUG Climate: Total collected: {dict((k, len(v)) for k, v in climate_by_room.items())}")
     return dict(climate_by_room)
 
-def _collect_room_temperature_sensors(state_map: dict, entity_registry: dict, device_map: dict) -> dict:
+def _shape_room_temperature(info: dict, device_map: dict) -> tuple[str, dict] | None:
+    """Return (area_id, sensor) for a 'room-temp' tagged sensor, else None."""
+    # Check if has room-temp tag
+    if 'temperature' not in info['roles']:
+        return None
+    entity_id = info['entity_id']
+    attrs = info['attrs']
+    registry_entry = info['registry']
+    
+    # Check if it's a temperature sensor (numeric value)
+    device_class = attrs.get('device_class')
+    unit = attrs.get('unit_of_measurement', '')
+    state_val = info['state'].get('state')
+    
+    # Must be numeric and ideally temperature-related
+    try:
+        temp_value = float(state_val) if state_val not in ('unknown', 'unavailable', None) else None
+    except (ValueError, TypeError):
+        return None
+    
+    # Get area from entity registry
+    area_id = registry_entry.get('area_id')
+    if not area_id:
+        # Try to get from device
+        device_id = registry_entry.get('device_id')
+        if device_id:
+            device = device_map.get(device_id) or {}
+            area_id = device.get('area_id')
+    
+    if not area_id:
+        return None
+    
+    # Skip hidden entities
+    if info['hidden']:
+        return None
+    
+    return area_id, {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
+        'state': state_val,
+        'value': temp_value,
+        'unit': unit,
+        'device_class': device_class,
+        'labels': info['labels']
+    }
+
+
+def _collect_room_temperature_sensors(classified: dict, device_map: dict) -> dict:
     """Collect temperature sensors with 'room-temp' tag by room."""
     temp_sensors_by_room = defaultdict(list)
-    if not isinstance(state_map, dict):
-        return {}
-    
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str) or not entity_id.startswith('sensor.'):
-            continue
-        
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        
-        # Collect labels from all sources
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            registry_entry.get('labels')
-        )
-        
-        # Check if has room-temp tag
-        if 'room-temp' not in labels:
+    for info in classified['buckets']['temperature']:
+        shaped = _shape_room_temperature(info, device_map)
+        if not shaped:
             continue
-        
-        # Check if it's a temperature sensor (numeric value)
-        device_class = attrs.get('device_class')
-        unit = attrs.get('unit_of_measurement', '')
-        state_val = state.get('state')
-        
-        # Must be numeric and ideally temperature-related
-        try:
-            temp_value = float(state_val) if state_val not in ('unknown', 'unavailable', None) else None
-        except (ValueError, TypeError):
-            continue
-        
-        # Get area from entity registry
-        area_id = registry_entry.get('area_id')
-        if not area_id:
-            # Try to get from device
-            device_id = registry_entry.get('device_id')
-            if device_id:
-                device = device_map.get(device_id) or {}
-                area_id = device.get('area_id')
-        
-        if not area_id:
-            continue
-        
-        # Skip hidden entities
-        if _should_hide_entity(attrs, registry_entry, labels):
-            continue
-        
-        sensor_data = {
-            'id': entity_id,
-            'entity_id': entity_id,
-            'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
-            'state': state_val,
-            'value': temp_value,
-            'unit': unit,
-            'device_class': device_class,
-            'labels': labels
-        }
+        area_id, sensor_data = shaped
         
         temp_sensors_by_room[area_id].append(sensor_data)
-        print(f"DEBUG RoomTemp {entity_id}: ADDED to room {area_id} (value: {temp_value}{unit})")
+        logger.debug("RoomTemp %s: ADDED to room %s (value: %s%s)", info['entity_id'], area_id, sensor_data['value'], sensor_data['unit'])
     
-    print(f"DEBUG RoomTemp: Total collected: {dict((k, len(v)) for k, v in temp_sensors_by_room.items())}")
     return dict(temp_sensors_by_room)
 
-def _collect_gate_entities(state_map: dict, entity_registry: dict, device_map: dict) -> list:
+def _shape_gate_entry(info: dict) -> dict | None:
+    # Check if has any tag starting with "gate"
+    if 'gate' not in info['roles']:
+        return None
+    
+    # Skip hidden entities
+    if info['wide_hidden']:
+        return None
+    
+    entity_id = info['entity_id']
+    attrs = info['attrs']
+    return {
+        'id': entity_id,
+        'entity_id': entity_id,
+        'name': info['registry'].get('original_name') or attrs.get('friendly_name') or entity_id,
+        'state': info['state'].get('state'),
+        'domain': info['domain'] or 'unknown',
+        'labels': info['wide_labels'],
+        'icon': attrs.get('icon'),
+        'device_class': attrs.get('device_class')
+    }
+
+
+def _collect_gate_entities(classified: dict) -> list:
     """Collect gate/door entities with 'gate' tag (global, not per room)."""
     gates = []
-    if not isinstance(state_map, dict):
-        return []
-    
-    for entity_id, state in state_map.items():
-        if not isinstance(entity_id, str):
-            continue
-        
-        attrs = (state or {}).get('attributes') or {}
-        registry_entry = entity_registry.get(entity_id) or {}
-        
-        # Collect labels from all sources (like cameras do)
-        labels = _collect_labels(
-            attrs.get('labels'),
-            attrs.get('tags'),
-            attrs.get('label'),
-            registry_entry.get('labels'),
-            attrs.get('eface_tags'),
-            attrs.get('custom_tags')
-        )
-        
-        # Check if has any tag starting with "gate"
-        has_gate_tag = any(label.startswith('gate') for label in labels)
-        if not has_gate_tag:
-            continue
-        
-        # Skip hidden entities
-        if _should_hide_entity(attrs, registry_entry, labels):
-            continue
-        
-        gate_data = {
-            'id': entity_id,
-            'entity_id': entity_id,
-            'name': registry_entry.get('original_name') or attrs.get('friendly_name') or entity_id,
-            'state': state.get('state'),
-            'domain': entity_id.split('.')[0] if '.' in entity_id else 'unknown',
-            'labels': labels,
-            'icon': attrs.get('icon'),
-            'device_class': attrs.get('device_class')
-        }
-        
-        gates.append(gate_data)
+    for info in classified['buckets']['gate']:
+        gate_data = _shape_gate_entry(info)
+        if gate_data:
+            gates.append(gate_data)
     
     return gates
 
+def fetch_ha_states(integration: dict) -> list:
+    """Download the full /api/states payload from Home Assistant."""
+    host = (integration or {}).get('host')
+    token = (integration or {}).get('token')
+    if not host or not token:
+        raise Exception("integration missing host or token")
+    headers = {'Authorization': f"Bearer {token}", 'Accept': 'application/json'}
+    states_url = host.rstrip('/') + '/api/states'
+    try:
+        sresp = ha_http.get_session(host, token).get(states_url, headers=headers, timeout=10)
+        sresp.raise_for_status()
+        return fast_json.loads(sresp.content) or []
+    except Exception as e:
+        raise Exception(f"failed to fetch states: {e}")
+
+
+async def fetch_ha_states_async(integration: dict) -> list:
+    """Non-blocking fetch_ha_states on the pooled async client."""
+    host = (integration or {}).get('host')
+    token = (integration or {}).get('token')
+    if not host or not token:
+        raise Exception("integration missing host or token")
+    headers = {'Accept': 'application/json'}
+    states_url = host.rstrip('/') + '/api/states'
+    try:
+        sresp = await ha_http.get_async_client(host, token).get(states_url, headers=headers, timeout=10)
+        sresp.raise_for_status()
+        return fast_json.loads(sresp.content) or []
+    except Exception as e:
+        raise Exception(f"failed to fetch states: {e}")
+
+
+def _load_state_map(integration: dict) -> dict:
+    """Return entity_id -> state, served from the live store when it is in sync."""
+    state_map = state_store.get_state_map()
+    if state_map is not None:
+        return state_map
+    states = fetch_ha_states(integration)
+    return {it.get('entity_id'): it for it in states if it.get('entity_id')}
+
+
+async def _load_state_map_async(integration: dict) -> dict:
+    state_map = state_store.get_state_map()
+    if state_map is not None:
+        return state_map
+    states = await fetch_ha_states_async(integration)
+    return {it.get('entity_id'): it for it in states if it.get('entity_id')}
+
+
+def _uses_room_templates(cfg: dict) -> bool:
+    """True when a synced room template exists, so rooms are built from cfg['rooms']."""
+    synced = cfg.get('synced') or {}
+    tracked_entities = [e for e in (synced.get('tracked_entities') or []) if isinstance(e, str)]
+    return bool(tracked_entities) and _has_valid_room_templates(cfg.get('rooms') or [])
+
+
+def _preferred_weather_entities(integration: dict, cfg: dict) -> list[str]:
+    synced = cfg.get('synced') or {}
+    preferred_weather = []
+    adv = cfg.get('advanced') or {}
+    integration_pref = integration.get('weather_entity') or (adv.get('weather_entity') if isinstance(adv, dict) else None)
+    preferred_weather.extend(_coerce_str_list(integration_pref))
+    synced_pref = synced.get('weather_entity') if isinstance(synced, dict) else None
+    preferred_weather.extend([p for p in _coerce_str_list(synced_pref) if p not in preferred_weather])
+    extra_weather = [ent for ent in (synced.get('extra_entities') or []) if isinstance(ent, str) and ent.startswith('weather.')] if isinstance(synced, dict) else []
+    for ent in extra_weather:
+        if ent not in preferred_weather:
+            preferred_weather.append(ent)
+    return preferred_weather
+
+
+def _shape_light_device(light: dict, info: dict) -> dict | None:
+    """Shape a templated light for the rooms payload; None when the entity is hidden."""
+    entity_id = info['entity_id']
+    st = info['state']
+    attrs = info['attrs']
+    labels = info['labels']
+    if light.get('labels'):
+        labels = _collect_labels(light.get('labels'), attrs.get('labels'), attrs.get('tags'), info['registry'].get('labels'))
+    if info['attr_hidden'] or 'hidden' in labels:
+        return None
+    device_entry = {
+        'id': entity_id,
+        'type': 'light',
+        'name': light.get('name') or attrs.get('friendly_name') or entity_id,
+        'state': st.get('state', light.get('state')),
+        'brightness': attrs.get('brightness', light.get('brightness', 0))
+    }
+    # preserve HA capability metadata so the frontend can expose the right controls
+    capability_attrs = {
+        'brightness': attrs.get('brightness', light.get('brightness')),
+        'rgb_color': attrs.get('rgb_color'),
+        'hs_color': attrs.get('hs_color'),
+        'xy_color': attrs.get('xy_color'),
+        'color_temp': attrs.get('color_temp'),
+        'color_mode': attrs.get('color_mode') or light.get('color_mode'),
+        'supported_color_modes': attrs.get('supported_color_modes') or light.get('supported_color_modes'),
+        'supported_features': attrs.get('supported_features') or light.get('supported_features'),
+        'min_mireds': attrs.get('min_mireds') or light.get('min_mireds'),
+        'max_mireds': attrs.get('max_mireds') or light.get('max_mireds')
+    }
+    device_entry.update({
+        'rgb_color': capability_attrs['rgb_color'],
+        'color_temp': capability_attrs['color_temp'],
+        'color_mode': capability_attrs['color_mode'],
+        'attributes': capability_attrs,
+        'labels': labels
+    })
+    return device_entry
+
+
 def fetch_ha_rooms(integration: dict, include_meta: bool = False):
     if not isinstance(integration, dict):
         raise Exception("integration not configured")
@@ -1027,9 +1490,130 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
     if not host or not token:
         raise Exception("integration missing host or token")
 
-    cfg = read_config()
+    # serve the materialized model while the live state store is in sync
+    if state_store.is_live():
+        from .room_model import get_live_rooms
+        live = get_live_rooms(integration)
+        if live is not None:
+            rooms, meta = live
+            if include_meta:
+                return rooms, meta
+            return rooms
+
+    cfg = get_config_snapshot()
+
+    # all states (will be filtered down using tracked_entities)
+    state_map = _load_state_map(integration)
+
+    try:
+        registry = load_registry_snapshot(integration)
+    except Exception:
+        registry = {'areas': {}, 'devices': {}, 'entities': {}}
+
+    rooms, meta = _build_ha_rooms(integration, cfg, state_map, registry)
+    if include_meta:
+        return rooms, meta
+    return rooms
+
+
+async def fetch_ha_rooms_async(integration: dict, include_meta: bool = False):
+    """fetch_ha_rooms for async endpoints.
+
+    HA I/O runs on the pooled async client; only the CPU-bound room build runs
+    on the HA worker threads, and a current room model is served directly.
+    Concurrent requests share one in-flight build (see _rooms_single_flight).
+    The returned rooms may be shared with other callers and must not be modified.
+    """
+    if not isinstance(integration, dict):
+        raise Exception("integration not configured")
+    _integration_credentials(integration)
+
+    live = None
+    if state_store.is_live():
+        from . import room_model
+        live = room_model.get_current_rooms(integration)
+    if live is None:
+        live = await _rooms_single_flight(integration)
+    rooms, meta = live
+    if include_meta:
+        return rooms, meta
+    return rooms
+
+
+_rooms_flights: dict = {}
+_rooms_recent: dict = {}
+_rooms_flight_stats = {'builds': 0, 'joined': 0, 'reused': 0}
+
+
+def _rooms_flight_key(integration: dict):
+    return (
+        integration.get('host'),
+        integration.get('token'),
+        get_config_version(),
+        state_store.get_generation(),
+        state_store.is_live(),
+    )
+
+
+async def _rooms_single_flight(integration: dict):
+    """Build (rooms, meta) once for all concurrent identical requests.
+
+    A finished build is reused for ROOMS_FRESHNESS seconds. Waiters are
+    shielded, so a client going away does not cancel the shared build.
+    """
+    key = _rooms_flight_key(integration)
+    recent = _rooms_recent.get(key)
+    if recent and time.monotonic() - recent[0] < ROOMS_FRESHNESS:
+        _rooms_flight_stats['reused'] += 1
+        return recent[1]
+    flight = _rooms_flights.get(key)
+    if flight is None:
+        _rooms_flight_stats['builds'] += 1
+        flight = asyncio.ensure_future(_build_rooms_async(integration))
+        _rooms_flights[key] = flight
+
+        def _landed(done, key=key):
+            _rooms_flights.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                _rooms_recent.clear()
+                _rooms_recent[key] = (time.monotonic(), done.result())
+
+        flight.add_done_callback(_landed)
+    else:
+        _rooms_flight_stats['joined'] += 1
+    return await asyncio.shield(flight)
+
+
+async def _build_rooms_async(integration: dict):
+    if state_store.is_live():
+        from . import room_model
+        live = await run_blocking(room_model.get_live_rooms, integration)
+        if live is not None:
+            return live
+    cfg = get_config_snapshot()
+    state_map = await _load_state_map_async(integration)
+    try:
+        registry = await load_registry_snapshot_async(integration)
+    except Exception:
+        registry = {'areas': {}, 'devices': {}, 'entities': {}}
+    return await run_blocking(_build_ha_rooms, integration, cfg, state_map, registry)
+
+
+def get_rooms_flight_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    return {
+        'inflight': len(_rooms_flights),
+        'freshness': ROOMS_FRESHNESS,
+        **_rooms_flight_stats,
+    }
+
+
+def _build_ha_rooms(integration: dict, cfg: dict, state_map: dict, registry: dict) -> tuple[list, dict]:
+    """Build the rooms payload and its meta (weather, gates) from a state map."""
+    host = integration.get('host')
+    token = integration.get('token')
     synced = cfg.get('synced') or {}
-    tracked_entities: List[str] = [e for e in (synced.get('tracked_entities') or []) if isinstance(e, str)]
+    tracked_entities = {e for e in (synced.get('tracked_entities') or []) if isinstance(e, str)}
     room_templates = cfg.get('rooms') or []
     background_map = {}
     for template in room_templates:
@@ -1039,24 +1623,6 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
         if room_id:
             background_map[room_id] = template.get('background', '')
 
-    headers = {'Authorization': f"Bearer {token}", 'Accept': 'application/json'}
-    states_url = host.rstrip('/') + '/api/states'
-
-    # fetch all states (will be filtered down using tracked_entities)
-    try:
-        sresp = requests.get(states_url, headers=headers, timeout=10)
-        sresp.raise_for_status()
-        states = sresp.json()
-    except Exception as e:
-        raise Exception(f"failed to fetch states: {e}")
-
-    state_map = {it.get('entity_id'): it for it in states if it.get('entity_id')}
-
-    try:
-        registry = load_registry_snapshot(integration)
-    except Exception:
-        registry = {'areas': {}, 'devices': {}, 'entities': {}}
-    
     entity_registry = registry.get('entities') or {}
     device_map = registry.get('devices') or {}
     area_map = registry.get('areas') or {}
@@ -1065,7 +1631,7 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
     if not entity_registry:
         try:
             headers = {'Authorization': f'Bearer {token}'}
-            reg_resp = requests.get(f'{host}/api/config/entity_registry/list', headers=headers, timeout=10)
+            reg_resp = ha_http.get_session(host, token).get(f'{host}/api/config/entity_registry/list', headers=headers, timeout=10)
             if reg_resp.status_code == 200:
                 entities_list = reg_resp.json()
                 for ent in entities_list:
@@ -1081,7 +1647,8 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
         except Exception:
             pass
     
-    scenes_by_room, fallback_scenes = _gather_light_scenes(state_map, entity_registry, device_map)
+    classified = _classify_entities(state_map, entity_registry, device_map)
+    scenes_by_room, fallback_scenes = _gather_light_scenes(classified)
 
     # Build climate mapping from room templates for fallback when registry is empty
     climate_map_from_config = {}
@@ -1095,40 +1662,29 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
                 entity_id = climate_entry.get('entity_id')
                 if entity_id:
                     climate_map_from_config[entity_id] = room_id
-    print(f"DEBUG: Climate map from config: {climate_map_from_config}")
+    logger.debug("Climate map from config: %s", climate_map_from_config)
     _collect_climate_entities._room_climate_map = climate_map_from_config
 
-    preferred_weather = []
-    adv = cfg.get('advanced') or {}
-    integration_pref = integration.get('weather_entity') or (adv.get('weather_entity') if isinstance(adv, dict) else None)
-    preferred_weather.extend(_coerce_str_list(integration_pref))
-    synced_pref = synced.get('weather_entity') if isinstance(synced, dict) else None
-    preferred_weather.extend([p for p in _coerce_str_list(synced_pref) if p not in preferred_weather])
-    extra_weather = [ent for ent in (synced.get('extra_entities') or []) if isinstance(ent, str) and ent.startswith('weather.')] if isinstance(synced, dict) else []
-    for ent in extra_weather:
-        if ent not in preferred_weather:
-            preferred_weather.append(ent)
+    preferred_weather = _preferred_weather_entities(integration, cfg)
     weather_snapshot = _extract_weather_snapshot(state_map, preferred_weather)
     if weather_snapshot:
         weather_snapshot = _enrich_weather_forecast(weather_snapshot, host, token)
-    camera_entries = _collect_camera_entities(state_map, entity_registry, device_map)
-    security_devices = _collect_security_entities(state_map, entity_registry, device_map, area_map)
+    camera_entries = _collect_camera_entities(classified)
+    security_devices = _collect_security_entities(classified, area_map)
     
     # Collect comfort devices (covers and climate)
-    covers_by_room = _collect_cover_entities(state_map, entity_registry, device_map)
-    climate_by_room = _collect_climate_entities(state_map, entity_registry, device_map)
-    room_temp_sensors = _collect_room_temperature_sensors(state_map, entity_registry, device_map)
+    covers_by_room = _collect_cover_entities(classified, device_map)
+    climate_by_room = _collect_climate_entities(classified)
+    room_temp_sensors = _collect_room_temperature_sensors(classified, device_map)
     
     # Collect global gate entities
-    gate_entities = _collect_gate_entities(state_map, entity_registry, device_map)
+    gate_entities = _collect_gate_entities(classified)
 
     # if no synced template is available yet, fall back to legacy discovery logic
-    if not tracked_entities or not _has_valid_room_templates(room_templates):
-        rooms_only = _legacy_room_fetch(state_map, integration, background_map)
+    if not _uses_room_templates(cfg):
+        rooms_only = _legacy_room_fetch(state_map, integration, background_map, registry, classified)
         rooms_only = _attach_cameras_to_rooms(rooms_only, camera_entries)
-        if include_meta:
-            return rooms_only, ({'weather': weather_snapshot} if weather_snapshot else {})
-        return rooms_only
+        return rooms_only, ({'weather': weather_snapshot} if weather_snapshot else {})
 
     # Build the full room list with devices
     rooms = []
@@ -1144,40 +1700,12 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
             entity_id = light.get('entity_id')
             if not entity_id or entity_id not in tracked_entities:
                 continue
-            st = state_map.get(entity_id)
-            attrs = (st or {}).get('attributes') or {}
-            registry_entry = entity_registry.get(entity_id) or {}
-            labels = _collect_labels(light.get('labels'), attrs.get('labels'), attrs.get('tags'), registry_entry.get('labels'))
-            if _should_hide_entity(attrs, registry_entry, labels):
-                continue
-            device_entry = {
-                'id': entity_id,
-                'type': 'light',
-                'name': light.get('name') or attrs.get('friendly_name') or entity_id,
-                'state': (st or {}).get('state', light.get('state')),
-                'brightness': attrs.get('brightness', light.get('brightness', 0))
-            }
-            # preserve HA capability metadata so the frontend can expose the right controls
-            capability_attrs = {
-                'brightness': attrs.get('brightness', light.get('brightness')),
-                'rgb_color': attrs.get('rgb_color'),
-                'hs_color': attrs.get('hs_color'),
-                'xy_color': attrs.get('xy_color'),
-                'color_temp': attrs.get('color_temp'),
-                'color_mode': attrs.get('color_mode') or light.get('color_mode'),
-                'supported_color_modes': attrs.get('supported_color_modes') or light.get('supported_color_modes'),
-                'supported_features': attrs.get('supported_features') or light.get('supported_features'),
-                'min_mireds': attrs.get('min_mireds') or light.get('min_mireds'),
-                'max_mireds': attrs.get('max_mireds') or light.get('max_mireds')
-            }
-            device_entry.update({
-                'rgb_color': capability_attrs['rgb_color'],
-                'color_temp': capability_attrs['color_temp'],
-                'color_mode': capability_attrs['color_mode'],
-                'attributes': capability_attrs,
-                'labels': labels
-            })
-            devices.append(device_entry)
+            info = classified['by_id'].get(entity_id)
+            if info is None:
+                info = _classify_entity(entity_id, state_map.get(entity_id), entity_registry.get(entity_id), device_map)
+            device_entry = _shape_light_device(light, info)
+            if device_entry:
+                devices.append(device_entry)
 
         room_scenes = list(scenes_by_room.get(room_id) or [])
         if fallback_scenes:
@@ -1201,37 +1729,35 @@ def fetch_ha_rooms(integration: dict, include_meta: bool = False):
 
     rooms = _attach_cameras_to_rooms(rooms, camera_entries)
 
-    if include_meta:
-        meta = {'weather': weather_snapshot} if weather_snapshot else {}
-        meta['gates'] = gate_entities
-        return rooms, meta
-
-    return rooms
+    meta = {'weather': weather_snapshot} if weather_snapshot else {}
+    meta['gates'] = gate_entities
+    return rooms, meta
 
 
-def _legacy_room_fetch(state_map: dict, integration: dict, backgrounds: dict | None = None) -> list:
+def _legacy_room_fetch(state_map: dict, integration: dict, backgrounds: dict | None = None,
+                       registry: dict | None = None, classified: dict | None = None) -> list:
     """Fallback to previous discovery behaviour when no synced config exists."""
-    try:
-        registry = load_registry_snapshot(integration)
-    except Exception:
-        registry = {'areas': {}, 'devices': {}, 'entities': {}, 'table': []}
+    if registry is None:
+        try:
+            registry = load_registry_snapshot(integration)
+        except Exception:
+            registry = {'areas': {}, 'devices': {}, 'entities': {}, 'table': []}
 
     area_map = registry.get('areas') or {}
     device_map = registry.get('devices') or {}
     entity_registry = registry.get('entities') or {}
+    if classified is None:
+        classified = _classify_entities(state_map, entity_registry, device_map)
 
     rooms = {}
     backgrounds = backgrounds or {}
-    for entity_id, ent in state_map.items():
-        if not entity_id:
-            continue
-        domain = entity_id.split('.', 1)[0] if '.' in entity_id else None
-        if domain != 'light':
-            continue
-        attrs = ent.get('attributes', {}) or {}
-        entity_meta = entity_registry.get(entity_id) or {}
+    for info in classified['buckets']['light']:
+        entity_id = info['entity_id']
+        ent = info['state']
+        attrs = info['attrs']
+        entity_meta = info['registry']
         labels = _collect_labels(attrs.get('labels'), entity_meta.get('labels'))
-        if _should_hide_entity(attrs, entity_meta, labels):
+        if info['attr_hidden'] or 'hidden' in labels:
             continue
         dev_id = entity_meta.get('device_id') or attrs.get('device_id') or ent.get('context', {}).get('device_id')
         area_id = entity_meta.get('area_id') or attrs.get('area_id') or attrs.get('room')
@@ -1275,7 +1801,7 @@ def _legacy_room_fetch(state_map: dict, integration: dict, backgrounds: dict | N
         rooms[room_key]['devices'].append(device)
 
     room_list = list(rooms.values())
-    scenes_by_room, fallback_scenes = _gather_light_scenes(state_map, entity_registry, device_map)
+    scenes_by_room, fallback_scenes = _gather_light_scenes(classified)
     for room in room_list:
         room_id = room.get('id')
         scene_list = list(scenes_by_room.get(room_id) or [])
@@ -1287,7 +1813,6 @@ def _legacy_room_fetch(state_map: dict, integration: dict, backgrounds: dict | N
 
 def refresh_room_snapshot(integration: dict, existing_rooms: list | None = None) -> dict:
     """Build a synced snapshot of HA rooms and tracked entities."""
-    import requests
     if not integration:
         raise Exception("integration not configured")
     host = integration.get('host')
@@ -1295,20 +1820,12 @@ def refresh_room_snapshot(integration: dict, existing_rooms: list | None = None)
     if not host or not token:
         raise Exception("integration missing host or token")
 
-    headers = {'Authorization': f"Bearer {token}", 'Accept': 'application/json'}
-    states_url = host.rstrip('/') + '/api/states'
-
     try:
         registry = load_registry_snapshot(integration)
     except Exception:
         registry = {'areas': {}, 'devices': {}, 'entities': {}}
 
-    try:
-        sresp = requests.get(states_url, headers=headers, timeout=10)
-        sresp.raise_for_status()
-        states = sresp.json() or []
-    except Exception as e:
-        raise Exception(f"failed to fetch states: {e}")
+    states = list(_load_state_map(integration).values())
 
     extra_entities = _normalize_entity_list((integration or {}).get('extra_entities'))
     area_map = registry.get('areas') or {}
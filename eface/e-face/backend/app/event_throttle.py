@@ -0,0 +1,123 @@
+"""Per-entity rate limiting of state updates forwarded to ``/ws`` clients.
+
+Chatty entities (power meters, media positions) may change many times per
+second.  Their updates are held back so that at most one goes out per
+interval; the latest value always wins and is flushed when the interval
+ends.  Discrete domains (lights, covers, alarms, ...) are forwarded
+immediately.  The state store and room model are not affected, they still
+see every event.
+
+Intervals come from ``advanced.ws_throttle`` in the config, a mapping of
+entity id patterns (fnmatch) or bare domains to seconds, e.g.
+``{"sensor": 1, "sensor.*_rssi": 30, "media_player": 2}``.  Entity patterns
+win over domains; without configuration :data:`DEFAULT_INTERVALS` apply.
+"""
+
+import asyncio
+import fnmatch
+import logging
+from typing import Any, Dict, List, Tuple
+
+from . import core, ws_hub
+
+logger = logging.getLogger("e-face.event_throttle")
+
+DEFAULT_INTERVALS = {'sensor': 1.0, 'media_player': 1.0}
+DISCRETE_DOMAINS = {
+    'alarm_control_panel', 'binary_sensor', 'button', 'camera', 'cover', 'event',
+    'input_boolean', 'input_button', 'light', 'lock', 'scene', 'script', 'siren', 'switch',
+}
+
+_rules: Dict[str, Any] = {'version': None, 'patterns': [], 'domains': {}, 'by_entity': {}}
+_last_sent: Dict[str, float] = {}
+_pending: Dict[str, List[Tuple[dict, str | None]]] = {}
+_timers: Dict[str, asyncio.TimerHandle] = {}
+_stats = {'forwarded': 0, 'coalesced': 0}
+
+
+def _load_rules():
+    version = core.get_config_version()
+    if _rules['version'] == version:
+        return
+    advanced = core.get_config_snapshot().get('advanced') or {}
+    configured = advanced.get('ws_throttle')
+    if not isinstance(configured, dict):
+        configured = DEFAULT_INTERVALS
+    patterns = []
+    domains = {}
+    for key, value in configured.items():
+        try:
+            seconds = max(0.0, float(value))
+        except (TypeError, ValueError):
+            logger.warning("Ignoring ws_throttle rule %s=%r", key, value)
+            continue
+        if '.' in key or any(ch in key for ch in '*?['):
+            patterns.append((key, seconds))
+        else:
+            domains[key] = seconds
+    _rules.update(version=version, patterns=patterns, domains=domains, by_entity={})
+
+
+def interval_for(entity_id: str) -> float:
+    """Minimum seconds between two updates of entity_id (0 means no limit)."""
+    _load_rules()
+    cached = _rules['by_entity'].get(entity_id)
+    if cached is not None:
+        return cached
+    seconds = None
+    for pattern, value in _rules['patterns']:
+        if fnmatch.fnmatchcase(entity_id, pattern):
+            seconds = value
+            break
+    if seconds is None:
+        domain = entity_id.split('.', 1)[0]
+        seconds = 0.0 if domain in DISCRETE_DOMAINS else _rules['domains'].get(domain, 0.0)
+    _rules['by_entity'][entity_id] = seconds
+    return seconds
+
+
+def _send(items):
+    for message, topic in items:
+        ws_hub.publish(message, topic)
+    _stats['forwarded'] += 1
+
+
+def submit(entity_id: str, items: List[Tuple[dict, str | None]]):
+    """Forward the messages of one state change now or at the end of the entity's window.
+
+    Must be called from the event loop thread.
+    """
+    interval = interval_for(entity_id)
+    if interval <= 0:
+        _send(items)
+        return
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    last = _last_sent.get(entity_id)
+    if entity_id not in _pending and (last is None or now - last >= interval):
+        _last_sent[entity_id] = now
+        _send(items)
+        return
+    if entity_id in _pending:
+        _stats['coalesced'] += 1
+    _pending[entity_id] = items
+    if entity_id not in _timers:
+        _timers[entity_id] = loop.call_at((last or now) + interval, _flush, entity_id)
+
+
+def _flush(entity_id: str):
+    _timers.pop(entity_id, None)
+    items = _pending.pop(entity_id, None)
+    if items is None:
+        return
+    _last_sent[entity_id] = asyncio.get_running_loop().time()
+    _send(items)
+
+
+def get_status() -> Dict[str, Any]:
+    """Return diagnostics info for admin UI."""
+    return {
+        'pending': len(_pending),
+        'forwarded': _stats['forwarded'],
+        'coalesced': _stats['coalesced'],
+    }
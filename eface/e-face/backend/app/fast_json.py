@@ -0,0 +1,62 @@
+"""JSON encoding/decoding for API responses, /ws frames and HA payloads.
+
+Uses orjson when it is installed and the standard library otherwise.  Both
+produce the compact form Starlette's JSONResponse and send_json emit
+(``,``/``:`` separators, UTF-8, no ASCII escaping), so clients see the same
+JSON either way.  Values orjson refuses (integers beyond 64 bit, non-string
+dict keys it cannot coerce, ...) fall back to the standard library.
+"""
+
+import json
+import logging
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+logger = logging.getLogger("e-face.fast_json")
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _std_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':'))
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return _std_dumps(obj).encode('utf-8')
+
+
+def dumps_str(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    return _std_dumps(obj)
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with :func:`dumps`.
+
+    Returning it directly from an endpoint also skips FastAPI's
+    jsonable_encoder, which matters for large payloads.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,198 @@
+"""Long-lived, connection-pooled HTTP clients for Home Assistant.
+
+Every REST call to Home Assistant used to open a fresh TCP (and TLS)
+connection, which costs 50-200 ms per request on remote setups.  This module
+keeps one ``requests.Session`` for the sync code paths and one
+``httpx.AsyncClient`` for the async ones per origin, both with keep-alive
+pools.  The async client speaks HTTP/2 when the optional ``h2`` package is
+installed.  A client carries the bearer token of its origin as default
+header and is rebuilt only when that token changes; the replaced async
+client is closed once the streams still open on it have ended.
+
+Per-request timeouts stay with the callers.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Dict
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("e-face.ha_http")
+
+# Connections kept open per Home Assistant origin.
+POOL_SIZE = max(1, int(os.environ.get("EFACE_HA_HTTP_POOL", "20")))
+# Seconds an idle keep-alive connection is kept (HA's own server timeout is 75 s).
+KEEPALIVE_EXPIRY = max(1, int(os.environ.get("EFACE_HA_HTTP_KEEPALIVE", "60")))
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_sessions: Dict[str, Dict[str, Any]] = {}
+_async_clients: Dict[str, Dict[str, Any]] = {}
+_stats = {'sessions_built': 0, 'async_clients_built': 0}
+
+
+def _origin(url: str) -> str:
+    normalized = (url or '').strip()
+    if '://' not in normalized:
+        normalized = f"http://{normalized}"
+    parsed = urlparse(normalized)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+def _auth_headers(token: str | None) -> dict:
+    return {'Authorization': f"Bearer {token}"} if token else {}
+
+
+def get_session(url: str, token: str | None = None) -> requests.Session:
+    """Pooled session for the origin of url; token becomes the default Authorization."""
+    origin = _origin(url)
+    with _lock:
+        entry = _sessions.get(origin)
+        if entry and entry['token'] == token:
+            return entry['session']
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(_auth_headers(token))
+        _sessions[origin] = {'session': session, 'token': token}
+        _stats['sessions_built'] += 1
+    if entry:
+        logger.info("Rebuilding HTTP session for %s (token changed)", origin)
+        entry['session'].close()
+    return session
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    def __init__(self, transport: '_TrackedTransport', stream: httpx.AsyncByteStream):
+        self._transport = transport
+        self._stream = stream
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._stream.aclose()
+        finally:
+            self._transport.released()
+
+
+class _TrackedTransport(httpx.AsyncHTTPTransport):
+    """Transport counting open responses, so a replaced client can wait for them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.retired = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        self.active += 1
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(self, response.stream),
+            extensions=response.extensions,
+        )
+
+    def released(self):
+        self.active -= 1
+        if self.retired and not self.active:
+            asyncio.get_running_loop().create_task(self.aclose())
+
+    def retire(self):
+        """Close the pool now if idle, otherwise when the last response is closed."""
+        self.retired = True
+        if not self.active:
+            asyncio.get_running_loop().create_task(self.aclose())
+
+
+def _retire_async_client(origin: str, entry: Dict[str, Any], loop: asyncio.AbstractEventLoop):
+    if entry['loop'] is loop:
+        logger.info("Rebuilding async HTTP client for %s (token changed)", origin)
+        entry['transport'].retire()
+    elif entry['loop'].is_running() and not entry['loop'].is_closed():
+        logger.info("Closing async HTTP client for %s on its previous event loop", origin)
+        asyncio.run_coroutine_threadsafe(entry['client'].aclose(), entry['loop'])
+    else:
+        logger.info("Dropping async HTTP client for %s bound to a finished event loop", origin)
+
+
+def get_async_client(url: str, token: str | None = None) -> httpx.AsyncClient:
+    """Pooled async client for the origin of url, bound to the running event loop."""
+    origin = _origin(url)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        entry = _async_clients.get(origin)
+        if entry and entry['token'] == token and entry['loop'] is loop:
+            return entry['client']
+        transport = _TrackedTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE * 2,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        client = httpx.AsyncClient(
+            transport=transport,
+            headers=_auth_headers(token),
+            timeout=httpx.Timeout(15.0),
+        )
+        _async_clients[origin] = {'client': client, 'transport': transport, 'token': token, 'loop': loop}
+        _stats['async_clients_built'] += 1
+    if entry:
+        _retire_async_client(origin, entry, loop)
+    return client
+
+
+def session_for(integration: dict | None) -> requests.Session:
+    """Session for the local Home Assistant host of an integration config."""
+    integration = integration or {}
+    return get_session(integration.get('host') or '', integration.get('token'))
+
+
+def async_client_for(integration: dict | None) -> httpx.AsyncClient:
+    integration = integration or {}
+    return get_async_client(integration.get('host') or '', integration.get('token'))
+
+
+async def close_all():
+    """Close every pooled client; called on application shutdown."""
+    with _lock:
+        sessions = [entry['session'] for entry in _sessions.values()]
+        clients = [entry for entry in _async_clients.values()]
+        _sessions.clear()
+        _async_clients.clear()
+    for session in sessions:
+        session.close()
+    loop = asyncio.get_running_loop()
+    for entry in clients:
+        if entry['loop'] is loop:
+            await entry['client'].aclose()
+
+
+def get_status() -> Dict[str, Any]:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        return {
+            'http2': HTTP2_AVAILABLE,
+            'pool_size': POOL_SIZE,
+            'sessions': sorted(_sessions),
+            'async_clients': sorted(_async_clients),
+            'sessions_built': _stats['sessions_built'],
+            'async_clients_built': _stats['async_clients_built'],
+        }
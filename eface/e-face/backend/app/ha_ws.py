@@ -1,22 +1,45 @@
 import asyncio
 import json
 import logging
-from typing import Set
+import os
 
 import websockets
-from fastapi import WebSocket
 
-from .core import read_config, load_registry_snapshot
+from .core import get_config_snapshot, get_rooms_flight_status, load_registry_snapshot_async, fetch_ha_states_async
 from .registry_cache import set_registry_snapshot
+from . import compression, event_throttle, fast_json, ha_http, hls_cache, mjpeg_relay, room_model, snapshot_cache, snapshot_prefetch, state_store, weather_cache, ws_hub
+from .ws_hub import broadcast
 
 logger = logging.getLogger("e-face.ha_ws")
 
-# connected frontend websockets (starlette WebSocket objects)
-clients: Set[WebSocket] = set()
 last_event: dict | None = None
 last_connect_time: float | None = None
 recent_events: list = []
 MAX_EVENTS = 200
+# full /api/states resync interval while connected, guards against missed events
+STATE_RESYNC_INTERVAL = max(60, int(os.environ.get("EFACE_STATE_RESYNC_INTERVAL", "600")))
+# seconds to wait for the result of a command sent over the HA websocket
+COMMAND_TIMEOUT = max(1, int(os.environ.get("EFACE_HA_COMMAND_TIMEOUT", "10")))
+# ids below this are used by the fixed subscriptions and registry requests
+COMMAND_ID_START = 100
+# CommandError codes HA uses where the REST API answers 400
+INVALID_REQUEST_CODES = {'invalid_format', 'not_found', 'service_validation_error'}
+
+# command channel on top of the HA websocket: id -> future awaiting the result
+_commands: dict = {'ws': None, 'next_id': COMMAND_ID_START, 'pending': {}, 'sent': 0, 'failed': 0}
+
+
+class CommandUnavailable(Exception):
+    """The HA websocket is not connected; callers fall back to REST."""
+
+
+class CommandError(Exception):
+    """Home Assistant answered a command with success=false."""
+
+    def __init__(self, code: str | None, message: str | None):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
 
 
 def _extract_entity_update(event_payload: dict | None):
@@ -44,28 +67,135 @@ def _extract_entity_update(event_payload: dict | None):
     }
 
 
-async def broadcast(message: dict):
-    """Send a JSON message to all connected frontend websockets."""
-    to_remove = []
-    for ws in list(clients):
-        try:
-            await ws.send_json(message)
-        except Exception:
-            to_remove.append(ws)
-    for ws in to_remove:
-        try:
-            clients.remove(ws)
-        except KeyError:
-            pass
+async def _resync_state_store(integration: dict):
+    """Seed the live state store from a full REST snapshot without blocking the loop."""
+    started_at = state_store.snapshot_started()
+    try:
+        states = await fetch_ha_states_async(integration)
+    except Exception as e:
+        logger.warning("State store resync failed: %s", e)
+        return
+    state_store.seed_states(states, source='rest', started_at=started_at)
+    # warm the forecast cache so the first rooms request already has forecasts
+    for item in states or []:
+        entity_id = item.get('entity_id') if isinstance(item, dict) else None
+        if isinstance(entity_id, str) and entity_id.startswith('weather.'):
+            weather_cache.request_refresh(integration.get('host'), integration.get('token'), entity_id)
+
+
+def _apply_state_event(event_payload: dict | None, integration: dict):
+    if not isinstance(event_payload, dict) or event_payload.get('event_type') != 'state_changed':
+        return
+    data = event_payload.get('data') or {}
+    entity_id = data.get('entity_id')
+    if entity_id and state_store.apply_state_changed(entity_id, data.get('new_state')):
+        room_model.apply_state_changed(entity_id, data.get('new_state'))
+        if entity_id.startswith('weather.') and data.get('new_state'):
+            weather_cache.request_refresh(integration.get('host'), integration.get('token'), entity_id, force=True)
+        snapshot_prefetch.notify_state_changed(entity_id, data.get('new_state'))
+
+
+def _next_command_id() -> int:
+    command_id = _commands['next_id']
+    _commands['next_id'] = command_id + 1
+    return command_id
+
+
+def _open_command_channel(ws):
+    _commands['ws'] = ws
+
+
+def _close_command_channel(reason: str = 'disconnected'):
+    """Fail every command still waiting for a result; HA ids restart on the next connection."""
+    _commands['ws'] = None
+    _commands['next_id'] = COMMAND_ID_START
+    pending = _commands['pending']
+    _commands['pending'] = {}
+    for future in pending.values():
+        if not future.done():
+            future.set_exception(ConnectionError(f"ha_ws_{reason}"))
+
+
+def _resolve_command(data: dict) -> bool:
+    future = _commands['pending'].pop(data.get('id'), None)
+    if future is None:
+        return False
+    if not future.done():
+        if data.get('success'):
+            future.set_result(data.get('result'))
+        else:
+            error = data.get('error') or {}
+            future.set_exception(CommandError(error.get('code'), error.get('message')))
+    return True
+
+
+def command_channel_ready() -> bool:
+    return _commands['ws'] is not None
+
+
+async def send_command(message: dict, timeout: float | None = None):
+    """Send a command over the HA websocket and await its result.
+
+    Raises CommandUnavailable when the socket is down (nothing was sent),
+    CommandError when HA rejects the command, ConnectionError when the socket
+    drops and asyncio.TimeoutError when no result arrives in time; in the last
+    two cases the command may or may not have been executed.
+    """
+    ws = _commands['ws']
+    if ws is None:
+        raise CommandUnavailable("ha_ws_disconnected")
+    command_id = _next_command_id()
+    future = asyncio.get_running_loop().create_future()
+    _commands['pending'][command_id] = future
+    try:
+        await ws.send(json.dumps({**message, 'id': command_id}))
+    except Exception as exc:
+        _commands['pending'].pop(command_id, None)
+        raise CommandUnavailable(f"ha_ws_send_failed:{exc}") from exc
+    _commands['sent'] += 1
+    try:
+        return await asyncio.wait_for(future, timeout or COMMAND_TIMEOUT)
+    except Exception:
+        _commands['failed'] += 1
+        raise
+    finally:
+        _commands['pending'].pop(command_id, None)
+
+
+async def call_service(domain: str, service: str, service_data: dict | None = None, timeout: float | None = None):
+    """Call a Home Assistant service over the websocket (see send_command for errors)."""
+    return await send_command({
+        'type': 'call_service',
+        'domain': domain,
+        'service': service,
+        'service_data': service_data or {},
+    }, timeout)
 
 
 def get_status():
     """Return diagnostics info for admin UI."""
     return {
-        'ws_clients': len(clients),
+        'ws_clients': ws_hub.client_count(),
+        'ws_hub': ws_hub.get_status(),
+        'event_throttle': event_throttle.get_status(),
         'last_event': last_event,
         'last_connect_time': last_connect_time,
         'recent_events_count': len(recent_events),
+        'state_store': state_store.get_status(),
+        'weather_cache': weather_cache.get_status(),
+        'ha_http': ha_http.get_status(),
+        'compression': compression.get_status(),
+        'hls_cache': hls_cache.get_status(),
+        'mjpeg_relay': mjpeg_relay.get_status(),
+        'snapshot_cache': snapshot_cache.get_status(),
+        'snapshot_prefetch': snapshot_prefetch.get_status(),
+        'rooms_flight': get_rooms_flight_status(),
+        'commands': {
+            'connected': command_channel_ready(),
+            'pending': len(_commands['pending']),
+            'sent': _commands['sent'],
+            'failed': _commands['failed'],
+        },
     }
 
 
@@ -73,7 +203,7 @@ async def ha_ws_task():
     """Background task that connects to Home Assistant websocket and forwards events to clients."""
     while True:
         try:
-            cfg = read_config()
+            cfg = get_config_snapshot()
             integration = (cfg.get('advanced') or {}).get('integration') or {}
             if not integration.get('enabled'):
                 await asyncio.sleep(3)
@@ -104,7 +234,7 @@ async def ha_ws_task():
 
                 # Home Assistant may first send an auth_required message; wait for it
                 try:
-                    server_msg = json.loads(await ws.recv())
+                    server_msg = fast_json.loads(await ws.recv())
                 except websockets.exceptions.ConnectionClosedOK:
                     logger.info("HA websocket closed immediately after connect (1000 OK)")
                     continue
@@ -119,7 +249,7 @@ async def ha_ws_task():
                 await ws.send(json.dumps({"type": "auth", "access_token": token}))
                 try:
                     auth_raw = await ws.recv()
-                    auth_resp = json.loads(auth_raw)
+                    auth_resp = fast_json.loads(auth_raw)
                 except websockets.exceptions.ConnectionClosedOK:
                     logger.info("HA websocket closed during auth (1000 OK)")
                     continue
@@ -151,6 +281,11 @@ async def ha_ws_task():
                     await ws.send(json.dumps({"id": state_event_sub_id, "type": "subscribe_events", "event_type": "state_changed"}))
                     logger.info("Subscribed to fallback state_changed events")
 
+                # state_changed is subscribed now, so a snapshot taken from here on cannot miss events
+                state_store.mark_connected()
+                resync_task = asyncio.create_task(_resync_state_store(integration))
+                last_state_resync = asyncio.get_event_loop().time()
+
                 # request registries (areas, devices, entities) so we can map entity->device->area
                 reg_ids = {"areas": 10, "devices": 11, "entities": 12}
                 try:
@@ -164,7 +299,7 @@ async def ha_ws_task():
                 # REST fallback: if websocket registry results aren't delivered promptly,
                 # use the config API endpoints to produce a registry snapshot and broadcast it immediately.
                 try:
-                    snapshot = load_registry_snapshot(integration, allow_ws_fallback=False)
+                    snapshot = await load_registry_snapshot_async(integration, allow_ws_fallback=False)
                     if snapshot and (snapshot.get('areas') or snapshot.get('devices') or snapshot.get('entities')):
                         set_registry_snapshot({ **snapshot, 'ts': asyncio.get_event_loop().time(), 'source': 'rest-fallback' })
                         payload = { **snapshot, 'type': 'ha_registry', 'source': 'rest-fallback' }
@@ -178,6 +313,9 @@ async def ha_ws_task():
                 except Exception:
                     logger.exception("Error during REST registry fallback")
 
+                # subscriptions and registry requests are out, commands may use the socket now
+                _open_command_channel(ws)
+
                 # placeholders for registry results
                 reg_results = {'areas': None, 'devices': None, 'entities': None}
 
@@ -201,10 +339,13 @@ async def ha_ws_task():
                         break
 
                     try:
-                        data = json.loads(msg)
+                        data = fast_json.loads(msg)
                     except Exception:
                         continue
 
+                    if data.get('type') == 'result' and _resolve_command(data):
+                        continue
+
                     # handle registry result responses (type == 'result')
                     if data.get('type') == 'result' and data.get('id') in reg_ids.values():
                         try:
@@ -282,6 +423,8 @@ async def ha_ws_task():
                         if event_type in ('area_registry_updated', 'device_registry_updated', 'entity_registry_updated'):
                             try:
                                 reg_results = {'areas': None, 'devices': None, 'entities': None}
+                                # HA requires increasing ids, so re-requests take fresh ones
+                                reg_ids = {name: _next_command_id() for name in reg_ids}
                                 await ws.send(json.dumps({"id": reg_ids['areas'], "type": "config/area_registry/list"}))
                                 await ws.send(json.dumps({"id": reg_ids['devices'], "type": "config/device_registry/list"}))
                                 await ws.send(json.dumps({"id": reg_ids['entities'], "type": "config/entity_registry/list"}))
@@ -297,28 +440,50 @@ async def ha_ws_task():
                             if len(recent_events) > MAX_EVENTS:
                                 recent_events.pop(0)
 
+                            _apply_state_event(event_payload, integration)
+
                             update_payload = _extract_entity_update(event_payload)
+                            messages = []
                             if update_payload:
-                                await broadcast({
+                                messages.append(({
                                     'type': 'ha_entity_update',
                                     **update_payload
-                                })
-
-                            await broadcast({"type": "ha_event", "event": event_payload})
+                                }, None))
+
+                            # state_changed events are also sent as ha_entity_update above,
+                            # so clients can opt out of this copy via the ws hello
+                            topic = 'ha_event/state_changed' if event_type == 'state_changed' else 'ha_event/entities'
+                            messages.append(({"type": "ha_event", "event": event_payload}, topic))
+                            if update_payload and event_type == 'state_changed':
+                                # chatty entities are rate limited per entity before fan-out
+                                event_throttle.submit(update_payload['entity_id'], messages)
+                            else:
+                                for message, message_topic in messages:
+                                    ws_hub.publish(message, message_topic)
 
                     # periodically detect configuration refreshes and restart subscription
                     now = asyncio.get_event_loop().time()
                     if now - last_sync_check > 5:
                         last_sync_check = now
+                        if now - last_state_resync > STATE_RESYNC_INTERVAL and resync_task.done():
+                            last_state_resync = now
+                            resync_task = asyncio.create_task(_resync_state_store(integration))
                         try:
-                            latest_cfg = read_config()
+                            latest_cfg = get_config_snapshot()
                             latest_sync_version = (latest_cfg.get('synced') or {}).get('synced_at')
                             if latest_sync_version and latest_sync_version != sync_version:
                                 logger.info("Detected new synced configuration (%s -> %s); restarting HA websocket", sync_version, latest_sync_version)
                                 break
                         except Exception:
                             logger.exception("Failed to check synced configuration version")
+
+                # loop exited: the connection is gone, so the store can no longer be trusted
+                resync_task.cancel()
+                state_store.mark_disconnected()
+                _close_command_channel()
         except Exception as e:
+            _close_command_channel('error')
+            state_store.mark_disconnected('error')
             logger.exception("HA websocket client error: %s", e)
             await asyncio.sleep(5)
 
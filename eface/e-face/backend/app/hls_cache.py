@@ -0,0 +1,186 @@
+"""Shared cache for HLS playlists and segments proxied from Home Assistant.
+
+Every viewer of a camera gets its own stream session, but they all read the
+same upstream objects.  Objects are cached per camera, keyed by upstream URL
+and query, and expired by TTL; segments are bounded in bytes (LRU), playlists
+in number, so turning the segment cache off keeps playlist caching.
+Concurrent requests for an object that is being downloaded wait for that one
+download.  Playlists are kept only briefly; their per-session rewrites are
+memoized on the cached entry.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from urllib.parse import urlencode
+
+logger = logging.getLogger("e-face.hls_cache")
+
+SEGMENT_TTL = max(1.0, float(os.environ.get("EFACE_HLS_SEGMENT_TTL", "30")))
+PLAYLIST_TTL = max(0.0, float(os.environ.get("EFACE_HLS_PLAYLIST_TTL", "1.0")))
+# byte budget per camera; objects above half of it are served but not kept.
+# 0 disables the segment cache and segments are streamed straight through.
+CAMERA_BYTES = max(0, int(os.environ.get("EFACE_HLS_CACHE_MB", "16"))) * 1024 * 1024
+SEGMENTS_ENABLED = CAMERA_BYTES > 0
+# playlists (variants, LL-HLS partial requests) kept per camera
+PLAYLISTS_PER_CAMERA = 16
+
+_lock = threading.Lock()
+_cameras: dict[str, OrderedDict] = {}
+_camera_bytes: dict[str, int] = {}
+_playlists: dict[str, OrderedDict] = {}
+_inflight: dict[tuple, asyncio.Future] = {}
+_stats = {'hits': 0, 'joined': 0, 'fetches': 0, 'evicted': 0, 'rewrites': 0}
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    if not params:
+        return url
+    return url + '?' + urlencode(sorted(params.items()))
+
+
+def _lookup(entity_id: str, key: str, playlist: bool) -> dict | None:
+    now = time.monotonic()
+    with _lock:
+        entries = (_playlists if playlist else _cameras).get(entity_id)
+        if not entries:
+            return None
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry['expires_at'] <= now:
+            if playlist:
+                entries.pop(key, None)
+            else:
+                _drop_locked(entity_id, key)
+            return None
+        entries.move_to_end(key)
+        return entry
+
+
+def _drop_locked(entity_id: str, key: str):
+    entry = _cameras[entity_id].pop(key, None)
+    if entry is not None:
+        _camera_bytes[entity_id] -= len(entry['body'])
+
+
+def _store_playlist(entity_id: str, key: str, entry: dict):
+    with _lock:
+        entries = _playlists.setdefault(entity_id, OrderedDict())
+        entries.pop(key, None)
+        entries[key] = entry
+        while len(entries) > PLAYLISTS_PER_CAMERA:
+            entries.popitem(last=False)
+
+
+def _store(entity_id: str, key: str, entry: dict):
+    size = len(entry['body'])
+    if size > CAMERA_BYTES // 2:
+        return
+    now = time.monotonic()
+    with _lock:
+        entries = _cameras.setdefault(entity_id, OrderedDict())
+        _camera_bytes.setdefault(entity_id, 0)
+        if key in entries:
+            _drop_locked(entity_id, key)
+        for stale in [k for k, e in entries.items() if e['expires_at'] <= now]:
+            _drop_locked(entity_id, stale)
+        while entries and _camera_bytes[entity_id] + size > CAMERA_BYTES:
+            oldest = next(iter(entries))
+            _drop_locked(entity_id, oldest)
+            _stats['evicted'] += 1
+        entries[key] = entry
+        _camera_bytes[entity_id] += size
+
+
+async def fetch(
+    entity_id: str,
+    key: str,
+    loader: Callable[[], Awaitable[tuple[bytes, str | None]]],
+    ttl: float,
+    playlist: bool = False,
+) -> dict:
+    """Return the cached entry for key, downloading it once via loader.
+
+    loader returns (body, content_type) and raises on failure; failures are
+    passed to every waiter and not cached.  Waiters are shielded, so a
+    viewer going away does not cancel the shared download.
+    """
+    entry = _lookup(entity_id, key, playlist)
+    if entry is not None:
+        _stats['hits'] += 1
+        return entry
+    flight_key = (entity_id, key)
+    flight = _inflight.get(flight_key)
+    if flight is None:
+        _stats['fetches'] += 1
+        flight = asyncio.ensure_future(_load(entity_id, key, loader, ttl, playlist))
+        _inflight[flight_key] = flight
+        flight.add_done_callback(lambda _done, flight_key=flight_key: _inflight.pop(flight_key, None))
+    else:
+        _stats['joined'] += 1
+    return await asyncio.shield(flight)
+
+
+async def _load(entity_id: str, key: str, loader, ttl: float, playlist: bool) -> dict:
+    body, content_type = await loader()
+    entry = {
+        'body': body,
+        'content_type': content_type,
+        'expires_at': time.monotonic() + ttl,
+        'rewrites': {},
+    }
+    if ttl > 0:
+        if playlist:
+            _store_playlist(entity_id, key, entry)
+        else:
+            _store(entity_id, key, entry)
+    return entry
+
+
+def rewritten(entry: dict, session_id: str, rewrite: Callable[[bytes], bytes]) -> bytes:
+    """Playlist body rewritten for session_id, computed once per entry."""
+    body = entry['rewrites'].get(session_id)
+    if body is None:
+        _stats['rewrites'] += 1
+        body = rewrite(entry['body'])
+        entry['rewrites'][session_id] = body
+    return body
+
+
+def clear(entity_id: str | None = None):
+    with _lock:
+        if entity_id is None:
+            _cameras.clear()
+            _camera_bytes.clear()
+            _playlists.clear()
+        else:
+            _cameras.pop(entity_id, None)
+            _camera_bytes.pop(entity_id, None)
+            _playlists.pop(entity_id, None)
+
+
+def get_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        cameras = {
+            entity_id: {
+                'entries': len(_cameras.get(entity_id) or ()),
+                'bytes': _camera_bytes.get(entity_id, 0),
+                'playlists': len(_playlists.get(entity_id) or ()),
+            }
+            for entity_id in set(_cameras) | set(_playlists)
+        }
+    return {
+        'cameras': cameras,
+        'inflight': len(_inflight),
+        'camera_bytes': CAMERA_BYTES,
+        'segments_enabled': SEGMENTS_ENABLED,
+        'segment_ttl': SEGMENT_TTL,
+        'playlist_ttl': PLAYLIST_TTL,
+        **_stats,
+    }
@@ -0,0 +1,144 @@
+"""Conditional GET support: strong ETags and ``If-None-Match`` -> 304.
+
+Endpoints backed by a versioned source (room model, config) derive the ETag
+from that version and can answer a matching revalidation before building or
+serializing anything.  Other responses fall back to a hash of the body.
+Versions restart with the process, so every ETag carries a per-boot id.
+"""
+
+import hashlib
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .fast_json import FastJSONResponse
+
+BOOT_ID = secrets.token_hex(4)
+# responses are per user and must be revalidated before reuse
+CACHE_CONTROL = 'private, no-cache'
+
+
+def version_etag(kind: str, *parts) -> str:
+    return '"' + '-'.join([kind, BOOT_ID, *(str(part) for part in parts)]) + '"'
+
+
+def model_etag(kind: str, integration: dict) -> str | None:
+    """ETag from the room model version, or None while the model is not current."""
+    from . import room_model
+    version = room_model.get_current_version(integration)
+    return None if version is None else version_etag(kind, version)
+
+
+def confirm_model_etag(etag: str | None, kind: str, integration: dict) -> str | None:
+    """Keep a model ETag only if the model did not move while the body was built.
+
+    Otherwise the body may come from an older build, and a hash of it is used.
+    """
+    if etag is None or model_etag(kind, integration) != etag:
+        return None
+    return etag
+
+
+def content_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def unmodified_since(request: Request, timestamp: float) -> bool:
+    """If-Modified-Since check; ignored when the request carries If-None-Match."""
+    if request.headers.get('if-none-match'):
+        return False
+    value = request.headers.get('if-modified-since')
+    if not value:
+        return False
+    try:
+        since = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return int(timestamp) <= since
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': CACHE_CONTROL})
+
+
+def is_fresh(request: Request, etag: str | None) -> bool:
+    return etag is not None and etag_matches(request.headers.get('if-none-match'), etag)
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """(start, end) of a single ``bytes=`` range, end inclusive.
+
+    None means serve the whole body (no header, multiple ranges or a unit we
+    do not support); ValueError means the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError('empty suffix range')
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError('range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def bytes_response(request: Request, body: bytes, media_type: str, headers: dict | None = None) -> Response:
+    """Response for an in-memory body honouring a Range request.
+
+    The whole body is handed to the server as is, without copying; a range
+    is answered with 206 and only that slice.
+    """
+    headers = {**(headers or {}), 'Accept-Ranges': 'bytes'}
+    if request.headers.get('if-range'):
+        # no validator to compare with: send the full body
+        return Response(content=body, media_type=media_type, headers=headers)
+    try:
+        byte_range = parse_range(request.headers.get('range'), len(body))
+    except ValueError:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{len(body)}'})
+    if byte_range is None:
+        return Response(content=body, media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+    return Response(content=body[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def json_response(request: Request, payload, etag: str | None = None) -> Response:
+    """Serialize payload with an ETag; 304 when the client already has it."""
+    response = FastJSONResponse(payload)
+    if etag is None:
+        etag = content_etag(response.body)
+    if is_fresh(request, etag):
+        return not_modified(etag)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -1,4 +1,5 @@
 
+import asyncio
 import os
 from fastapi import FastAPI, WebSocket
 from fastapi.staticfiles import StaticFiles
@@ -12,8 +13,10 @@ from .routers import rooms as rooms_router
 from .routers import users as users_router
 from .routers import integration as integration_router
 from .routers import comfort as comfort_router
-from .core import BASE_DIR
-from .ha_ws import clients, start_background, stop_background
+from .core import BASE_DIR, flush_config
+from .ha_ws import start_background, stop_background
+from . import compression, ha_http, snapshot_prefetch, ws_hub
+from .fast_json import FastJSONResponse
 
 
 class NoCacheStaticFiles(StaticFiles):
@@ -25,7 +28,11 @@ class NoCacheStaticFiles(StaticFiles):
         return response
 
 
-app = FastAPI(title="e-face API")
+app = FastAPI(title="e-face API", default_response_class=FastJSONResponse)
+
+# compress JSON and playlists in-app so plain uvicorn deployments (no Caddy) benefit too
+if compression.ENABLED:
+    app.add_middleware(compression.CompressionMiddleware)
 
 # include routers under /api
 app.include_router(auth_router.router, prefix="/api")
@@ -62,22 +69,56 @@ async def _stop_ha_ws():
     await stop_background(app)
 
 
+@app.on_event("startup")
+async def _start_snapshot_prefetch():
+    if snapshot_prefetch.ENABLED:
+        app.state.snapshot_prefetch_task = asyncio.create_task(snapshot_prefetch.prefetch_task())
+
+
+@app.on_event("shutdown")
+async def _stop_snapshot_prefetch():
+    task = getattr(app.state, 'snapshot_prefetch_task', None)
+    if task:
+        task.cancel()
+
+
+@app.on_event("startup")
+async def _start_stream_prewarm():
+    if devices_router.STREAM_PREWARM:
+        app.state.stream_prewarm_task = asyncio.create_task(devices_router.stream_prewarm_task())
+
+
+@app.on_event("shutdown")
+async def _stop_stream_prewarm():
+    task = getattr(app.state, 'stream_prewarm_task', None)
+    if task:
+        task.cancel()
+
+
+@app.on_event("shutdown")
+async def _flush_config():
+    # config writes are debounced; make sure the last ones reach the disk
+    flush_config()
+
+
+@app.on_event("shutdown")
+async def _close_ha_http():
+    await ha_http.close_all()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: "WebSocket"):
     await websocket.accept()
-    clients.add(websocket)
+    ws_hub.register(websocket)
     try:
         while True:
-            # keep connection open; accept pings from client
+            # keep connection open; clients may send a hello to pick topics
             msg = await websocket.receive_text()
-            # ignore messages from client
+            ws_hub.handle_message(websocket, msg)
     except Exception:
         pass
     finally:
-        try:
-            clients.remove(websocket)
-        except Exception:
-            pass
+        await ws_hub.unregister(websocket)
     
 if FRONTEND_DIST_PATH:
     app.mount(
@@ -0,0 +1,264 @@
+"""One upstream MJPEG connection per camera, fanned out to every viewer.
+
+The relay reads HA's ``camera_proxy_stream`` multipart response, splits it
+into JPEG frames and hands the latest frame to each subscriber.  Viewers
+only ever hold the newest frame, so a slow viewer skips frames instead of
+buffering them, and each viewer can cap its own frame rate.  The upstream
+connection is closed when the last viewer leaves.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import httpx
+
+from . import ha_http
+
+logger = logging.getLogger("e-face.mjpeg_relay")
+
+MAX_FPS = max(1.0, float(os.environ.get("EFACE_MJPEG_MAX_FPS", "10")))
+CONNECT_TIMEOUT = max(1.0, float(os.environ.get("EFACE_MJPEG_CONNECT_TIMEOUT", "8")))
+# an upstream that sends nothing for this long is considered dead
+READ_TIMEOUT = max(5.0, float(os.environ.get("EFACE_MJPEG_READ_TIMEOUT", "30")))
+CHUNK_SIZE = 64 * 1024
+# upstream parts larger than this are not JPEG frames we want to relay
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+BOUNDARY = 'frame'
+MEDIA_TYPE = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+_lock = threading.Lock()
+_relays: dict[str, '_Relay'] = {}
+_stats = {'relays_started': 0, 'frames': 0, 'viewers_joined': 0}
+
+
+class RelayUnavailable(Exception):
+    """The upstream MJPEG stream could not be opened."""
+
+
+def _boundary_from_content_type(content_type: str | None) -> bytes:
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.strip().lower() == 'boundary' and value:
+            boundary = value.strip().strip('"')
+            # HA announces "--frameboundary" and writes exactly that as delimiter
+            return (boundary if boundary.startswith('--') else '--' + boundary).encode('latin-1')
+    return b'--frame'
+
+
+class _MultipartParser:
+    """Incremental multipart/x-mixed-replace parser yielding part bodies."""
+
+    def __init__(self, delimiter: bytes):
+        self.delimiter = delimiter
+        self.buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        buf = self.buffer
+        buf += chunk
+        frames = []
+        while True:
+            start = buf.find(self.delimiter)
+            if start < 0:
+                # keep a possible partial delimiter at the end
+                del buf[:max(0, len(buf) - len(self.delimiter))]
+                break
+            if start:
+                del buf[:start]
+            headers_end = buf.find(b'\r\n\r\n', len(self.delimiter))
+            if headers_end < 0:
+                if len(buf) > 16 * 1024:
+                    # not a part header; resynchronise on the next delimiter
+                    del buf[:len(self.delimiter)]
+                    continue
+                break
+            length = None
+            for line in bytes(buf[len(self.delimiter):headers_end]).split(b'\r\n'):
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    try:
+                        length = int(value.strip())
+                    except ValueError:
+                        length = None
+            body_start = headers_end + 4
+            if length is not None:
+                if len(buf) < body_start + length:
+                    break
+                frame = bytes(buf[body_start:body_start + length])
+                del buf[:body_start + length]
+            else:
+                end = buf.find(self.delimiter, body_start)
+                if end < 0:
+                    if len(buf) > MAX_FRAME_BYTES:
+                        buf.clear()
+                    break
+                frame = bytes(buf[body_start:end]).rstrip(b'\r\n')
+                del buf[:end]
+            if frame:
+                frames.append(frame)
+        return frames
+
+
+def _encode_part(frame: bytes) -> bytes:
+    header = f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(frame)}\r\n\r\n'.encode('ascii')
+    return header + frame + b'\r\n'
+
+
+class _Viewer:
+    def __init__(self, max_fps: float):
+        self.interval = 1.0 / max_fps
+        self.part: bytes | None = None
+        self.closed = False
+        self.event = asyncio.Event()
+        self.sent = 0
+        self.skipped = 0
+
+    def offer(self, part: bytes):
+        if self.part is not None:
+            self.skipped += 1
+        self.part = part
+        self.event.set()
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    async def next_part(self) -> bytes | None:
+        while self.part is None and not self.closed:
+            self.event.clear()
+            await self.event.wait()
+        part, self.part = self.part, None
+        return part
+
+
+class _Relay:
+    def __init__(self, entity_id: str, url: str, token: str | None):
+        self.entity_id = entity_id
+        self.url = url
+        self.token = token
+        self.viewers: set[_Viewer] = set()
+        self.latest: bytes | None = None
+        self.latest_at: float | None = None
+        self.frames = 0
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        client = ha_http.get_async_client(self.url, self.token)
+        timeout = httpx.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT, write=CONNECT_TIMEOUT, pool=CONNECT_TIMEOUT)
+        try:
+            async with client.stream('GET', self.url, timeout=timeout) as resp:
+                resp.raise_for_status()
+                parser = _MultipartParser(_boundary_from_content_type(resp.headers.get('Content-Type')))
+                if not self.ready.done():
+                    self.ready.set_result(True)
+                logger.info('camera %s: mjpeg relay connected', self.entity_id)
+                async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                    for frame in parser.feed(chunk):
+                        self._publish(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if not self.ready.done():
+                self.ready.set_exception(RelayUnavailable(str(exc)))
+            else:
+                logger.info('camera %s: mjpeg upstream ended: %s', self.entity_id, exc)
+        finally:
+            if not self.ready.done():
+                self.ready.set_exception(RelayUnavailable('upstream_closed'))
+            self._finish()
+
+    def _publish(self, frame: bytes):
+        part = _encode_part(frame)
+        self.latest = part
+        self.latest_at = time.time()
+        self.frames += 1
+        _stats['frames'] += 1
+        for viewer in tuple(self.viewers):
+            viewer.offer(part)
+
+    def _finish(self):
+        with _lock:
+            if _relays.get(self.entity_id) is self:
+                _relays.pop(self.entity_id, None)
+        for viewer in tuple(self.viewers):
+            viewer.close()
+        self.viewers.clear()
+
+
+async def subscribe(entity_id: str, url: str, token: str | None, max_fps: float | None = None):
+    """Join (or start) the relay of entity_id; returns (relay, viewer).
+
+    The caller must call unsubscribe once the viewer is done, even if it
+    never read a part.  Raises RelayUnavailable when a new upstream
+    connection cannot be opened.
+    """
+    fps = min(MAX_FPS, max_fps) if max_fps and max_fps > 0 else MAX_FPS
+    viewer = _Viewer(fps)
+    with _lock:
+        relay = _relays.get(entity_id)
+        if relay is None:
+            relay = _Relay(entity_id, url, token)
+            _relays[entity_id] = relay
+            _stats['relays_started'] += 1
+        relay.viewers.add(viewer)
+        _stats['viewers_joined'] += 1
+    if relay.latest is not None:
+        # a joining viewer starts with the current picture
+        viewer.offer(relay.latest)
+    try:
+        await asyncio.shield(relay.ready)
+    except BaseException:
+        unsubscribe(relay, viewer)
+        raise
+    return relay, viewer
+
+
+def unsubscribe(relay: _Relay, viewer: _Viewer):
+    """Remove a viewer; closes the upstream when it was the last one.  Idempotent."""
+    viewer.close()
+    with _lock:
+        relay.viewers.discard(viewer)
+        last = not relay.viewers
+        if last and _relays.get(relay.entity_id) is relay:
+            _relays.pop(relay.entity_id, None)
+    if last and not relay.task.done():
+        logger.info('camera %s: last mjpeg viewer left, closing upstream', relay.entity_id)
+        relay.task.cancel()
+
+
+async def iter_parts(relay: _Relay, viewer: _Viewer):
+    """Multipart body for one viewer, rate limited to its frame-rate cap."""
+    while True:
+        part = await viewer.next_part()
+        if part is None:
+            return
+        viewer.sent += 1
+        started = time.monotonic()
+        yield part
+        pause = viewer.interval - (time.monotonic() - started)
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+
+def latest_frame(entity_id: str) -> tuple[bytes, float] | None:
+    """Newest JPEG of a running relay and its capture time, if any."""
+    with _lock:
+        relay = _relays.get(entity_id)
+    if relay is None or relay.latest is None:
+        return None
+    part = relay.latest
+    return part[part.index(b'\r\n\r\n') + 4:-2], relay.latest_at
+
+
+def get_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        relays = {
+            entity_id: {'viewers': len(relay.viewers), 'frames': relay.frames}
+            for entity_id, relay in _relays.items()
+        }
+    return {'relays': relays, 'max_fps': MAX_FPS, **_stats}
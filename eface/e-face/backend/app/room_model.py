@@ -0,0 +1,355 @@
+"""Materialized room model kept current by Home Assistant state_changed events.
+
+The rooms payload is built once from the synced room templates and the live
+state store.  Afterwards every state_changed event re-shapes only the entries
+that belong to the changed entity, in place, and bumps :func:`get_version`.
+A full rebuild is only needed when an input changes (config file, registry
+snapshot, state store resync) or when an event changes which entries exist,
+e.g. a light becoming hidden or a camera gaining the ``tvcc`` label.
+"""
+
+import logging
+import threading
+from typing import Any, Dict
+
+from . import core, state_store, weather_cache
+from .registry_cache import get_registry_snapshot
+
+logger = logging.getLogger("e-face.room_model")
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_model: Dict[str, Any] | None = None
+_version = 0
+_dirty = False
+_building = False
+_pending: set[str] = set()
+_template_rooms: Dict[str, Any] = {'version': None, 'map': {}}
+
+_ROOM_ENTRY_KEYS = ('devices', 'scenes', 'covers', 'climate', 'temperatures', 'cameras')
+
+
+def get_version() -> int:
+    """Monotonic counter bumped on every rebuild and every in-place patch."""
+    return _version
+
+
+def invalidate():
+    """Force a full rebuild on the next request."""
+    global _dirty
+    with _lock:
+        _dirty = True
+
+
+def _current_registry(integration: dict) -> dict:
+    registry = get_registry_snapshot()
+    if registry is not None:
+        return registry
+    try:
+        return core.load_registry_snapshot(integration)
+    except Exception:
+        return {'areas': {}, 'devices': {}, 'entities': {}}
+
+
+def _model_key(integration: dict, registry: dict):
+    return (
+        core.get_config_version(),
+        integration.get('host'),
+        integration.get('weather_entity'),
+        id(registry),
+        state_store.get_generation(),
+    )
+
+
+def get_live_rooms(integration: dict):
+    """Return (rooms, meta) from the model, or None when it cannot be served.
+
+    None means the state store went stale or no synced room template exists;
+    callers then fall back to a direct build.
+    """
+    registry = _current_registry(integration)
+    key = _model_key(integration, registry)
+    with _lock:
+        if _model is not None and not _dirty and _model['key'] == key:
+            return _render_locked()
+    with _build_lock:
+        with _lock:
+            # another request may have rebuilt the model while we waited
+            if _model is not None and not _dirty and _model['key'] == key:
+                return _render_locked()
+        return _rebuild(integration, registry, key)
+
+
+def _current_key(integration: dict):
+    """Model key for the cached registry, or None when no registry is loaded yet."""
+    registry = get_registry_snapshot()
+    if registry is None or not state_store.is_live():
+        return None
+    return _model_key(integration, registry)
+
+
+def get_current_rooms(integration: dict):
+    """Like get_live_rooms but never builds or does I/O; None when the model is not current.
+
+    Cheap enough for the event loop; callers run get_live_rooms in a worker otherwise.
+    """
+    key = _current_key(integration)
+    with _lock:
+        if key is not None and _model is not None and not _dirty and _model['key'] == key:
+            return _render_locked()
+    return None
+
+
+def get_current_version(integration: dict) -> int | None:
+    """Version of the model when get_current_rooms would serve it, else None (for ETags)."""
+    key = _current_key(integration)
+    with _lock:
+        if key is not None and _model is not None and not _dirty and _model['key'] == key:
+            return _version
+    return None
+
+
+def _rebuild(integration: dict, registry: dict, key):
+    global _model, _version, _dirty, _building
+    cfg = core.get_config_snapshot()
+    if not core._uses_room_templates(cfg):
+        return None
+    with _lock:
+        _building = True
+        _pending.clear()
+    try:
+        state_map = state_store.get_state_map()
+        if state_map is None:
+            return None
+        rooms, meta = core._build_ha_rooms(integration, cfg, state_map, registry)
+        model = _index_model(rooms, meta, cfg, registry, integration, state_map)
+        model['key'] = key
+    except Exception:
+        with _lock:
+            _building = False
+            _pending.clear()
+        raise
+    with _lock:
+        _building = False
+        _model = model
+        _dirty = False
+        _version += 1
+        # replay events that arrived while the snapshot was being shaped
+        pending = list(_pending)
+        _pending.clear()
+        for entity_id in pending:
+            _patch_locked(entity_id, state_store.get_state(entity_id))
+        logger.debug("Room model rebuilt (version %d, %d indexed entities)", _version, len(model['index']))
+        return _render_locked()
+
+
+def _index_model(rooms: list, meta: dict, cfg: dict, registry: dict, integration: dict, state_map: dict) -> dict:
+    index: Dict[str, list] = {}
+    entity_registry = registry.get('entities') or {}
+    device_map = registry.get('devices') or {}
+
+    def _add(entity_id, kind, entry, ctx=None):
+        if entity_id:
+            index.setdefault(entity_id, []).append((kind, entry, ctx or {}))
+
+    light_templates = {}
+    climate_entities = set()
+    for template in cfg.get('rooms') or []:
+        if not isinstance(template, dict):
+            continue
+        for light in template.get('luci') or []:
+            if isinstance(light, dict) and light.get('entity_id'):
+                light_templates.setdefault((template.get('id'), light['entity_id']), light)
+        for climate_entry in template.get('climate') or []:
+            if isinstance(climate_entry, dict) and climate_entry.get('entity_id'):
+                climate_entities.add(climate_entry['entity_id'])
+
+    seen_scenes = set()
+    for room in rooms:
+        room_id = room.get('id')
+        for device in room.get('devices') or []:
+            light = light_templates.get((room_id, device.get('id'))) or {}
+            _add(device.get('id'), 'light', device, {'light': light})
+        for scene in room.get('scenes') or []:
+            # fallback scenes are the same dict in every room; index them once
+            if id(scene) in seen_scenes:
+                continue
+            seen_scenes.add(id(scene))
+            scene_id = scene.get('id')
+            info = core._classify_entity(scene_id, state_map.get(scene_id), entity_registry.get(scene_id), device_map)
+            placed = core._shape_light_scene(info)
+            _add(scene_id, 'scene', scene, {'room_id': placed[0] if placed else None})
+        for cover in room.get('covers') or []:
+            _add(cover.get('id'), 'cover', cover, {'room_id': room_id})
+        for climate in room.get('climate') or []:
+            _add(climate.get('id'), 'climate', climate)
+        for sensor in room.get('temperatures') or []:
+            _add(sensor.get('id'), 'temperature', sensor, {'room_id': room_id})
+        for camera in room.get('cameras') or []:
+            _add(camera.get('id'), 'camera', camera)
+    for gate in meta.get('gates') or []:
+        _add(gate.get('id'), 'gate', gate)
+    weather = meta.get('weather')
+    if weather:
+        _add(weather.get('entity_id'), 'weather', weather)
+
+    # entities that are configured but currently filtered out (hidden, missing state)
+    # must trigger a rebuild when they change, since they may reappear
+    watch = {entity_id for (_, entity_id) in light_templates.keys() if entity_id not in index}
+    watch.update(e for e in climate_entities if e not in index)
+
+    rooms_by_entity: Dict[str, set] = {}
+    for room_id, entity_id in light_templates.keys():
+        rooms_by_entity.setdefault(entity_id, set()).add(room_id)
+    for room in rooms:
+        for key in _ROOM_ENTRY_KEYS:
+            for entry in room.get(key) or []:
+                if isinstance(entry, dict) and entry.get('id'):
+                    rooms_by_entity.setdefault(entry['id'], set()).add(room.get('id'))
+
+    return {
+        'rooms': rooms,
+        'meta': meta,
+        'index': index,
+        'watch': watch,
+        'rooms_by_entity': {entity_id: frozenset(room_ids) for entity_id, room_ids in rooms_by_entity.items()},
+        'registry': registry,
+        'preferred_weather': set(core._preferred_weather_entities(integration, cfg)),
+    }
+
+
+def _reshape(kind: str, info: dict, entry: dict, ctx: dict, device_map: dict) -> dict | None:
+    """Re-shape one indexed entry; None means its placement changed and a rebuild is needed."""
+    if kind == 'light':
+        return core._shape_light_device(ctx.get('light') or {}, info)
+    if not info['state']:
+        return None
+    if kind == 'cover':
+        shaped = core._shape_cover_entry(info, device_map)
+        return shaped[1] if shaped and shaped[0] == ctx.get('room_id') else None
+    if kind == 'climate':
+        return core._shape_climate_entry(info)
+    if kind == 'temperature':
+        shaped = core._shape_room_temperature(info, device_map)
+        return shaped[1] if shaped and shaped[0] == ctx.get('room_id') else None
+    if kind == 'camera':
+        shaped = core._shape_camera_entry(info)
+        return shaped if shaped and shaped.get('room_id') == entry.get('room_id') else None
+    if kind == 'scene':
+        shaped = core._shape_light_scene(info)
+        return shaped[1] if shaped and shaped[0] == ctx.get('room_id') else None
+    if kind == 'gate':
+        return core._shape_gate_entry(info)
+    if kind == 'weather':
+        shaped = core._shape_weather_payload(info['entity_id'], info['state'])
+        return weather_cache.attach_forecasts(shaped) if shaped else None
+    return None
+
+
+def _affects_model(info: dict, device_map: dict) -> bool:
+    """True when an entity that is not in the model would now produce an entry."""
+    roles = info['roles']
+    if not info['state'] or not roles:
+        return False
+    if 'camera' in roles and core._shape_camera_entry(info):
+        return True
+    if 'cover' in roles and core._shape_cover_entry(info, device_map):
+        return True
+    if 'temperature' in roles and core._shape_room_temperature(info, device_map):
+        return True
+    if 'scene' in roles and core._shape_light_scene(info):
+        return True
+    if 'weather' in roles and (not _model['meta'].get('weather') or info['entity_id'] in _model['preferred_weather']):
+        return True
+    return 'gate' in roles and core._shape_gate_entry(info) is not None
+
+
+def _patch_locked(entity_id: str, state: dict | None):
+    global _dirty, _version
+    if _model is None or _dirty:
+        return
+    registry = _model['registry']
+    registry_entry = (registry.get('entities') or {}).get(entity_id)
+    device_map = registry.get('devices') or {}
+    refs = _model['index'].get(entity_id)
+    if refs is None and entity_id in _model['watch']:
+        _dirty = True
+        return
+    # classify once; every entry of the entity is re-shaped from the same record
+    info = core._classify_entity(entity_id, state, registry_entry, device_map)
+    if refs is None:
+        if _affects_model(info, device_map):
+            _dirty = True
+        return
+    shaped_by_kind: Dict[str, dict | None] = {}
+    for kind, entry, ctx in refs:
+        if kind == 'light' or kind not in shaped_by_kind:
+            shaped_by_kind[kind] = _reshape(kind, info, entry, ctx, device_map)
+        shaped = shaped_by_kind[kind]
+        if shaped is None:
+            _dirty = True
+            return
+        entry.clear()
+        entry.update(shaped)
+    _version += 1
+
+
+def apply_state_changed(entity_id: str | None, new_state: dict | None):
+    """Patch the entries of one entity in place (O(entries for that entity))."""
+    if not entity_id:
+        return
+    with _lock:
+        if _building:
+            _pending.add(entity_id)
+            return
+        _patch_locked(entity_id, new_state)
+
+
+def rooms_for_entity(entity_id: str) -> frozenset:
+    """Ids of the rooms an entity is shown in.
+
+    Uses the model when it has been built, otherwise the lights and climate
+    entries of the synced room templates.
+    """
+    with _lock:
+        if _model is not None:
+            return _model['rooms_by_entity'].get(entity_id, frozenset())
+    version = core.get_config_version()
+    if _template_rooms['version'] != version:
+        mapping: Dict[str, set] = {}
+        for template in core.get_config_snapshot().get('rooms') or []:
+            if not isinstance(template, dict) or not template.get('id'):
+                continue
+            for entry in list(template.get('luci') or []) + list(template.get('climate') or []):
+                if isinstance(entry, dict) and entry.get('entity_id'):
+                    mapping.setdefault(entry['entity_id'], set()).add(template['id'])
+        _template_rooms['map'] = {key: frozenset(value) for key, value in mapping.items()}
+        _template_rooms['version'] = version
+    return _template_rooms['map'].get(entity_id, frozenset())
+
+
+def refresh_weather(entity_id: str):
+    """Re-attach the forecasts of a weather entity after the cache was refreshed."""
+    with _lock:
+        if _building:
+            _pending.add(entity_id)
+            return
+        if _model is None or entity_id not in _model['index']:
+            return
+        _patch_locked(entity_id, state_store.get_state(entity_id))
+
+
+def _copy_entries(value):
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _render_locked():
+    # entries are patched with clear()/update() and nested values are always
+    # replaced, never mutated, so copying down to the entry level is enough
+    rooms = [{key: _copy_entries(value) for key, value in room.items()} for room in _model['rooms']]
+    meta = {key: _copy_entries(value) for key, value in _model['meta'].items()}
+    return rooms, meta
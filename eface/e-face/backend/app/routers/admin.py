@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
-from ..core import read_config, write_config, require_token, verify_admin_password
-from ..core import fetch_ha_rooms, refresh_room_snapshot
+from ..core import get_config_snapshot, read_config, update_config, require_token, verify_admin_password
+from ..core import fetch_ha_rooms_async, refresh_room_snapshot, run_blocking
 from ..ha_ws import get_status
 from ..registry_cache import get_registry_snapshot
-import requests
+from .. import ha_http
+from ..fast_json import FastJSONResponse
+from .devices import get_stream_status
 import time
 
 def _check_admin(payload, x_admin_pass: str | None):
@@ -28,7 +30,7 @@ class AdminConfigPayload(BaseModel):
 def get_admin_config(payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _check_admin(payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
-    data = read_config()
+    data = get_config_snapshot()
     return {"advanced": data.get("advanced", {}), "rooms": data.get("rooms", [])}
 
 
@@ -36,37 +38,40 @@ def get_admin_config(payload=Depends(require_token), x_admin_pass: str | None =
 def post_admin_config(payload: AdminConfigPayload, token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _check_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
-    data = read_config()
-    if payload.integration is not None:
-        adv = data.get("advanced", {}) or {}
-        adv["integration"] = payload.integration
-        data["advanced"] = adv
-    if payload.rooms is not None:
-        data["rooms"] = payload.rooms
-    write_config(data)
+    def _apply(data):
+        if payload.integration is not None:
+            adv = data.get("advanced", {}) or {}
+            adv["integration"] = payload.integration
+            data["advanced"] = adv
+        if payload.rooms is not None:
+            data["rooms"] = payload.rooms
+
+    update_config(_apply)
     return {"ok": True}
 
 
 @router.post("/rooms/{room_id}/background")
-def set_room_background(room_id: str, payload: dict, token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
+async def set_room_background(room_id: str, payload: dict, token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     bg = payload.get('background', '')
-    data = read_config()
-    rooms = data.get('rooms', [])
-    target = None
-    for r in rooms:
-        if r.get('id') == room_id:
-            target = r
-            break
-
-    if not target:
+    snapshot = get_config_snapshot()
+    live = None
+    if not any(r.get('id') == room_id for r in snapshot.get('rooms', [])):
         # room may exist only in the live HA snapshot; synthesize a minimal entry so background can be stored
-        integration = (data.get('advanced') or {}).get('integration') or {}
+        integration = (snapshot.get('advanced') or {}).get('integration') or {}
         try:
-            live_rooms = fetch_ha_rooms(integration)
+            live_rooms = await fetch_ha_rooms_async(integration)
         except Exception:
             live_rooms = []
         live = next((r for r in live_rooms if r.get('id') == room_id), None)
-        if live:
+
+    def _apply(data):
+        rooms = data.get('rooms', [])
+        target = None
+        for r in rooms:
+            if r.get('id') == room_id:
+                target = r
+                break
+        if not target and live:
             target = {
                 'id': room_id,
                 'name': live.get('name') or room_id,
@@ -74,30 +79,32 @@ def set_room_background(room_id: str, payload: dict, token_payload=Depends(requi
                 'luci': live.get('luci') or []
             }
             rooms.append(target)
+        if not target:
+            return None
+        target['background'] = bg
+        data['rooms'] = rooms
+        return target
 
+    target = update_config(_apply)
     if not target:
         raise HTTPException(status_code=404, detail='Room not found')
-
-    target['background'] = bg
-    data['rooms'] = rooms
-    write_config(data)
     return {"ok": True, "room": target}
 
 
 @router.post('/test-integration')
-def test_integration(payload: dict, token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
+async def test_integration(payload: dict, token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _check_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
     integration = payload.get('integration') or {}
     try:
-        rooms = fetch_ha_rooms(integration)
-        return { 'ok': True, 'rooms': rooms }
+        rooms = await fetch_ha_rooms_async(integration)
+        return FastJSONResponse({ 'ok': True, 'rooms': rooms })
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
 @router.post('/refresh')
-def refresh_configuration(token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
+async def refresh_configuration(token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _check_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
     data = read_config()
@@ -108,36 +115,40 @@ def refresh_configuration(token_payload=Depends(require_token), x_admin_pass: st
     if not integration.get('host') or not integration.get('token'):
         raise HTTPException(status_code=400, detail="integration_missing_credentials")
     try:
-        snapshot = refresh_room_snapshot(integration, data.get('rooms', []))
+        snapshot = await run_blocking(refresh_room_snapshot, integration, data.get('rooms', []))
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
-    data['rooms'] = snapshot.get('rooms', [])
-    data['synced'] = {
-        'tracked_entities': snapshot.get('tracked_entities', []),
-        'synced_at': snapshot.get('synced_at'),
-        'extra_entities': snapshot.get('extra_entities', [])
-    }
-    # persist normalized extra entities back into integration config
-    integration['extra_entities'] = snapshot.get('extra_entities', [])
-    advanced['integration'] = integration
-    data['advanced'] = advanced
-    write_config(data)
-
-    return {
+    def _apply(data):
+        data['rooms'] = snapshot.get('rooms', [])
+        data['synced'] = {
+            'tracked_entities': snapshot.get('tracked_entities', []),
+            'synced_at': snapshot.get('synced_at'),
+            'extra_entities': snapshot.get('extra_entities', [])
+        }
+        # persist normalized extra entities back into integration config
+        advanced = data.get('advanced') or {}
+        integration = advanced.get('integration') or {}
+        integration['extra_entities'] = snapshot.get('extra_entities', [])
+        advanced['integration'] = integration
+        data['advanced'] = advanced
+
+    update_config(_apply)
+
+    return FastJSONResponse({
         'ok': True,
         'rooms_count': len(snapshot.get('rooms', [])),
         'entities_count': len(snapshot.get('tracked_entities', [])),
         'synced_at': snapshot.get('synced_at'),
         'rooms': snapshot.get('rooms', [])
-    }
+    })
 
 
 @router.get('/diagnostics')
-def diagnostics(token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
+async def diagnostics(token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _check_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
-    data = read_config()
+    data = get_config_snapshot()
     integration = (data.get('advanced') or {}).get('integration') or {}
     status = get_status()
     # attempt quick HTTP ping to HA states endpoint to measure latency
@@ -148,14 +159,14 @@ def diagnostics(token_payload=Depends(require_token), x_admin_pass: str | None =
             headers = { 'Authorization': f"Bearer {integration.get('token')}", 'Accept': 'application/json' }
             url = integration.get('host').rstrip('/') + '/api/states'
             t0 = time.time()
-            r = requests.get(url, headers=headers, timeout=5)
+            r = await ha_http.async_client_for(integration).get(url, headers=headers, timeout=5)
             latency = round((time.time() - t0) * 1000)
             if r.status_code != 200:
                 last_error = f"HTTP {r.status_code}"
         except Exception as e:
             last_error = str(e)
 
-    return { 'integration': integration, 'ha_ws': status, 'ping_ms': latency, 'last_error': last_error }
+    return { 'integration': integration, 'ha_ws': status, 'camera_streams': get_stream_status(), 'ping_ms': latency, 'last_error': last_error }
 
 
 @router.get('/events')
@@ -168,7 +179,7 @@ def get_events(token_payload=Depends(require_token), x_admin_pass: str | None =
     out = []
     for it in recent_events[-100:]:
         out.append({ 'ts': it.get('ts'), 'event': it.get('event') })
-    return { 'events': out }
+    return FastJSONResponse({ 'events': out })
 
 
 @router.get('/registry')
@@ -176,7 +187,7 @@ def get_registry(token_payload=Depends(require_token), x_admin_pass: str | None
     if not _check_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
     snap = get_registry_snapshot()
-    return { 'registry': snap }
+    return FastJSONResponse({ 'registry': snap })
 
 
 @router.post('/clear-events')
@@ -8,10 +8,11 @@ from ..cloud import CloudAuthError, get_cloud_settings, validate_cloud_token
 from ..core import (
     API_TOKEN,
     create_access_token,
+    run_blocking,
+    get_config_snapshot,
     get_user,
-    read_config,
+    update_config,
     verify_user_password,
-    write_config,
 )
 
 router = APIRouter()
@@ -29,11 +30,11 @@ class AuthPayload(BaseModel):
 
 
 @router.post("/login")
-def login(payload: AuthPayload):
+async def login(payload: AuthPayload):
     # username/password login (internal panel)
     if payload.username and payload.password:
         # allow admin stored in config to login
-        data = read_config()
+        data = get_config_snapshot()
         admin = data.get('admin', {})
         if payload.username == admin.get('username'):
             from ..core import verify_admin_password
@@ -54,15 +55,16 @@ def login(payload: AuthPayload):
     if payload.token and payload.token == API_TOKEN:
         # legacy token flow: persist remote integration if provided and return legacy token for compatibility
         if payload.remote_host:
-            data = read_config()
-            adv = data.get("advanced", {}) or {}
-            adv["integration"] = {
-                "host": payload.remote_host,
-                "token": payload.remote_token,
-                "enabled": True,
-            }
-            data["advanced"] = adv
-            write_config(data)
+            def _store_integration(data):
+                adv = data.get("advanced", {}) or {}
+                adv["integration"] = {
+                    "host": payload.remote_host,
+                    "token": payload.remote_token,
+                    "enabled": True,
+                }
+                data["advanced"] = adv
+
+            update_config(_store_integration)
         return {"access_token": API_TOKEN, "token_type": "bearer", "is_admin": False}
 
     # cloud token login
@@ -70,7 +72,8 @@ def login(payload: AuthPayload):
         settings = get_cloud_settings()
         force_local_password = bool(settings.get("require_local_password", True))
         try:
-            cloud_info = validate_cloud_token(payload.cloud_token, payload.instance_id)
+            # introspection mode calls the cloud provider over HTTP
+            cloud_info = await run_blocking(validate_cloud_token, payload.cloud_token, payload.instance_id)
         except CloudAuthError as exc:
             raise HTTPException(status_code=401, detail=str(exc)) from exc
         integration_override = _resolve_cloud_integration(cloud_info)
@@ -107,7 +110,7 @@ def _resolve_cloud_integration(cloud_info: Dict[str, Any]) -> Optional[Dict[str,
     instance_id = cloud_info.get("instance_id")
     if not instance_id:
         return None
-    data = read_config()
+    data = get_config_snapshot()
     pool = data.get("cloud_instances") or []
     for item in pool:
         if item.get("instance_id") == instance_id:
@@ -118,33 +121,35 @@ def _resolve_cloud_integration(cloud_info: Dict[str, Any]) -> Optional[Dict[str,
 
 
 def _persist_cloud_session(cloud_info: Dict[str, Any], resolved_integration: Dict[str, Any]) -> None:
-    data = read_config()
-    advanced = data.get("advanced") or {}
-    integration = advanced.get("integration") or {}
     source = resolved_integration or (cloud_info.get("ha") or {})
-    if source.get("host"):
-        integration["host"] = source["host"]
-    if source.get("token"):
-        integration["token"] = source["token"]
-    for key in ("path", "remote_host", "remote_token", "remote_path"):
-        if source.get(key):
-            integration[key] = source[key]
-    integration["enabled"] = True
-    advanced["integration"] = integration
-    data["advanced"] = advanced
-
-    context = data.get("cloud_context") or {}
-    context.update(
-        {
-            "user_id": cloud_info.get("user_id"),
-            "username": cloud_info.get("username"),
-            "instance_id": cloud_info.get("instance_id"),
-            "last_login_at": datetime.now(timezone.utc).isoformat(),
-            "pending_username": cloud_info.get("username"),
-        }
-    )
-    if cloud_info.get("preferences"):
-        context["preferences"] = cloud_info["preferences"]
-    data["cloud_context"] = context
+    last_login_at = datetime.now(timezone.utc).isoformat()
+
+    def _apply(data: Dict[str, Any]) -> None:
+        advanced = data.get("advanced") or {}
+        integration = advanced.get("integration") or {}
+        if source.get("host"):
+            integration["host"] = source["host"]
+        if source.get("token"):
+            integration["token"] = source["token"]
+        for key in ("path", "remote_host", "remote_token", "remote_path"):
+            if source.get(key):
+                integration[key] = source[key]
+        integration["enabled"] = True
+        advanced["integration"] = integration
+        data["advanced"] = advanced
+
+        context = data.get("cloud_context") or {}
+        context.update(
+            {
+                "user_id": cloud_info.get("user_id"),
+                "username": cloud_info.get("username"),
+                "instance_id": cloud_info.get("instance_id"),
+                "last_login_at": last_login_at,
+                "pending_username": cloud_info.get("username"),
+            }
+        )
+        if cloud_info.get("preferences"):
+            context["preferences"] = cloud_info["preferences"]
+        data["cloud_context"] = context
 
-    write_config(data)
+    update_config(_apply)
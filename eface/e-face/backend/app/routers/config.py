@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, Request
 from pydantic import BaseModel
 
 from ..cloud import get_cloud_settings, sanitize_cloud_settings
-from ..core import read_config, require_token, write_config
+from ..core import get_config_snapshot, get_config_version, require_token, update_config
+from .. import http_cache
 
 router = APIRouter()
 
@@ -13,22 +14,27 @@ class ConfigPayload(BaseModel):
 
 
 @router.get("")
-def get_config(authorization: str | None = Header(default=None)):
+def get_config(request: Request, authorization: str | None = Header(default=None)):
     """Return site configuration; authentication optional."""
     # if a token is provided validate it, otherwise allow anonymous access
     if authorization:
         require_token(authorization)
-    data = read_config()
-    return data
+    # version first: the snapshot read after it is never older than the ETag
+    etag = http_cache.version_etag('config', get_config_version())
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
+    data = get_config_snapshot()
+    return http_cache.json_response(request, data, etag)
 
 
 @router.post("")
 def post_config(cfg: ConfigPayload, _=Depends(require_token)):
-    data = read_config()
-    if cfg.site_name is not None:
-        data["site_name"] = cfg.site_name
-    data["advanced"] = cfg.advanced or {}
-    write_config(data)
+    def _apply(data):
+        if cfg.site_name is not None:
+            data["site_name"] = cfg.site_name
+        data["advanced"] = cfg.advanced or {}
+
+    update_config(_apply)
     return {"ok": True}
 
 
@@ -6,19 +6,20 @@ import re
 import time
 import posixpath
 import logging
+import os
 
 from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
 from pydantic import BaseModel
 from typing import List, Optional
 from urllib.parse import quote, urlparse, urlunparse, urljoin, parse_qsl
 
+import anyio
 import httpx
-import requests
-from requests.exceptions import ChunkedEncodingError
 from fastapi.responses import Response, StreamingResponse
 import websockets
 
-from ..core import read_config, require_token, fetch_ha_rooms
+from ..core import get_config_snapshot, require_token, fetch_ha_rooms_async, doorbell_camera_ids
+from .. import ha_http, ha_ws, hls_cache, http_cache, mjpeg_relay, snapshot_cache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -32,6 +33,32 @@ STREAM_SESSION_TIMEOUTS = {
     'manual': 12.0
 }
 
+# A negotiated upstream HLS URL is reused by later viewers until it has been
+# idle this long (HA keeps an unused stream alive for a few minutes).
+STREAM_URL_IDLE = max(5, int(os.environ.get("EFACE_STREAM_URL_IDLE", "60")))
+_stream_urls: dict[str, dict] = {}
+_stream_url_flights: dict[str, asyncio.Future] = {}
+_stream_url_stats = {'negotiated': 0, 'reused': 0, 'joined': 0}
+# Keep the HLS stream of doorbell-labelled cameras running so a ring shows
+# video at once; costs HA a continuously running stream per camera.
+STREAM_PREWARM = os.environ.get("EFACE_STREAM_PREWARM", "0").lower() in ("1", "true", "yes", "on")
+STREAM_PREWARM_INTERVAL = max(5, int(os.environ.get("EFACE_STREAM_PREWARM_INTERVAL", "20")))
+
+# Tags whose URI="..." attribute points at a playlist, segment or part
+_HLS_URI_TAGS = (
+    '#EXT-X-MAP',
+    '#EXT-X-PART',
+    '#EXT-X-PRELOAD-HINT',
+    '#EXT-X-RENDITION-REPORT',
+    '#EXT-X-MEDIA',
+    '#EXT-X-I-FRAME-STREAM-INF',
+)
+_HLS_URI_ATTR = re.compile(r'URI="([^"]*)"')
+
+# Read size for segments streamed straight from upstream (segment cache off)
+SEGMENT_CHUNK_SIZE = 256 * 1024
+_FORWARDED_SEGMENT_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges', 'Content-Encoding')
+
 # How many times to retry fetching HLS stream segments (init/ts) before failing
 CAMERA_HLS_PROXY_MAX_RETRIES = 5
 # Base backoff in seconds (exponential backoff multiplier)
@@ -53,36 +80,43 @@ def _require_token_flexible(authorization: str = Header(None), token: str | None
 
 
 @router.get("")
-def list_devices(token_payload=Depends(require_token)):
-    data = read_config()
+async def list_devices(request: Request, token_payload=Depends(require_token)):
+    data = get_config_snapshot()
     adv = data.get('advanced', {}) or {}
     integration = adv.get('integration')
     if not integration or not integration.get('enabled'):
         raise HTTPException(status_code=503, detail='integration_missing')
+    etag = http_cache.model_etag('devices', integration)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
     try:
-        rooms = fetch_ha_rooms(integration)
+        rooms = await fetch_ha_rooms_async(integration)
         devices = []
         for r in rooms:
             for d in r.get('devices', []):
                 devices.append(d)
-        return {"devices": devices}
+        etag = http_cache.confirm_model_etag(etag, 'devices', integration)
+        return http_cache.json_response(request, {"devices": devices}, etag)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"integration_failed:{e}")
 
 
 @router.get("/{device_id}")
-def get_device(device_id: str, token_payload=Depends(require_token)):
-    data = read_config()
+async def get_device(device_id: str, request: Request, token_payload=Depends(require_token)):
+    data = get_config_snapshot()
     adv = data.get('advanced', {}) or {}
     integration = adv.get('integration')
     if not integration or not integration.get('enabled'):
         raise HTTPException(status_code=503, detail='integration_missing')
+    etag = http_cache.model_etag('device', integration)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
     try:
-        rooms = fetch_ha_rooms(integration)
+        rooms = await fetch_ha_rooms_async(integration)
         for r in rooms:
             for d in r.get('devices', []):
                 if d.get('id') == device_id:
-                    return d
+                    return http_cache.json_response(request, d, http_cache.confirm_model_etag(etag, 'device', integration))
         raise HTTPException(status_code=404, detail='Not found')
     except HTTPException:
         raise
@@ -110,7 +144,7 @@ class TriggerPayload(BaseModel):
 
 
 def _require_integration():
-    data = read_config()
+    data = get_config_snapshot()
     adv = data.get('advanced', {}) or {}
     integration = adv.get('integration')
     if not integration or not integration.get('enabled'):
@@ -165,15 +199,29 @@ def _integration_stream_targets(integration: dict) -> list[dict[str, str]]:
     return targets
 
 
-def _call_ha_service(domain: str, service: str, payload: dict | None = None):
+async def _call_ha_service(domain: str, service: str, payload: dict | None = None):
     integration = _require_integration()
     host = integration.get('host')
     token = integration.get('token')
     body = payload or {}
+    # prefer the HA websocket; REST is only used while it is down
     try:
-        r = requests.post(
+        await ha_ws.call_service(domain, service, body)
+        return {"ok": True}
+    except ha_ws.CommandUnavailable:
+        pass
+    except ha_ws.CommandError as e:
+        if e.code in ha_ws.INVALID_REQUEST_CODES:
+            raise HTTPException(status_code=400, detail='invalid_request')
+        raise HTTPException(status_code=502, detail=f"service_failed:{e}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail='service_timeout')
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"service_failed:{e}")
+    try:
+        r = await ha_http.get_async_client(host, token).post(
             host.rstrip('/') + f"/api/services/{domain}/{service}",
-            headers={'Authorization': f"Bearer {token}", 'Content-Type': 'application/json'},
+            headers={'Content-Type': 'application/json'},
             json=body,
             timeout=8
         )
@@ -183,11 +231,11 @@ def _call_ha_service(domain: str, service: str, payload: dict | None = None):
         raise HTTPException(status_code=502, detail=f"service_failed:{e}")
 
 
-def _call_light_service(device_id: str, service: str, extra: dict | None = None):
+async def _call_light_service(device_id: str, service: str, extra: dict | None = None):
     payload = {"entity_id": device_id}
     if extra:
         payload.update(extra)
-    return _call_ha_service('light', service, payload)
+    return await _call_ha_service('light', service, payload)
 
 
 def _purge_stream_sessions_locked(now: float | None = None):
@@ -211,7 +259,7 @@ def _register_stream_session(stream_url: str, entity_id: str, auth_token: str):
     session_id = secrets.token_urlsafe(16)
     expires_at = time.time() + STREAM_SESSION_TTL
     with _stream_sessions_lock:
-        _purge_stream_sessions_locked(expires_at)
+        _purge_stream_sessions_locked()
         _stream_sessions[session_id] = {
             'base_url': base_url.rstrip('/'),
             'query': parsed.query,
@@ -266,19 +314,19 @@ async def _fetch_stream_via_target(entity_id: str, target: dict[str, str]) -> st
         headers = {'Authorization': f"Bearer {token}", 'Content-Type': 'application/json'}
         payload = {'entity_id': entity_id, 'camera_entity_id': entity_id}
         quick_timeout = httpx.Timeout(connect=3.0, read=3.0, write=3.0, pool=3.0)
-        async with httpx.AsyncClient(timeout=quick_timeout) as client:
-            resp = await client.post(url, headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json() or {}
-            stream_url = data.get('url')
-            if not stream_url:
-                return None
-            if stream_url.startswith('http'):
-                logger.info('camera %s: received HTTP stream url via %s', entity_id, label)
-                return stream_url
-            resolved = urljoin(host, stream_url)
-            logger.info('camera %s: resolved relative HTTP stream url via %s', entity_id, label)
-            return resolved
+        client = ha_http.get_async_client(host, token)
+        resp = await client.post(url, headers=headers, json=payload, timeout=quick_timeout)
+        resp.raise_for_status()
+        data = resp.json() or {}
+        stream_url = data.get('url')
+        if not stream_url:
+            return None
+        if stream_url.startswith('http'):
+            logger.info('camera %s: received HTTP stream url via %s', entity_id, label)
+            return stream_url
+        resolved = urljoin(host, stream_url)
+        logger.info('camera %s: resolved relative HTTP stream url via %s', entity_id, label)
+        return resolved
 
     try:
         http_url = await _http_attempt()
@@ -368,6 +416,97 @@ async def _fetch_hls_stream_url(entity_id: str) -> tuple[str, str]:
     raise HTTPException(status_code=502, detail=detail)
 
 
+def _stream_url_base(stream_url: str) -> str:
+    return stream_url.split('?', 1)[0].rsplit('/', 1)[0]
+
+
+async def _acquire_hls_stream_url(entity_id: str) -> tuple[str, str]:
+    """Upstream HLS URL for entity_id, negotiated once and shared by all viewers.
+
+    Concurrent negotiations for the same camera share one flight, shielded so
+    a viewer timing out does not cancel it for the others.
+    """
+    now = time.monotonic()
+    with _stream_sessions_lock:
+        cached = _stream_urls.get(entity_id)
+        if cached and now - cached['last_used'] < STREAM_URL_IDLE:
+            cached['last_used'] = now
+            _stream_url_stats['reused'] += 1
+            return cached['url'], cached['token']
+    flight = _stream_url_flights.get(entity_id)
+    if flight is None:
+        _stream_url_stats['negotiated'] += 1
+        flight = asyncio.ensure_future(_fetch_hls_stream_url(entity_id))
+        _stream_url_flights[entity_id] = flight
+
+        def _landed(done, entity_id=entity_id):
+            _stream_url_flights.pop(entity_id, None)
+            if not done.cancelled() and done.exception() is None:
+                stream_url, stream_token = done.result()
+                with _stream_sessions_lock:
+                    _stream_urls[entity_id] = {'url': stream_url, 'token': stream_token, 'last_used': time.monotonic()}
+
+        flight.add_done_callback(_landed)
+    else:
+        _stream_url_stats['joined'] += 1
+    return await asyncio.shield(flight)
+
+
+def _touch_stream_url(entity_id: str, base_url: str):
+    with _stream_sessions_lock:
+        cached = _stream_urls.get(entity_id)
+        if cached and _stream_url_base(cached['url']) == base_url:
+            cached['last_used'] = time.monotonic()
+
+
+def _forget_stream_url(entity_id: str, base_url: str | None = None):
+    """Drop the cached URL after upstream rejected it, so the next viewer renegotiates."""
+    with _stream_sessions_lock:
+        cached = _stream_urls.get(entity_id)
+        if cached and (base_url is None or _stream_url_base(cached['url']) == base_url):
+            _stream_urls.pop(entity_id, None)
+            logger.info('camera %s: dropping cached stream url', entity_id)
+
+
+async def _prewarm_stream(entity_id: str):
+    stream_url, stream_token = await _acquire_hls_stream_url(entity_id)
+    # reading the playlist keeps HA's stream worker alive
+    body, _headers = await _fetch_httpx_bytes(stream_url, token=stream_token, error_detail='camera_prewarm_failed')
+    if body:
+        _touch_stream_url(entity_id, _stream_url_base(stream_url))
+
+
+async def stream_prewarm_task():
+    """Keep the upstream streams of doorbell cameras negotiated and running."""
+    while True:
+        try:
+            for entity_id in doorbell_camera_ids(await fetch_ha_rooms_async(_require_integration())):
+                try:
+                    await _prewarm_stream(entity_id)
+                except HTTPException as exc:
+                    logger.warning('camera %s: prewarm failed: %s', entity_id, exc.detail)
+                    _forget_stream_url(entity_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.debug('stream prewarm skipped: %s', exc)
+        await asyncio.sleep(STREAM_PREWARM_INTERVAL)
+
+
+def get_stream_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    with _stream_sessions_lock:
+        sessions = len(_stream_sessions)
+        urls = sorted(_stream_urls)
+    return {
+        'sessions': sessions,
+        'cached_urls': urls,
+        'url_idle': STREAM_URL_IDLE,
+        'prewarm': STREAM_PREWARM,
+        **_stream_url_stats,
+    }
+
+
 def _merge_query_params(base_query: str | None, client_params) -> dict[str, str]:
     merged: dict[str, str] = {}
     if base_query:
@@ -383,8 +522,38 @@ def _merge_query_params(base_query: str | None, client_params) -> dict[str, str]
     return merged
 
 
+def _hls_proxy_uri(target: str, prefix: str, base_dir: str) -> str | None:
+    """Proxy path for one playlist URI, or None when it must stay as it is."""
+    if '://' in target:
+        parsed = urlparse(target)
+        if parsed.scheme not in {'http', 'https'}:
+            return None
+        candidate, query = (parsed.path or '').lstrip('/'), parsed.query
+    else:
+        candidate, _, query = target.partition('?')
+        candidate = candidate.partition('#')[0]
+        if candidate.startswith('/'):
+            candidate = candidate.lstrip('/')
+        elif base_dir:
+            candidate = f"{base_dir}/{candidate}"
+    candidate = candidate.strip()
+    if not candidate:
+        return None
+    if candidate.startswith('.') or '/.' in candidate or '//' in candidate:
+        candidate = posixpath.normpath(candidate)
+        if candidate.startswith('..'):
+            return None
+        candidate = candidate.lstrip('./')
+    proxied = prefix + candidate
+    return f"{proxied}?{query}" if query else proxied
+
+
 def _rewrite_hls_playlist(body: bytes, session_id: str, resource: str) -> bytes:
-    """Rewrite relative URIs inside an HLS playlist so they keep using the proxy."""
+    """Rewrite the URIs inside an HLS playlist so they keep using the proxy.
+
+    Handles URI lines and the URI="..." attribute of tags such as EXT-X-MAP,
+    EXT-X-PART and EXT-X-PRELOAD-HINT.
+    """
     if not body:
         return body
     try:
@@ -392,66 +561,57 @@ def _rewrite_hls_playlist(body: bytes, session_id: str, resource: str) -> bytes:
     except UnicodeDecodeError:
         return body
 
-    if '.ts' not in text and '.m3u8' not in text:
-        return body
-
+    prefix = f"/api/devices/cameras/streams/{session_id}/"
     base_dir = resource.rsplit('/', 1)[0] if '/' in resource else ''
 
-    def _proxy_path(target: str) -> str | None:
-        stripped = target.strip()
-        if not stripped or stripped.startswith('#'):
-            return None
-        parsed = urlparse(stripped)
-        query = parsed.query
-        if parsed.scheme in {'http', 'https'}:
-            candidate = parsed.path or ''
-        elif stripped.startswith('/'):
-            candidate = stripped.lstrip('/')
+    def _attr(match: re.Match) -> str:
+        proxied = _hls_proxy_uri(match.group(1), prefix, base_dir)
+        return f'URI="{proxied}"' if proxied else match.group(0)
+
+    lines = text.split('\n')
+    changed = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped[0] == '#':
+            if 'URI="' in stripped and stripped.startswith(_HLS_URI_TAGS):
+                rewritten = _HLS_URI_ATTR.sub(_attr, line)
+            else:
+                continue
         else:
-            candidate = f"{base_dir}/{stripped}" if base_dir else stripped
-        candidate = candidate.strip()
-        if not candidate:
-            return None
-        normalized = posixpath.normpath(candidate)
-        if normalized.startswith('..'):
-            return None
-        proxied = f"/api/devices/cameras/streams/{session_id}/{normalized.lstrip('./')}"
-        if query:
-            proxied = f"{proxied}?{query}"
-        return proxied
-
-    rewritten_lines = []
-    for line in text.splitlines():
-        proxy_candidate = _proxy_path(line)
-        rewritten_lines.append(proxy_candidate if proxy_candidate else line)
-    return '\n'.join(rewritten_lines).encode('utf-8')
+            rewritten = _hls_proxy_uri(stripped, prefix, base_dir)
+        if rewritten and rewritten != line:
+            lines[index] = rewritten
+            changed = True
+    return '\n'.join(lines).encode('utf-8') if changed else body
 
 
 @router.post("/{device_id}/brightness")
-def set_brightness(device_id: str, payload: BrightnessPayload, token_payload=Depends(require_token)):
-    return _call_light_service(device_id, 'turn_on', {"brightness": int(payload.brightness)})
+async def set_brightness(device_id: str, payload: BrightnessPayload, token_payload=Depends(require_token)):
+    return await _call_light_service(device_id, 'turn_on', {"brightness": int(payload.brightness)})
 
 
 @router.post("/{device_id}/toggle")
-def toggle_device(device_id: str, token_payload=Depends(require_token)):
-    return _call_light_service(device_id, 'toggle')
+async def toggle_device(device_id: str, token_payload=Depends(require_token)):
+    return await _call_light_service(device_id, 'toggle')
 
 
 @router.post("/{device_id}/turn_on")
-def turn_on_device(device_id: str, payload: TurnOnPayload | None = None, token_payload=Depends(require_token)):
+async def turn_on_device(device_id: str, payload: TurnOnPayload | None = None, token_payload=Depends(require_token)):
     extra = {}
     if payload and payload.brightness is not None:
         extra['brightness'] = int(payload.brightness)
-    return _call_light_service(device_id, 'turn_on', extra)
+    return await _call_light_service(device_id, 'turn_on', extra)
 
 
 @router.post("/{device_id}/turn_off")
-def turn_off_device(device_id: str, token_payload=Depends(require_token)):
-    return _call_light_service(device_id, 'turn_off')
+async def turn_off_device(device_id: str, token_payload=Depends(require_token)):
+    return await _call_light_service(device_id, 'turn_off')
 
 
 @router.post("/{device_id}/color")
-def set_color(device_id: str, payload: ColorPayload, token_payload=Depends(require_token)):
+async def set_color(device_id: str, payload: ColorPayload, token_payload=Depends(require_token)):
     extra = {}
     if payload.rgb_color:
         rgb = list(payload.rgb_color)
@@ -466,11 +626,11 @@ def set_color(device_id: str, payload: ColorPayload, token_payload=Depends(requi
         extra['brightness'] = int(payload.brightness)
     if not extra:
         raise HTTPException(status_code=400, detail='missing_parameters')
-    return _call_light_service(device_id, 'turn_on', extra)
+    return await _call_light_service(device_id, 'turn_on', extra)
 
 
 @router.post("/{entity_id}/trigger")
-def trigger_entity(entity_id: str, payload: TriggerPayload, token_payload=Depends(require_token)):
+async def trigger_entity(entity_id: str, payload: TriggerPayload, token_payload=Depends(require_token)):
     if not payload.service:
         raise HTTPException(status_code=400, detail='missing_service')
     domain = payload.domain
@@ -481,39 +641,16 @@ def trigger_entity(entity_id: str, payload: TriggerPayload, token_payload=Depend
     data = {'entity_id': entity_id}
     if isinstance(payload.data, dict):
         data.update(payload.data)
-    return _call_ha_service(domain, payload.service, data)
+    return await _call_ha_service(domain, payload.service, data)
 
 
-def _camera_proxy_endpoint(entity_id: str, endpoint: str) -> tuple[str, dict[str, str]]:
+def _camera_proxy_endpoint(entity_id: str, endpoint: str) -> tuple[str, str]:
     integration = _require_integration()
     host = integration.get('host')
     token = integration.get('token')
     encoded = quote(entity_id, safe='')
     url = host.rstrip('/') + f"/api/{endpoint}/{encoded}"
-    return url, {'Authorization': f"Bearer {token}"}
-
-
-def _camera_proxy_request(entity_id: str, endpoint: str, stream: bool = False):
-    url, headers = _camera_proxy_endpoint(entity_id, endpoint)
-    timeout = (8, None) if stream else 15
-    try:
-        resp = requests.get(url, headers=headers, stream=stream, timeout=timeout)
-        resp.raise_for_status()
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=f"camera_proxy_failed:{exc}") from exc
-    return resp
-
-
-def _camera_stream_iterator(resp, chunk_size: int = 8192):
-    try:
-        for chunk in resp.iter_content(chunk_size=chunk_size):
-            if chunk:
-                yield chunk
-    except ChunkedEncodingError:
-        # Upstream camera closed the stream abruptly; treat as finished.
-        return
-    finally:
-        resp.close()
+    return url, token
 
 
 def _httpx_timeout(stream: bool) -> httpx.Timeout:
@@ -525,17 +662,17 @@ def _httpx_timeout(stream: bool) -> httpx.Timeout:
 async def _open_httpx_stream(
     url: str,
     *,
-    headers: dict[str, str] | None = None,
+    token: str | None = None,
     params: dict[str, str] | None = None,
     timeout: httpx.Timeout | None = None,
     error_detail: str = 'camera_proxy_failed'
-) -> tuple[httpx.AsyncClient, httpx.Response]:
+) -> httpx.Response:
     timeout = timeout or _httpx_timeout(True)
-    client = httpx.AsyncClient(timeout=timeout)
+    client = ha_http.get_async_client(url, token)
     try:
         # NOTE: httpx.AsyncClient.get does not accept a `stream` kwarg.
         # Use a regular .get() and stream the response via `aiter_bytes()` later.
-        resp = await client.get(url, headers=headers, params=params)
+        resp = await client.get(url, params=params, timeout=timeout)
         try:
             resp.raise_for_status()
         except httpx.HTTPStatusError as http_exc:
@@ -555,9 +692,8 @@ async def _open_httpx_stream(
             logger.warning('camera stream proxy: upstream responded with error url=%s status=%s headers=%s retry_after=%s body=%s', url, getattr(resp, 'status_code', None), dict(resp.headers), retry_after, resp_body)
             # Re-raise so the outer handler can include useful diagnostics; include retry-after in the raised error detail
             raise
-        return client, resp
+        return resp
     except Exception as exc:
-        await client.aclose()
         # If it's an HTTPStatusError include response status and Retry-After for easier debugging and client behavior
         if isinstance(exc, httpx.HTTPStatusError) and getattr(exc, 'response', None) is not None:
             status = exc.response.status_code
@@ -578,66 +714,168 @@ async def _open_httpx_stream(
 async def _fetch_httpx_bytes(
     url: str,
     *,
-    headers: dict[str, str] | None = None,
+    token: str | None = None,
     params: dict[str, str] | None = None,
     timeout: httpx.Timeout | None = None,
     error_detail: str = 'camera_proxy_failed'
 ) -> tuple[bytes, httpx.Headers]:
     timeout = timeout or _httpx_timeout(False)
-    async with httpx.AsyncClient(timeout=timeout) as client:
+    client = ha_http.get_async_client(url, token)
+    try:
+        resp = await client.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"{error_detail}:{exc}") from exc
+    return resp.content, resp.headers
+
+
+class _UpstreamStreamResponse(StreamingResponse):
+    """StreamingResponse that always releases its upstream httpx response.
+
+    Starlette does not close the body iterator when the client goes away, so
+    the pooled connection is released here, shielded from that cancellation.
+    """
+
+    def __init__(self, upstream: httpx.Response, **kwargs):
+        self.upstream = upstream
+        super().__init__(upstream.aiter_raw(SEGMENT_CHUNK_SIZE), **kwargs)
+
+    async def __call__(self, scope, receive, send):
         try:
-            resp = await client.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-        except Exception as exc:
-            raise HTTPException(status_code=502, detail=f"{error_detail}:{exc}") from exc
-        return resp.content, resp.headers
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.upstream.aclose()
 
 
-def _streaming_response_from_httpx(
-    client: httpx.AsyncClient,
-    resp: httpx.Response,
-    default_media_type: str,
-    extra_headers: dict[str, str] | None = None
-) -> StreamingResponse:
-    async def iterator():
+class _RelayStreamResponse(StreamingResponse):
+    """StreamingResponse for one MJPEG relay viewer that always unsubscribes it.
+
+    The body generator may never start when the client is already gone, so
+    the viewer is released here rather than in the generator.
+    """
+
+    def __init__(self, relay, viewer, **kwargs):
+        self.relay = relay
+        self.viewer = viewer
+        super().__init__(mjpeg_relay.iter_parts(relay, viewer), **kwargs)
+
+    async def __call__(self, scope, receive, send):
         try:
-            async for chunk in resp.aiter_bytes():
-                if chunk:
-                    yield chunk
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            return
+            await super().__call__(scope, receive, send)
         finally:
-            try:
-                await resp.aclose()
-            finally:
-                await client.aclose()
+            mjpeg_relay.unsubscribe(self.relay, self.viewer)
 
-    media_type = resp.headers.get('Content-Type') or default_media_type
-    streaming = StreamingResponse(iterator(), media_type=media_type)
-    if extra_headers:
-        for key, value in extra_headers.items():
-            streaming.headers[key] = value
-    return streaming
+
+async def _stream_upstream_segment(
+    url: str,
+    token: str | None,
+    params: dict[str, str] | None,
+    range_header: str | None
+) -> StreamingResponse:
+    """Pass a segment through without buffering it, forwarding Range and its answer."""
+    client = ha_http.get_async_client(url, token)
+    request = client.build_request(
+        'GET',
+        url,
+        params=params,
+        headers={'Range': range_header} if range_header else None,
+        timeout=_httpx_timeout(True)
+    )
+    try:
+        resp = await client.send(request, stream=True)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"camera_hls_proxy_failed:{exc}") from exc
+    if resp.status_code >= 400:
+        retry_after = resp.headers.get('Retry-After')
+        await resp.aclose()
+        detail = f"camera_hls_proxy_failed:http_status_{resp.status_code}"
+        if retry_after:
+            detail += f":retry_after_{retry_after}"
+        raise HTTPException(status_code=502, detail=detail)
+    headers = {'Cache-Control': 'no-store'}
+    for name in _FORWARDED_SEGMENT_HEADERS:
+        if name in resp.headers:
+            headers[name] = resp.headers[name]
+    return _UpstreamStreamResponse(
+        resp,
+        status_code=resp.status_code,
+        media_type=resp.headers.get('Content-Type') or 'video/mp2t',
+        headers=headers
+    )
+
+
+async def _with_segment_retries(open_once, session_id: str, upstream: str, resource: str):
+    """Await open_once() with the HLS proxy retry/backoff; re-raises the last HTTPException."""
+    start_time = time.time()
+    last_exc: HTTPException | None = None
+    attempt = 0
+    while attempt < CAMERA_HLS_PROXY_MAX_RETRIES:
+        attempt += 1
+        try:
+            result = await open_once()
+            duration = time.time() - start_time
+            logger.debug('camera stream proxy: segment fetched session=%s upstream=%s resource=%s duration=%.3fs attempt=%d', session_id, upstream, resource, duration, attempt)
+            return result
+        except HTTPException as exc:
+            duration = time.time() - start_time
+            last_exc = exc
+            logger.warning('camera stream proxy: stream fetch failed session=%s upstream=%s resource=%s duration=%.3fs attempt=%d detail=%s', session_id, upstream, resource, duration, attempt, getattr(exc, 'detail', repr(exc)))
+            if attempt < CAMERA_HLS_PROXY_MAX_RETRIES:
+                backoff = CAMERA_HLS_PROXY_BACKOFF_BASE * (2 ** (attempt - 1))
+                logger.info('camera stream proxy: retrying after %.1fs (attempt %d/%d)', backoff, attempt + 1, CAMERA_HLS_PROXY_MAX_RETRIES)
+                await asyncio.sleep(backoff)
+    raise last_exc
 
 
 @router.get("/cameras/{entity_id:path}/stream")
-def camera_stream(entity_id: str, token_payload=Depends(_require_token_flexible)):
-    resp = _camera_proxy_request(entity_id, 'camera_proxy_stream', stream=True)
-    media_type = resp.headers.get('Content-Type') or 'multipart/x-mixed-replace; boundary=frame'
-    return StreamingResponse(
-        _camera_stream_iterator(resp),
-        media_type=media_type,
+async def camera_stream(
+    entity_id: str,
+    fps: float | None = Query(None),
+    token_payload=Depends(_require_token_flexible)
+):
+    # all viewers of a camera share one upstream MJPEG connection
+    url, token = _camera_proxy_endpoint(entity_id, 'camera_proxy_stream')
+    try:
+        relay, viewer = await mjpeg_relay.subscribe(entity_id, url, token, fps)
+    except mjpeg_relay.RelayUnavailable as exc:
+        raise HTTPException(status_code=502, detail=f"camera_proxy_failed:{exc}") from exc
+    return _RelayStreamResponse(
+        relay,
+        viewer,
+        media_type=mjpeg_relay.MEDIA_TYPE,
         headers={'Cache-Control': 'no-store'}
     )
 
 
 @router.get("/cameras/{entity_id:path}/snapshot")
-def camera_snapshot(entity_id: str, token_payload=Depends(_require_token_flexible)):
-    resp = _camera_proxy_request(entity_id, 'camera_proxy', stream=False)
-    media_type = resp.headers.get('Content-Type') or 'image/jpeg'
-    return Response(content=resp.content, media_type=media_type)
+async def camera_snapshot(
+    entity_id: str,
+    request: Request,
+    width: int | None = Query(None, ge=1),
+    quality: int | None = Query(None, ge=1, le=100),
+    max_age: float | None = Query(None, ge=0),
+    token_payload=Depends(_require_token_flexible)
+):
+    url, token = _camera_proxy_endpoint(entity_id, 'camera_proxy')
+    try:
+        # without an explicit max_age a recent snapshot is served at once and refreshed behind it
+        stale = snapshot_cache.STALE_WHILE_REVALIDATE if max_age is None else 0.0
+        snapshot = await snapshot_cache.get(entity_id, url, token, max_age, stale)
+    except snapshot_cache.SnapshotUnavailable as exc:
+        raise HTTPException(status_code=502, detail=f"camera_proxy_failed:{exc}") from exc
+    body, media_type, etag = snapshot['body'], snapshot['content_type'], snapshot['etag']
+    thumb = snapshot_cache.thumbnail_params(width, quality)
+    if thumb:
+        body, media_type, etag = await snapshot_cache.thumbnail(snapshot, *thumb)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_cache.http_date(snapshot['fetched_at']),
+        'Cache-Control': http_cache.CACHE_CONTROL
+    }
+    if http_cache.is_fresh(request, etag) or http_cache.unmodified_since(request, snapshot['fetched_at']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
 
 
 @router.post("/cameras/{entity_id:path}/stream_session")
@@ -649,7 +887,7 @@ async def camera_stream_session(
     timeout_seconds = _resolve_stream_session_timeout(mode)
     logger.info('camera %s: creating stream session (mode=%s, timeout=%ss)', entity_id, mode or 'auto', timeout_seconds)
     try:
-        stream_url, stream_token = await asyncio.wait_for(_fetch_hls_stream_url(entity_id), timeout=timeout_seconds)
+        stream_url, stream_token = await asyncio.wait_for(_acquire_hls_stream_url(entity_id), timeout=timeout_seconds)
     except HTTPException:
         logger.warning('camera %s: stream session failed with HTTPException', entity_id)
         raise
@@ -687,17 +925,22 @@ async def camera_stream_proxy(
         auth_token = integration.get('token')
         if not auth_token:
             raise HTTPException(status_code=503, detail='integration_missing')
-    auth_headers = {'Authorization': f"Bearer {auth_token}"}
+    cache_key = hls_cache.cache_key(upstream, params)
     if resource.lower().endswith('.m3u8'):
         start_time = time.time()
-        try:
+
+        async def _load_playlist():
             body, upstream_headers = await _fetch_httpx_bytes(
                 upstream,
-                headers=auth_headers,
+                token=auth_token,
                 params=params,
                 timeout=_httpx_timeout(False),
                 error_detail='camera_hls_proxy_failed'
             )
+            return body, upstream_headers.get('Content-Type')
+
+        try:
+            cached = await hls_cache.fetch(entry['entity_id'], cache_key, _load_playlist, hls_cache.PLAYLIST_TTL, playlist=True)
         except HTTPException as exc:
             duration = time.time() - start_time
             # Surface HLS-specific diagnostics and treat upstream 400 (Bad Request)
@@ -715,50 +958,54 @@ async def camera_stream_proxy(
                 retry_after = '1'
                 logger.info('[hls] camera stream proxy: mapping upstream 400 -> 503 Retry-After=%s session=%s resource=%s', retry_after, session_id, resource)
                 return Response(content='warming', status_code=503, media_type='text/plain', headers={'Retry-After': retry_after})
+            cause = exc.__cause__
+            if isinstance(cause, httpx.HTTPStatusError) and cause.response.status_code in (401, 403, 404):
+                # the upstream stream is gone; do not hand its URL to new viewers
+                _forget_stream_url(entry['entity_id'], entry['base_url'])
             # Otherwise re-raise the original HTTPException
             raise
         duration = time.time() - start_time
-        try:
-            logger.debug('camera stream proxy: playlist proxied session=%s upstream=%s resource=%s duration=%.3fs content_type=%s', session_id, upstream, resource, duration, upstream_headers.get('Content-Type'))
-        except Exception:
-            logger.debug('camera stream proxy: playlist proxied session=%s upstream=%s resource=%s duration=%.3fs', session_id, upstream, resource, duration)
-        body = _rewrite_hls_playlist(body, session_id, resource)
-        content_type = upstream_headers.get('Content-Type') or 'application/vnd.apple.mpegurl'
+        _touch_stream_url(entry['entity_id'], entry['base_url'])
+        logger.debug('camera stream proxy: playlist proxied session=%s upstream=%s resource=%s duration=%.3fs content_type=%s', session_id, upstream, resource, duration, cached['content_type'])
+        body = hls_cache.rewritten(cached, session_id, lambda raw: _rewrite_hls_playlist(raw, session_id, resource))
+        content_type = cached['content_type'] or 'application/vnd.apple.mpegurl'
         return Response(content=body, media_type=content_type, headers={'Cache-Control': 'no-store'})
-    start_time = time.time()
-    last_exc: Exception | None = None
-    attempt = 0
-    while attempt < CAMERA_HLS_PROXY_MAX_RETRIES:
-        attempt += 1
-        try:
-            client, resp = await _open_httpx_stream(
+
+    async def _load_segment():
+        resp = await _with_segment_retries(
+            lambda: _open_httpx_stream(
                 upstream,
-                headers=auth_headers,
+                token=auth_token,
                 params=params,
                 timeout=_httpx_timeout(True),
                 error_detail='camera_hls_proxy_failed'
+            ),
+            session_id,
+            upstream,
+            resource
+        )
+        return resp.content, resp.headers.get('Content-Type')
+
+    try:
+        if not hls_cache.SEGMENTS_ENABLED:
+            # retried like cached segments; nothing has been sent to the client yet
+            return await _with_segment_retries(
+                lambda: _stream_upstream_segment(upstream, auth_token, params, request.headers.get('range')),
+                session_id,
+                upstream,
+                resource
             )
-            duration = time.time() - start_time
-            try:
-                logger.debug('camera stream proxy: stream proxied session=%s upstream=%s resource=%s duration=%.3fs headers=%s attempt=%d', session_id, upstream, resource, duration, dict(resp.headers), attempt)
-            except Exception:
-                logger.debug('camera stream proxy: stream proxied session=%s upstream=%s resource=%s duration=%.3fs attempt=%d', session_id, upstream, resource, duration, attempt)
-            return _streaming_response_from_httpx(
-                client,
-                resp,
-                'video/mp2t',
-                extra_headers={'Cache-Control': 'no-store'}
-            )
-        except HTTPException as exc:
-            duration = time.time() - start_time
-            last_exc = exc
-            logger.warning('camera stream proxy: stream fetch failed session=%s upstream=%s resource=%s duration=%.3fs attempt=%d detail=%s', session_id, upstream, resource, duration, attempt, getattr(exc, 'detail', repr(exc)))
-            if attempt < CAMERA_HLS_PROXY_MAX_RETRIES:
-                backoff = CAMERA_HLS_PROXY_BACKOFF_BASE * (2 ** (attempt - 1))
-                logger.info('camera stream proxy: retrying after %.1fs (attempt %d/%d)', backoff, attempt + 1, CAMERA_HLS_PROXY_MAX_RETRIES)
-                await asyncio.sleep(backoff)
-            else:
-                break
+        # viewers of the same camera share one download per segment
+        cached = await hls_cache.fetch(entry['entity_id'], cache_key, _load_segment, hls_cache.SEGMENT_TTL)
+        # the cached bytes go to the server as they are; ranges get a slice
+        return http_cache.bytes_response(
+            request,
+            cached['body'],
+            cached['content_type'] or 'video/mp2t',
+            {'Cache-Control': 'no-store'}
+        )
+    except HTTPException as exc:
+        last_exc = exc
 
     # All attempts exhausted — return a transient 503 with Retry-After to let clients back off/wait
     logger.warning('camera stream proxy: all attempts failed session=%s upstream=%s resource=%s last_error=%s', session_id, upstream, resource, getattr(last_exc, 'detail', repr(last_exc)))
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from ..core import read_config, require_token
+from ..core import get_config_snapshot, require_token
 
 router = APIRouter()
 
 
 def _integration_settings():
-    cfg = read_config()
+    cfg = get_config_snapshot()
     return (cfg.get('advanced') or {}).get('integration') or {}
 
 
@@ -1,39 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
-from ..core import read_config, require_token, fetch_ha_rooms
+from fastapi import APIRouter, Depends, HTTPException, Request
+from ..core import get_config_snapshot, require_token, fetch_ha_rooms_async
+from .. import http_cache
 
 router = APIRouter()
 
 
 @router.get("")
-def list_rooms(token_payload=Depends(require_token)):
-    data = read_config()
+async def list_rooms(request: Request, token_payload=Depends(require_token)):
+    data = get_config_snapshot()
     adv = data.get('advanced', {}) or {}
     integration = adv.get('integration')
     # require HA integration: if present and enabled, try to fetch; otherwise return 503 so frontend shows message
     if not integration or not integration.get('enabled'):
         raise HTTPException(status_code=503, detail="integration_missing")
+    # taken before the fetch, so the body is never older than its ETag
+    etag = http_cache.model_etag('rooms', integration)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
     try:
-        rooms, meta = fetch_ha_rooms(integration, include_meta=True)
+        rooms, meta = await fetch_ha_rooms_async(integration, include_meta=True)
         response = {"rooms": rooms, "source": "ha"}
         if isinstance(meta, dict):
             response.update(meta)
-        return response
+        # the payload is plain JSON already; skip jsonable_encoder, which would
+        # walk the whole room tree on the event loop
+        return http_cache.json_response(request, response, http_cache.confirm_model_etag(etag, 'rooms', integration))
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"integration_failed:{str(e)}")
 
 
 @router.get("/{room_id}")
-def get_room(room_id: str, token_payload=Depends(require_token)):
-    data = read_config()
+async def get_room(room_id: str, request: Request, token_payload=Depends(require_token)):
+    data = get_config_snapshot()
     adv = data.get('advanced', {}) or {}
     integration = adv.get('integration')
     if not integration or not integration.get('enabled'):
         raise HTTPException(status_code=503, detail="integration_missing")
+    etag = http_cache.model_etag('room', integration)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
     try:
-        rooms = fetch_ha_rooms(integration)
+        rooms = await fetch_ha_rooms_async(integration)
         for r in rooms:
             if r.get('id') == room_id:
-                return r
+                return http_cache.json_response(request, r, http_cache.confirm_model_etag(etag, 'room', integration))
         raise HTTPException(status_code=404, detail='Room not found')
     except HTTPException:
         raise
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
-from ..core import read_config, write_config, require_token, get_user, create_user, verify_user_password, set_user_password
+from ..core import get_config_snapshot, require_token, get_user, create_user, verify_user_password, set_user_password
 
 router = APIRouter()
 
@@ -36,7 +36,7 @@ def create_user_admin(payload: CreateUserPayload, token_payload=Depends(require_
 def list_users(token_payload=Depends(require_token), x_admin_pass: str | None = Header(None)):
     if not _is_admin(token_payload, x_admin_pass):
         raise HTTPException(status_code=403, detail="Admin required")
-    data = read_config()
+    data = get_config_snapshot()
     users = data.get('users', [])
     # don't expose password hashes
     return [{"username": u.get('username'), "is_admin": bool(u.get('is_admin')), "must_change": bool(u.get('must_change'))} for u in users]
@@ -0,0 +1,204 @@
+"""Cached camera snapshots and downscaled thumbnails.
+
+A snapshot younger than the requested max age is served from memory;
+otherwise one refresh per camera runs at a time and concurrent requests wait
+for it.  Callers may accept an older snapshot (stale-while-revalidate) and
+let the refresh finish in the background; the prefetcher keeps those warm.
+A running MJPEG relay provides fresh frames without asking HA.
+Thumbnails (width/quality) are produced with Pillow when it is installed and
+cached on the snapshot they were made from.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import httpx
+
+from . import ha_http, mjpeg_relay
+from .core import run_blocking
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+logger = logging.getLogger("e-face.snapshot_cache")
+
+MAX_AGE = max(0.0, float(os.environ.get("EFACE_SNAPSHOT_MAX_AGE", "2")))
+# snapshots up to this old are served at once while a refresh runs
+STALE_WHILE_REVALIDATE = max(0.0, float(os.environ.get("EFACE_SNAPSHOT_STALE", "30")))
+# upper bound for the max_age a client may ask for
+MAX_AGE_LIMIT = 60.0
+FETCH_TIMEOUT = httpx.Timeout(15.0)
+# requested widths are rounded up to a multiple of this, so only a few
+# thumbnail sizes exist per camera
+THUMB_WIDTH_STEP = 80
+THUMB_MAX_WIDTH = 1920
+THUMB_DEFAULT_QUALITY = 75
+THUMB_VARIANTS = 8
+
+THUMBNAILS_AVAILABLE = Image is not None
+
+_lock = threading.Lock()
+_snapshots: dict[str, dict] = {}
+_refreshes: dict[str, asyncio.Future] = {}
+_stats = {'hits': 0, 'stale': 0, 'joined': 0, 'fetches': 0, 'relay_frames': 0, 'thumbnails': 0, 'errors': 0}
+
+
+class SnapshotUnavailable(Exception):
+    """HA did not return a snapshot."""
+
+
+def _entry(body: bytes, content_type: str | None, fetched_at: float) -> dict:
+    return {
+        'body': body,
+        'content_type': content_type or 'image/jpeg',
+        'fetched_at': fetched_at,
+        'etag': '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"',
+        'thumbnails': {},
+    }
+
+
+def peek(entity_id: str) -> dict | None:
+    with _lock:
+        return _snapshots.get(entity_id)
+
+
+def store(entity_id: str, body: bytes, content_type: str | None, fetched_at: float | None = None) -> dict:
+    entry = _entry(body, content_type, fetched_at or time.time())
+    with _lock:
+        _snapshots[entity_id] = entry
+    return entry
+
+
+async def _fetch(entity_id: str, url: str, token: str | None) -> dict:
+    client = ha_http.get_async_client(url, token)
+    try:
+        resp = await client.get(url, timeout=FETCH_TIMEOUT)
+        resp.raise_for_status()
+    except Exception as exc:
+        _stats['errors'] += 1
+        raise SnapshotUnavailable(str(exc)) from exc
+    return store(entity_id, resp.content, resp.headers.get('Content-Type'))
+
+
+def camera_proxy_url(integration: dict, entity_id: str) -> str:
+    return integration.get('host').rstrip('/') + f"/api/camera_proxy/{quote(entity_id, safe='')}"
+
+
+async def get(
+    entity_id: str,
+    url: str,
+    token: str | None,
+    max_age: float | None = None,
+    stale: float = 0.0,
+) -> dict:
+    """Snapshot of entity_id no older than max_age seconds.
+
+    url/token point at HA's camera_proxy for the camera.  With ``stale`` a
+    snapshot up to that old is returned at once and refreshed in the
+    background.  Raises SnapshotUnavailable when it has to be fetched and HA
+    fails.
+    """
+    max_age = MAX_AGE if max_age is None else min(MAX_AGE_LIMIT, max(0.0, max_age))
+    now = time.time()
+    entry = peek(entity_id)
+    if entry is not None and now - entry['fetched_at'] <= max_age:
+        _stats['hits'] += 1
+        return entry
+    frame = mjpeg_relay.latest_frame(entity_id)
+    if frame is not None and now - frame[1] <= max_age:
+        _stats['relay_frames'] += 1
+        return store(entity_id, frame[0], 'image/jpeg', frame[1])
+    flight = _start_refresh(entity_id, url, token)
+    if entry is not None and now - entry['fetched_at'] <= stale:
+        _stats['stale'] += 1
+        return entry
+    return await asyncio.shield(flight)
+
+
+async def refresh(integration: dict, entity_id: str) -> dict:
+    """Fetch a new snapshot now (joins a refresh already running)."""
+    return await asyncio.shield(_start_refresh(entity_id, camera_proxy_url(integration, entity_id), integration.get('token')))
+
+
+def _start_refresh(entity_id: str, url: str, token: str | None) -> asyncio.Future:
+    flight = _refreshes.get(entity_id)
+    if flight is None:
+        _stats['fetches'] += 1
+        flight = asyncio.ensure_future(_fetch(entity_id, url, token))
+        _refreshes[entity_id] = flight
+
+        def _landed(done, entity_id=entity_id):
+            _refreshes.pop(entity_id, None)
+            # background refreshes may have no waiter; mark failures as seen
+            if not done.cancelled():
+                done.exception()
+
+        flight.add_done_callback(_landed)
+    else:
+        _stats['joined'] += 1
+    return flight
+
+
+def thumbnail_params(width: int | None, quality: int | None) -> tuple[int, int] | None:
+    """Normalised (width, quality) or None when the original should be served."""
+    if not width or not THUMBNAILS_AVAILABLE:
+        return None
+    width = min(THUMB_MAX_WIDTH, max(THUMB_WIDTH_STEP, -(-int(width) // THUMB_WIDTH_STEP) * THUMB_WIDTH_STEP))
+    quality = min(95, max(30, int(quality or THUMB_DEFAULT_QUALITY)))
+    return width, quality
+
+
+def _render_thumbnail(body: bytes, width: int, quality: int) -> bytes | None:
+    with Image.open(io.BytesIO(body)) as image:
+        if image.width <= width:
+            return None
+        height = max(1, round(image.height * width / image.width))
+        image.draft('RGB', (width, height))
+        thumb = image.convert('RGB').resize((width, height), Image.BILINEAR)
+    out = io.BytesIO()
+    thumb.save(out, format='JPEG', quality=quality, optimize=False)
+    return out.getvalue()
+
+
+async def thumbnail(entry: dict, width: int, quality: int) -> tuple[bytes, str, str]:
+    """(body, content_type, etag) of the entry downscaled to width."""
+    key = (width, quality)
+    cached = entry['thumbnails'].get(key)
+    if cached is None:
+        try:
+            body = await run_blocking(_render_thumbnail, entry['body'], width, quality)
+        except Exception as exc:
+            logger.debug('thumbnail failed: %s', exc)
+            body = None
+        if body is None:
+            # already small enough or not decodable: serve the original
+            cached = (entry['body'], entry['content_type'], entry['etag'])
+        else:
+            _stats['thumbnails'] += 1
+            cached = (body, 'image/jpeg', entry['etag'][:-1] + f'-w{width}q{quality}"')
+        if len(entry['thumbnails']) >= THUMB_VARIANTS:
+            entry['thumbnails'].clear()
+        entry['thumbnails'][key] = cached
+    return cached
+
+
+def get_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        cameras = len(_snapshots)
+    return {
+        'cameras': cameras,
+        'max_age': MAX_AGE,
+        'stale_while_revalidate': STALE_WHILE_REVALIDATE,
+        'thumbnails_available': THUMBNAILS_AVAILABLE,
+        'inflight': len(_refreshes),
+        **_stats,
+    }
@@ -0,0 +1,184 @@
+"""Keep a recent snapshot of every dashboard camera in the snapshot cache.
+
+Cameras are refreshed every ``INTERVAL`` seconds while panels are connected
+to /ws and every ``IDLE_INTERVAL`` seconds otherwise.  When a motion or
+doorbell sensor related to a camera (same device or same area) turns on, the
+camera is refreshed every ``BOOST_INTERVAL`` seconds for ``BOOST_WINDOW``
+seconds.  The HA websocket reports state changes via notify_state_changed.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from . import snapshot_cache, ws_hub
+from .core import doorbell_camera_ids, fetch_ha_rooms_async, get_config_snapshot
+from .registry_cache import get_registry_snapshot
+
+logger = logging.getLogger("e-face.snapshot_prefetch")
+
+ENABLED = os.environ.get("EFACE_SNAPSHOT_PREFETCH", "1").lower() not in ("0", "false", "no", "off")
+INTERVAL = max(2.0, float(os.environ.get("EFACE_SNAPSHOT_PREFETCH_INTERVAL", "10")))
+IDLE_INTERVAL = max(INTERVAL, float(os.environ.get("EFACE_SNAPSHOT_PREFETCH_IDLE_INTERVAL", "120")))
+BOOST_INTERVAL = max(1.0, float(os.environ.get("EFACE_SNAPSHOT_BOOST_INTERVAL", "2")))
+BOOST_WINDOW = max(BOOST_INTERVAL, float(os.environ.get("EFACE_SNAPSHOT_BOOST_WINDOW", "30")))
+# how often the camera list is re-read from the rooms payload
+CAMERA_LIST_TTL = 60.0
+CONCURRENCY = 4
+
+TRIGGER_DEVICE_CLASSES = {'motion', 'occupancy', 'presence', 'doorbell'}
+
+_cameras: list[dict] = []
+_cameras_loaded_at = 0.0
+_doorbell_cameras: frozenset = frozenset()
+_last_fetch: dict[str, float] = {}
+_boosts: dict[str, float] = {}
+_wake: asyncio.Event | None = None
+_stats = {'refreshed': 0, 'failed': 0, 'boosts': 0}
+
+
+def _integration() -> dict | None:
+    integration = (get_config_snapshot().get('advanced') or {}).get('integration')
+    if not integration or not integration.get('enabled') or not integration.get('host') or not integration.get('token'):
+        return None
+    return integration
+
+
+def _placement(entity_id: str, registry: dict | None) -> tuple[str | None, str | None]:
+    """(device_id, area_id) of an entity according to the registry snapshot."""
+    if not registry:
+        return None, None
+    entry = (registry.get('entities') or {}).get(entity_id) or {}
+    device_id = entry.get('device_id')
+    area_id = entry.get('area_id')
+    if not area_id and device_id:
+        area_id = ((registry.get('devices') or {}).get(device_id) or {}).get('area_id')
+    return device_id, area_id
+
+
+async def _load_cameras(integration: dict):
+    global _cameras, _cameras_loaded_at, _doorbell_cameras
+    rooms = await fetch_ha_rooms_async(integration)
+    registry = get_registry_snapshot()
+    cameras = {}
+    for room in rooms:
+        for camera in room.get('cameras') or []:
+            entity_id = camera.get('entity_id')
+            if not entity_id or entity_id in cameras:
+                continue
+            device_id, area_id = _placement(entity_id, registry)
+            cameras[entity_id] = {
+                'entity_id': entity_id,
+                'device_id': device_id,
+                'area_id': area_id or camera.get('room_id'),
+            }
+    _cameras = list(cameras.values())
+    _doorbell_cameras = frozenset(doorbell_camera_ids(rooms))
+    _cameras_loaded_at = time.monotonic()
+
+
+def _is_trigger(entity_id: str, new_state: dict) -> bool:
+    domain = entity_id.split('.', 1)[0]
+    attrs = new_state.get('attributes') or {}
+    device_class = attrs.get('device_class')
+    if domain == 'binary_sensor':
+        return new_state.get('state') == 'on' and (device_class in TRIGGER_DEVICE_CLASSES or 'doorbell' in entity_id)
+    if domain == 'event':
+        # event entities change state (the timestamp) every time they fire
+        return device_class == 'doorbell' or 'doorbell' in entity_id
+    return False
+
+
+def notify_state_changed(entity_id: str | None, new_state: dict | None):
+    """Boost the cameras related to a motion/doorbell sensor that just fired."""
+    if not ENABLED or not entity_id or not isinstance(new_state, dict) or not _cameras:
+        return
+    if not _is_trigger(entity_id, new_state):
+        return
+    device_id, area_id = _placement(entity_id, get_registry_snapshot())
+    targets = {
+        camera['entity_id'] for camera in _cameras
+        if (device_id and camera['device_id'] == device_id) or (area_id and camera['area_id'] == area_id)
+    }
+    if 'doorbell' in entity_id or (new_state.get('attributes') or {}).get('device_class') == 'doorbell':
+        targets |= _doorbell_cameras
+    if not targets:
+        return
+    until = time.monotonic() + BOOST_WINDOW
+    for camera_id in targets:
+        if _boosts.get(camera_id, 0) < time.monotonic():
+            _stats['boosts'] += 1
+            # fetch a boosted camera right away
+            _last_fetch.pop(camera_id, None)
+        _boosts[camera_id] = until
+    if _wake is not None:
+        _wake.set()
+
+
+def _interval_for(entity_id: str, now: float) -> float:
+    if _boosts.get(entity_id, 0) > now:
+        return BOOST_INTERVAL
+    return INTERVAL if ws_hub.client_count() else IDLE_INTERVAL
+
+
+async def _refresh(integration: dict, entity_id: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            await snapshot_cache.refresh(integration, entity_id)
+            _stats['refreshed'] += 1
+        except snapshot_cache.SnapshotUnavailable as exc:
+            _stats['failed'] += 1
+            logger.debug('camera %s: snapshot prefetch failed: %s', entity_id, exc)
+
+
+async def prefetch_task():
+    """Background loop refreshing due cameras; started on app startup."""
+    global _wake
+    _wake = asyncio.Event()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    while True:
+        # cleared before the round, so a boost arriving during it is kept
+        _wake.clear()
+        sleep_for = INTERVAL
+        try:
+            integration = _integration()
+            if integration is not None:
+                if time.monotonic() - _cameras_loaded_at > CAMERA_LIST_TTL:
+                    await _load_cameras(integration)
+                now = time.monotonic()
+                due = []
+                for camera in _cameras:
+                    entity_id = camera['entity_id']
+                    interval = _interval_for(entity_id, now)
+                    wait = _last_fetch.get(entity_id, 0) + interval - now
+                    if wait <= 0:
+                        due.append(entity_id)
+                        _last_fetch[entity_id] = now
+                        wait = interval
+                    sleep_for = min(sleep_for, wait)
+                for camera_id in [key for key, until in _boosts.items() if until <= now]:
+                    _boosts.pop(camera_id, None)
+                if due:
+                    await asyncio.gather(*(_refresh(integration, entity_id, semaphore) for entity_id in due))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.debug('snapshot prefetch skipped: %s', exc)
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=max(0.5, sleep_for))
+        except asyncio.TimeoutError:
+            pass
+
+
+def get_status() -> dict:
+    """Return diagnostics info for admin UI."""
+    now = time.monotonic()
+    return {
+        'enabled': ENABLED,
+        'cameras': len(_cameras),
+        'boosted': sorted(camera_id for camera_id, until in _boosts.items() if until > now),
+        'interval': INTERVAL,
+        'idle_interval': IDLE_INTERVAL,
+        **_stats,
+    }
@@ -0,0 +1,184 @@
+"""Process-wide Home Assistant entity state store.
+
+The store is seeded with a full ``/api/states`` snapshot by the HA websocket
+task and then kept current by the ``state_changed`` events it receives.  It is
+only considered live while that websocket is connected; readers fall back to
+a direct REST download whenever :func:`get_state_map` returns ``None``.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger("e-face.state_store")
+
+# Maximum age of the last full snapshot before the store is considered stale even
+# while the websocket looks connected. ha_ws resyncs well before this expires.
+STATE_STORE_MAX_AGE = max(0, int(os.environ.get("EFACE_STATE_STORE_MAX_AGE", "1800")))
+
+_lock = threading.Lock()
+_states: Dict[str, Dict[str, Any]] = {}
+_connected = False
+_seeded_at: float | None = None
+_last_event_at: float | None = None
+_source: str | None = None
+_stale_reason: str | None = "not_seeded"
+_generation = 0
+# monotonic time of the last event update / removal per entity since the last seed
+_event_applied: Dict[str, float] = {}
+_event_removed: Dict[str, float] = {}
+
+
+def _is_newer(candidate: dict | None, current: dict | None) -> bool:
+    """Return True unless ``current`` carries a strictly newer last_updated stamp."""
+    if not current:
+        return True
+    new_ts = (candidate or {}).get('last_updated') or (candidate or {}).get('last_changed')
+    cur_ts = current.get('last_updated') or current.get('last_changed')
+    if not isinstance(new_ts, str) or not isinstance(cur_ts, str):
+        return True
+    # HA emits ISO-8601 UTC timestamps with a fixed format, so string order is time order
+    return new_ts >= cur_ts
+
+
+def snapshot_started() -> float:
+    """Mark the start of a snapshot download; pass the result to seed_states."""
+    return time.monotonic()
+
+
+def seed_states(states: list | None, source: str = 'rest', started_at: float | None = None):
+    """Replace the store content with a full snapshot and mark it live.
+
+    Entries already updated by events newer than the snapshot are preserved so
+    events buffered while the snapshot was downloading never regress state.
+    With ``started_at`` (from :func:`snapshot_started`) entities created by
+    events during the download are kept and entities removed during it are
+    not brought back by the snapshot.
+    """
+    global _states, _seeded_at, _source, _stale_reason, _generation
+    fresh: Dict[str, Dict[str, Any]] = {}
+    for item in states or []:
+        if not isinstance(item, dict):
+            continue
+        entity_id = item.get('entity_id')
+        if entity_id:
+            fresh[entity_id] = item
+    with _lock:
+        for entity_id, current in _states.items():
+            if entity_id in fresh:
+                if not _is_newer(fresh[entity_id], current):
+                    fresh[entity_id] = current
+            elif started_at is not None and _event_applied.get(entity_id, -1.0) >= started_at:
+                fresh[entity_id] = current
+        if started_at is not None:
+            for entity_id, removed_at in _event_removed.items():
+                if removed_at >= started_at:
+                    fresh.pop(entity_id, None)
+        _event_applied.clear()
+        _event_removed.clear()
+        _states = fresh
+        _seeded_at = time.time()
+        _source = source
+        _stale_reason = None if _connected else 'disconnected'
+        _generation += 1
+    logger.info("State store seeded from %s with %d entities", source, len(fresh))
+
+
+def apply_state_changed(entity_id: str | None, new_state: dict | None) -> bool:
+    """Apply a single state_changed event. Returns True when the store changed."""
+    global _last_event_at
+    if not entity_id:
+        return False
+    with _lock:
+        _last_event_at = time.time()
+        if new_state is None:
+            _event_removed[entity_id] = time.monotonic()
+            _event_applied.pop(entity_id, None)
+            return _states.pop(entity_id, None) is not None
+        if not isinstance(new_state, dict):
+            return False
+        if not _is_newer(new_state, _states.get(entity_id)):
+            return False
+        _states[entity_id] = new_state
+        _event_applied[entity_id] = time.monotonic()
+        _event_removed.pop(entity_id, None)
+        return True
+
+
+def changed_since(since: float) -> list:
+    """States updated by events at or after ``since`` (a time.monotonic() value)."""
+    with _lock:
+        return [_states[entity_id] for entity_id, applied_at in _event_applied.items() if applied_at >= since and entity_id in _states]
+
+
+def mark_connected():
+    """Record that the HA websocket is up; data stays stale until the next seed."""
+    global _connected, _stale_reason
+    with _lock:
+        _connected = True
+        _stale_reason = 'resyncing'
+
+
+def mark_disconnected(reason: str = 'disconnected'):
+    """Invalidate the store when the websocket drops so no reader trusts old data."""
+    global _connected, _stale_reason
+    with _lock:
+        was_live = _connected and _stale_reason is None
+        _connected = False
+        _stale_reason = reason
+    if was_live:
+        logger.info("State store marked stale: %s", reason)
+
+
+def is_live() -> bool:
+    with _lock:
+        return _is_live_locked()
+
+
+def _is_live_locked() -> bool:
+    if not _connected or _stale_reason is not None or _seeded_at is None:
+        return False
+    if STATE_STORE_MAX_AGE and (time.time() - _seeded_at) > STATE_STORE_MAX_AGE:
+        return False
+    return True
+
+
+def get_state_map() -> Dict[str, Dict[str, Any]] | None:
+    """Return a shallow copy of the live state map, or None when the store is stale.
+
+    State objects are replaced rather than mutated on update, so callers may
+    share them but must not modify them.
+    """
+    with _lock:
+        if not _is_live_locked():
+            return None
+        return dict(_states)
+
+
+def get_state(entity_id: str) -> Dict[str, Any] | None:
+    with _lock:
+        if not _is_live_locked():
+            return None
+        return _states.get(entity_id)
+
+
+def get_generation() -> int:
+    """Counter bumped on every full seed; lets derived caches detect resyncs."""
+    return _generation
+
+
+def get_status() -> Dict[str, Any]:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        return {
+            'live': _is_live_locked(),
+            'connected': _connected,
+            'entities': len(_states),
+            'seeded_at': _seeded_at,
+            'last_event_at': _last_event_at,
+            'source': _source,
+            'stale_reason': _stale_reason,
+            'generation': _generation,
+        }
@@ -0,0 +1,117 @@
+"""Cached Home Assistant weather forecasts.
+
+Forecasts are fetched from ``/api/weather/forecast`` in the background, the
+hourly and daily variants concurrently, and cached per (entity, type).  The
+rooms payload only ever reads this cache, so a slow weather integration can
+no longer hold up ``GET /api/rooms``.  Entries are refreshed when they are
+older than ``FORECAST_TTL`` or when the weather entity changes state.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger("e-face.weather_cache")
+
+FORECAST_TYPES = ('hourly', 'daily')
+# Age after which a cached forecast is refreshed on the next read.
+FORECAST_TTL = max(30, int(os.environ.get("EFACE_WEATHER_FORECAST_TTL", "900")))
+# Minimum delay between two fetches of the same forecast, also after failures,
+# so chatty weather entities or a failing endpoint are not hammered.
+FORECAST_MIN_INTERVAL = max(5, int(os.environ.get("EFACE_WEATHER_FORECAST_MIN_INTERVAL", "60")))
+
+_lock = threading.Lock()
+_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_inflight: set = set()
+_executor = ThreadPoolExecutor(max_workers=len(FORECAST_TYPES) * 2, thread_name_prefix="e-face-weather")
+
+
+def request_refresh(host: str | None, token: str | None, entity_id: str | None, force: bool = False):
+    """Schedule a background fetch of the forecasts of entity_id when due.
+
+    Without ``force`` only missing or expired entries are fetched; ``force``
+    (used on state_changed) refetches anything older than the minimum interval.
+    Never blocks on Home Assistant.
+    """
+    if not host or not token or not entity_id:
+        return
+    now = time.time()
+    with _lock:
+        for forecast_type in FORECAST_TYPES:
+            key = (entity_id, forecast_type)
+            if key in _inflight:
+                continue
+            entry = _cache.get(key)
+            if entry:
+                if now - entry['attempted_at'] < FORECAST_MIN_INTERVAL:
+                    continue
+                if not force and entry['data'] is not None and now - entry['fetched_at'] < FORECAST_TTL:
+                    continue
+            _inflight.add(key)
+            _executor.submit(_refresh_one, host, token, entity_id, forecast_type)
+
+
+def _refresh_one(host: str, token: str, entity_id: str, forecast_type: str):
+    from .core import _fetch_weather_forecast
+    key = (entity_id, forecast_type)
+    data = None
+    try:
+        data = _fetch_weather_forecast(host, token, entity_id, forecast_type)
+    except Exception:
+        logger.exception("Weather forecast refresh failed for %s (%s)", entity_id, forecast_type)
+    now = time.time()
+    changed = False
+    with _lock:
+        _inflight.discard(key)
+        entry = _cache.setdefault(key, {'data': None, 'fetched_at': 0.0, 'attempted_at': 0.0})
+        entry['attempted_at'] = now
+        if data:
+            changed = data != entry['data']
+            entry['data'] = data
+            entry['fetched_at'] = now
+    if changed:
+        from . import room_model
+        room_model.refresh_weather(entity_id)
+
+
+def get_forecast(entity_id: str, forecast_type: str) -> list | None:
+    with _lock:
+        entry = _cache.get((entity_id, forecast_type))
+        return entry['data'] if entry else None
+
+
+def attach_forecasts(snapshot: dict | None) -> dict | None:
+    """Add the cached forecasts to a shaped weather payload (in place)."""
+    if not snapshot or not isinstance(snapshot, dict):
+        return snapshot
+    entity_id = snapshot.get('entity_id') or snapshot.get('id')
+    attrs = snapshot.get('attributes') or {}
+    hourly = get_forecast(entity_id, 'hourly')
+    daily = get_forecast(entity_id, 'daily')
+    if hourly:
+        attrs['forecast_hourly'] = hourly
+    if daily:
+        attrs['forecast_daily'] = daily
+    if not attrs.get('forecast') and hourly:
+        attrs['forecast'] = hourly
+    snapshot['attributes'] = attrs
+    return snapshot
+
+
+def get_status() -> Dict[str, Any]:
+    """Return diagnostics info for admin UI."""
+    with _lock:
+        return {
+            'entries': {
+                f"{entity_id}:{forecast_type}": {
+                    'fetched_at': entry['fetched_at'],
+                    'attempted_at': entry['attempted_at'],
+                    'items': len(entry['data'] or []),
+                }
+                for (entity_id, forecast_type), entry in _cache.items()
+            },
+            'inflight': len(_inflight),
+        }
@@ -0,0 +1,464 @@
+"""Fan-out of backend messages to the frontend ``/ws`` clients.
+
+Every client owns a bounded send queue drained by its own writer task, so a
+slow tablet only delays itself and :func:`broadcast` never waits on network
+I/O.  Each message is JSON-encoded once and the same text is queued for all
+clients.  While a client is behind, a newer update for the same entity
+replaces the one still waiting in its queue; when the queue is full anyway
+the oldest message is dropped, and a client that keeps overflowing or stops
+accepting data is disconnected so it reconnects and reloads.
+
+Clients may send ``{"type": "hello", "accept": [...]}`` to choose which
+topics they receive.  A topic is the message type, optionally refined with a
+``/`` suffix: ``ha_event/state_changed`` is the full HA event behind every
+``ha_entity_update``, ``ha_event/entities`` carries the compressed
+subscribe_entities events.  Accepting ``ha_event`` selects both.  Clients
+that never say hello receive every topic, as before.
+
+Entity messages can additionally be narrowed with ``{"type": "subscribe",
+"entity_ids": [...], "rooms": [...], "domains": [...]}`` and the matching
+``unsubscribe``.  From its first subscribe a client only receives entity
+messages matching one of its subscriptions; ``{"type": "subscribe", "all":
+true}`` restores the default of receiving every entity.  Routing goes
+through inverted indexes from entity, domain and room to clients; rooms are
+resolved with :func:`room_model.rooms_for_entity`.
+
+A hello with ``"format": "compact"`` switches ``ha_entity_update`` to
+``ha_entity_delta`` messages: ``e`` entity id, ``s`` state, ``lc``
+last_changed, ``+`` attributes changed since the previous message sent to
+this client and ``-`` attributes removed.  Keyframes (``k``) carry every
+attribute in ``a``; one is sent for the first message of an entity and
+periodically after that.  ``v`` increases by one per delta sent to the
+client and also for every entity update dropped from a full queue, so a gap
+means updates were lost; the client then sends ``{"type": "resync"}`` and
+reloads its rooms, after which every entity starts over with a keyframe and
+the first delta sets the new baseline version.  Coalesced updates are not
+gaps: the newer update replaces the queued one.  Deltas are computed when the
+message is actually sent, so the client never diffs against a state it did
+not receive.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+from fastapi import WebSocket
+
+from . import fast_json, room_model
+
+logger = logging.getLogger("e-face.ws_hub")
+
+# Maximum number of messages waiting for one client.
+CLIENT_QUEUE_MAX = max(8, int(os.environ.get("EFACE_WS_CLIENT_QUEUE", "256")))
+# Seconds a single send may take before the client is considered dead.
+CLIENT_SEND_TIMEOUT = max(1.0, float(os.environ.get("EFACE_WS_SEND_TIMEOUT", "10")))
+# Compact format: seconds and number of deltas after which an entity gets a new keyframe.
+COMPACT_KEYFRAME_INTERVAL = max(10.0, float(os.environ.get("EFACE_WS_KEYFRAME_INTERVAL", "300")))
+COMPACT_KEYFRAME_EVERY = 100
+
+_seq = itertools.count()
+
+
+class _Client:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        # encoded text, or a raw ha_entity_update for compact clients
+        self.pending: "OrderedDict[Any, str | dict]" = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.dropped_since_send = 0
+        self.task: asyncio.Task | None = None
+        self.accept: set[str] | None = None
+        # entity subscriptions; unfiltered clients receive every entity
+        self.filtered = False
+        self.entities: set[str] = set()
+        self.domains: set[str] = set()
+        self.rooms: set[str] = set()
+        # compact format: per entity (attributes last sent, deltas since keyframe, keyframe time)
+        self.compact = False
+        self.version = 0
+        self.last_attrs: Dict[str, tuple] = {}
+
+    def accepts(self, topic: str) -> bool:
+        if self.accept is None:
+            return True
+        return topic in self.accept or topic.split('/', 1)[0] in self.accept
+
+    def enqueue(self, key, item: str | dict) -> bool:
+        """Queue an item; returns False when the client should be disconnected."""
+        if key is not None and key in self.pending:
+            # latest update wins, keeping the position of the queued one
+            self.pending[key] = item
+            self.coalesced += 1
+            return True
+        if len(self.pending) >= CLIENT_QUEUE_MAX:
+            _key, dropped = self.pending.popitem(last=False)
+            if isinstance(dropped, dict):
+                # a lost delta still takes a version, so the client sees the gap
+                self.version += 1
+            self.dropped += 1
+            self.dropped_since_send += 1
+            if self.dropped_since_send >= CLIENT_QUEUE_MAX:
+                return False
+        self.pending[key if key is not None else ('seq', next(_seq))] = item
+        self.wakeup.set()
+        return True
+
+    def compact_text(self, message: dict) -> str:
+        """Encode an ha_entity_update as a delta against what this client last received."""
+        entity_id = message.get('entity_id')
+        attrs = message.get('attributes') or {}
+        now = time.monotonic()
+        self.version += 1
+        out = {'type': 'ha_entity_delta', 'v': self.version, 'e': entity_id, 's': message.get('state'), 'lc': message.get('last_changed')}
+        previous = self.last_attrs.get(entity_id)
+        if previous is None or previous[1] >= COMPACT_KEYFRAME_EVERY or now - previous[2] >= COMPACT_KEYFRAME_INTERVAL:
+            out['k'] = 1
+            out['a'] = attrs
+            self.last_attrs[entity_id] = (attrs, 0, now)
+        else:
+            last, count, keyframe_at = previous
+            changed = {k: v for k, v in attrs.items() if k not in last or last[k] != v}
+            removed = [k for k in last if k not in attrs]
+            if changed:
+                out['+'] = changed
+            if removed:
+                out['-'] = removed
+            self.last_attrs[entity_id] = (attrs, count + 1, keyframe_at)
+        return _encode(out)
+
+
+_clients: Dict[WebSocket, _Client] = {}
+# inverted subscription indexes: entity id / domain / room id -> clients
+_by_entity: Dict[str, set] = {}
+_by_domain: Dict[str, set] = {}
+_by_room: Dict[str, set] = {}
+_SUBSCRIPTION_FIELDS = (
+    ('entity_ids', 'entities', _by_entity),
+    ('domains', 'domains', _by_domain),
+    ('rooms', 'rooms', _by_room),
+)
+
+
+def _coalesce_key(message: dict):
+    msg_type = message.get('type')
+    if msg_type == 'ha_registry':
+        return ('ha_registry',)
+    if msg_type == 'ha_entity_update' and message.get('entity_id'):
+        return (msg_type, message['entity_id'])
+    if msg_type == 'ha_event':
+        event = message.get('event') or {}
+        data = event.get('data') if isinstance(event, dict) else None
+        entity_id = (data or {}).get('entity_id') if isinstance(data, dict) else None
+        if entity_id and event.get('event_type') == 'state_changed':
+            return (msg_type, entity_id)
+    return None
+
+
+def _message_entities(message: dict):
+    """Return (entity_id, None) or (None, entity ids of a compressed event) or (None, None)."""
+    msg_type = message.get('type')
+    if msg_type == 'ha_entity_update':
+        return message.get('entity_id'), None
+    if msg_type != 'ha_event':
+        return None, None
+    event = message.get('event')
+    if not isinstance(event, dict):
+        return None, None
+    data = event.get('data')
+    if isinstance(data, dict) and data.get('entity_id'):
+        return data['entity_id'], None
+    entity_ids = set()
+    for key in ('a', 'c'):
+        if isinstance(event.get(key), dict):
+            entity_ids.update(event[key].keys())
+    if isinstance(event.get('r'), list):
+        entity_ids.update(e for e in event['r'] if isinstance(e, str))
+    return None, (frozenset(entity_ids) if entity_ids else None)
+
+
+def _routed_clients(entity_id: str) -> set:
+    """Filtered clients subscribed to entity_id directly, by domain or by room."""
+    routed = set(_by_entity.get(entity_id, ()))
+    if '.' in entity_id:
+        routed.update(_by_domain.get(entity_id.split('.', 1)[0], ()))
+    if _by_room:
+        for room_id in room_model.rooms_for_entity(entity_id):
+            routed.update(_by_room.get(room_id, ()))
+    return routed
+
+
+def _filter_entity_map(event: dict, allowed: frozenset) -> dict:
+    filtered = dict(event)
+    for key in ('a', 'c'):
+        if isinstance(event.get(key), dict):
+            subset = {k: v for k, v in event[key].items() if k in allowed}
+            if subset:
+                filtered[key] = subset
+            else:
+                filtered.pop(key)
+    if isinstance(event.get('r'), list):
+        removed = [e for e in event['r'] if e in allowed]
+        if removed:
+            filtered['r'] = removed
+        else:
+            filtered.pop('r')
+    return filtered
+
+
+def _clear_subscriptions(client: _Client):
+    for _, attr, index in _SUBSCRIPTION_FIELDS:
+        values = getattr(client, attr)
+        for value in values:
+            members = index.get(value)
+            if members is not None:
+                members.discard(client)
+                if not members:
+                    del index[value]
+        values.clear()
+
+
+def _string_list(value) -> list[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, str) and item]
+
+
+def _subscribe(client: _Client, message: dict):
+    if message.get('all'):
+        _clear_subscriptions(client)
+        client.filtered = False
+        return
+    client.filtered = True
+    for field, attr, index in _SUBSCRIPTION_FIELDS:
+        for value in _string_list(message.get(field)):
+            getattr(client, attr).add(value)
+            index.setdefault(value, set()).add(client)
+
+
+def _unsubscribe(client: _Client, message: dict):
+    # unfiltered clients have nothing to remove; they first need a subscribe
+    if not client.filtered:
+        return
+    if message.get('all'):
+        _clear_subscriptions(client)
+        return
+    for field, attr, index in _SUBSCRIPTION_FIELDS:
+        for value in _string_list(message.get(field)):
+            getattr(client, attr).discard(value)
+            members = index.get(value)
+            if members is not None:
+                members.discard(client)
+                if not members:
+                    del index[value]
+
+
+def _subscription_ack(client: _Client) -> dict:
+    return {
+        'type': 'subscriptions',
+        'all': not client.filtered,
+        'entity_ids': sorted(client.entities),
+        'domains': sorted(client.domains),
+        'rooms': sorted(client.rooms),
+    }
+
+
+def register(websocket: WebSocket) -> _Client:
+    """Start delivering broadcasts to an accepted websocket."""
+    client = _Client(websocket)
+    _clients[websocket] = client
+    client.task = asyncio.create_task(_writer(client))
+    return client
+
+
+async def unregister(websocket: WebSocket):
+    """Stop delivering to websocket and wait for its writer task to finish."""
+    client = _clients.pop(websocket, None)
+    if client is None:
+        return
+    _clear_subscriptions(client)
+    client.closed = True
+    client.wakeup.set()
+    if client.task and client.task is not asyncio.current_task():
+        client.task.cancel()
+        try:
+            await client.task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+def _disconnect(client: _Client, reason: str):
+    if client.closed:
+        return
+    client.closed = True
+    _clients.pop(client.websocket, None)
+    _clear_subscriptions(client)
+    client.wakeup.set()
+    logger.info("Disconnecting frontend websocket: %s (sent=%d dropped=%d)", reason, client.sent, client.dropped)
+
+    async def _close():
+        try:
+            await asyncio.wait_for(client.websocket.close(code=1013), timeout=CLIENT_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    asyncio.create_task(_close())
+
+
+async def _writer(client: _Client):
+    websocket = client.websocket
+    try:
+        while not client.closed:
+            if not client.pending:
+                client.wakeup.clear()
+                await client.wakeup.wait()
+                continue
+            _, item = client.pending.popitem(last=False)
+            text = item if isinstance(item, str) else client.compact_text(item)
+            try:
+                await asyncio.wait_for(websocket.send_text(text), timeout=CLIENT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                _disconnect(client, 'send timeout')
+                return
+            except Exception:
+                _disconnect(client, 'send failed')
+                return
+            client.sent += 1
+            client.dropped_since_send = 0
+    except asyncio.CancelledError:
+        pass
+
+
+def _encode(message: dict) -> str:
+    # same JSON as starlette's send_json
+    return fast_json.dumps_str(message)
+
+
+def publish(message: dict, topic: str | None = None):
+    """Encode message once and queue it for every client accepting its topic.
+
+    The topic defaults to the message type. Nothing is encoded when no client
+    wants the message. Must be called from the event loop thread; never
+    waits on a client.
+    """
+    topic = topic or message.get('type') or ''
+    recipients = [client for client in _clients.values() if client.accepts(topic)]
+    if not recipients:
+        return
+    if any(client.filtered for client in recipients):
+        entity_id, entity_ids = _message_entities(message)
+        if entity_id:
+            routed = _routed_clients(entity_id)
+            recipients = [client for client in recipients if not client.filtered or client in routed]
+        elif entity_ids:
+            _publish_entity_map(message, entity_ids, recipients)
+            return
+    if recipients:
+        _deliver(recipients, _coalesce_key(message), message)
+
+
+def _publish_entity_map(message: dict, entity_ids: frozenset, recipients: list):
+    """Send each client the part of a compressed event it is subscribed to."""
+    routed = {entity_id: _routed_clients(entity_id) for entity_id in entity_ids}
+    groups: Dict[frozenset, list] = {}
+    for client in recipients:
+        if client.filtered:
+            allowed = frozenset(e for e in entity_ids if client in routed[e])
+        else:
+            allowed = entity_ids
+        if allowed:
+            groups.setdefault(allowed, []).append(client)
+    # clients with the same subset share one encoding
+    for allowed, clients in groups.items():
+        if allowed == entity_ids:
+            _deliver(clients, None, message)
+        else:
+            _deliver(clients, None, {**message, 'event': _filter_entity_map(message['event'], allowed)})
+
+
+def _deliver(recipients: list, key, message: dict):
+    # compact clients get the raw update; everybody else shares one encoding
+    compactable = message.get('type') == 'ha_entity_update'
+    text = None
+    for client in recipients:
+        if compactable and client.compact:
+            item = message
+        else:
+            if text is None:
+                text = _encode(message)
+            item = text
+        if not client.enqueue(key, item):
+            _disconnect(client, 'send queue overflow')
+
+
+async def broadcast(message: dict, topic: str | None = None):
+    """Send a JSON message to all connected frontend websockets."""
+    publish(message, topic)
+
+
+def handle_message(websocket: WebSocket, raw: str):
+    """Handle a control message sent by a frontend client."""
+    client = _clients.get(websocket)
+    if client is None:
+        return
+    try:
+        message = fast_json.loads(raw)
+    except ValueError:
+        return
+    if not isinstance(message, dict):
+        return
+    msg_type = message.get('type')
+    if msg_type == 'hello':
+        accept = message.get('accept')
+        if isinstance(accept, list):
+            client.accept = {topic for topic in accept if isinstance(topic, str) and topic}
+        else:
+            client.accept = None
+        client.compact = message.get('format') == 'compact'
+        client.last_attrs.clear()
+        ack = {
+            'type': 'hello_ack',
+            'accept': sorted(client.accept) if client.accept is not None else None,
+            'format': 'compact' if client.compact else 'full',
+        }
+    elif msg_type == 'subscribe':
+        _subscribe(client, message)
+        ack = _subscription_ack(client)
+    elif msg_type == 'unsubscribe':
+        _unsubscribe(client, message)
+        ack = _subscription_ack(client)
+    elif msg_type == 'resync':
+        # next delta of every entity becomes a keyframe
+        client.last_attrs.clear()
+        ack = {'type': 'resync_ack'}
+    else:
+        return
+    _deliver([client], None, ack)
+
+
+def client_count() -> int:
+    return len(_clients)
+
+
+def get_status() -> Dict[str, Any]:
+    """Return diagnostics info for admin UI."""
+    return {
+        'clients': len(_clients),
+        'filtered_clients': sum(1 for c in _clients.values() if c.filtered),
+        'compact_clients': sum(1 for c in _clients.values() if c.compact),
+        'subscriptions': {'entities': len(_by_entity), 'domains': len(_by_domain), 'rooms': len(_by_room)},
+        'queue_max': CLIENT_QUEUE_MAX,
+        'queued': sum(len(c.pending) for c in _clients.values()),
+        'sent': sum(c.sent for c in _clients.values()),
+        'coalesced': sum(c.coalesced for c in _clients.values()),
+        'dropped': sum(c.dropped for c in _clients.values()),
+    }
@@ -23,6 +23,23 @@ self.addEventListener('fetch', (event) => {
   const requestUrl = new URL(request.url)
   if (requestUrl.origin !== self.location.origin) return
 
+  // API data must be current: always ask the server, which answers 304 when the
+  // HTTP cache already holds the same ETag. The cached copy is only an offline fallback.
+  if (requestUrl.pathname.startsWith('/api/')) {
+    event.respondWith(
+      fetch(request, { cache: 'no-cache' })
+        .then((response) => {
+          if (response && response.status === 200 && response.type === 'basic') {
+            const responseClone = response.clone()
+            caches.open(CACHE_NAME).then((cache) => cache.put(request, responseClone))
+          }
+          return response
+        })
+        .catch(() => caches.match(request).then((cached) => cached || Response.error()))
+    )
+    return
+  }
+
   event.respondWith(
     caches.match(request).then((cached) => {
       const networkFetch = fetch(request)
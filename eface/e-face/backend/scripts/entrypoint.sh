@@ -41,7 +41,7 @@ export E_FACE_TLS_EMAIL="${HTTPS_EMAIL:-}"
 
 python3 /app/backend/scripts/render_caddyfile.py
 
-uvicorn app.main:app --host "$APP_HOST" --port "$APP_PORT" &
+uvicorn app.main:app --host "$APP_HOST" --port "$APP_PORT" --ws-per-message-deflate "${EFACE_WS_DEFLATE:-true}" &
 UVICORN_PID=$!
 
 caddy run --config /app/backend/runtime/Caddyfile --watch &
@@ -0,0 +1,122 @@
+"""Simulate many wall panels against a running e-face backend.
+
+Every panel keeps a /ws connection open and polls GET /api/rooms; with
+--toggle it also toggles a light now and then.  A separate probe measures
+GET /api/config meanwhile, which must stay fast even when Home Assistant is
+slow (it does no HA I/O).  Prints latency percentiles per endpoint.
+
+    python scripts/load_test.py --base http://127.0.0.1:9000 --token <jwt> --panels 200 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import websockets
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.ws_messages = 0
+        self.ws_failures = 0
+
+    def record(self, name, started, ok):
+        bucket = self.latencies.setdefault(name, [])
+        bucket.append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed):
+        print(f"[e-face] load test finished after {elapsed:.1f}s")
+        for name, values in sorted(self.latencies.items()):
+            print(
+                f"  {name:<14} n={len(values):<6} err={self.errors.get(name, 0):<5} "
+                f"p50={_percentile(values, 50):8.1f}ms p95={_percentile(values, 95):8.1f}ms "
+                f"p99={_percentile(values, 99):8.1f}ms max={max(values):8.1f}ms "
+                f"rps={len(values) / elapsed:7.1f}"
+            )
+        print(f"  ws messages={self.ws_messages} ws failures={self.ws_failures}")
+
+
+async def _timed(stats, name, coro):
+    started = time.perf_counter()
+    try:
+        resp = await coro
+        stats.record(name, started, resp.status_code < 400)
+    except Exception:
+        stats.record(name, started, False)
+
+
+async def _panel_ws(args, stats, stop):
+    url = args.base.replace('http://', 'ws://').replace('https://', 'wss://').rstrip('/') + '/ws'
+    try:
+        async with websockets.connect(url, ping_interval=None, close_timeout=1) as ws:
+            await ws.send(json.dumps({'type': 'hello', 'accept': ['ha_entity_update', 'ha_event/entities']}))
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=1)
+                    stats.ws_messages += 1
+                except asyncio.TimeoutError:
+                    continue
+    except Exception:
+        stats.ws_failures += 1
+
+
+async def _panel(client, args, stats, stop, index):
+    ws_task = asyncio.create_task(_panel_ws(args, stats, stop))
+    # spread the panels so they do not poll in lockstep
+    await asyncio.sleep(args.interval * index / max(1, args.panels))
+    polls = 0
+    while not stop.is_set():
+        await _timed(stats, 'GET rooms', client.get('/api/rooms'))
+        polls += 1
+        if args.toggle and polls % args.toggle_every == 0:
+            await _timed(stats, 'POST toggle', client.post(f'/api/devices/{args.toggle}/toggle'))
+        await asyncio.sleep(args.interval)
+    await ws_task
+
+
+async def _probe(client, stats, stop):
+    while not stop.is_set():
+        await _timed(stats, 'GET config', client.get('/api/config'))
+        await asyncio.sleep(0.25)
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.panels + 10, max_keepalive_connections=args.panels + 10)
+    headers = {'Authorization': f'Bearer {args.token}'}
+    stats = Stats()
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=args.base, headers=headers, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(_panel(client, args, stats, stop, i)) for i in range(args.panels)]
+        tasks.append(asyncio.create_task(_probe(client, stats, stop)))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    stats.report(time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base', default=os.environ.get('EFACE_BASE_URL', 'http://127.0.0.1:9000'))
+    parser.add_argument('--token', default=os.environ.get('EFACE_API_TOKEN', 'devtoken123'))
+    parser.add_argument('--panels', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between two room polls of a panel')
+    parser.add_argument('--toggle', help='light entity id to toggle during the run')
+    parser.add_argument('--toggle-every', type=int, default=10, help='toggle after this many polls')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,149 @@
+"""Benchmark the HLS segment proxy: throughput and memory per concurrent viewer.
+
+Runs the backend in-process against a local fake upstream that serves one
+MPEG-TS segment, then lets N viewers fetch that segment through
+/api/devices/cameras/streams/... at the same time, once with the segment
+cache and once streaming straight from upstream.  Two rounds per mode:
+
+  full   every viewer downloads the whole segment; reports wall time,
+         upstream requests and the peak of Python allocations per viewer
+  held   every viewer sends the request and then stops reading; reports
+         the memory the server keeps per stalled viewer
+
+Memory is measured with tracemalloc and covers the whole process (the fake
+viewers discard data as it arrives and allocate next to nothing).
+
+    cd backend && python scripts/segment_bench.py --viewers 1 10 50 --segment-kb 1024
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import uvicorn  # noqa: E402
+
+from app import hls_cache  # noqa: E402
+from app.main import app  # noqa: E402
+from app.routers import devices  # noqa: E402
+
+
+class _Upstream:
+    def __init__(self, size):
+        self.body = os.urandom(size)
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                self.requests += 1
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: video/mp2t\r\n'
+                    + f'Content-Length: {len(self.body)}\r\n\r\n'.encode('ascii')
+                )
+                writer.write(self.body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # CancelledError: still waiting for a request when the server shuts down
+            pass
+        finally:
+            writer.close()
+
+
+class _Viewer(asyncio.Protocol):
+    """Minimal HTTP client that counts and drops the response bytes."""
+
+    def __init__(self, expected, paused):
+        self.expected = expected
+        self.paused = paused
+        self.received = 0
+        self.done = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.paused:
+            transport.pause_reading()
+
+    def data_received(self, data):
+        self.received += len(data)
+        if self.received >= self.expected and not self.done.done():
+            self.done.set_result(None)
+
+    def connection_lost(self, exc):
+        if not self.done.done():
+            self.done.set_result(None)
+
+
+async def _open_viewer(port, path, expected, paused):
+    loop = asyncio.get_running_loop()
+    transport, viewer = await loop.create_connection(lambda: _Viewer(expected, paused), '127.0.0.1', port)
+    transport.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode('ascii'))
+    return transport, viewer
+
+
+async def _round(port, path, viewers, expected, paused):
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    opened = await asyncio.gather(*(_open_viewer(port, path, expected, paused) for _ in range(viewers)))
+    if paused:
+        await asyncio.sleep(0.5)
+        held = tracemalloc.get_traced_memory()[0] - before
+        for transport, _viewer in opened:
+            transport.close()
+        return {'held_kb': held / 1024 / viewers}
+    await asyncio.gather(*(viewer.done for _transport, viewer in opened))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - before
+    for transport, _viewer in opened:
+        transport.close()
+    return {'elapsed_ms': elapsed * 1000, 'peak_kb': peak / 1024 / viewers}
+
+
+async def main(args):
+    upstream = _Upstream(args.segment_kb * 1024)
+    upstream_server = await asyncio.start_server(upstream.handle, '127.0.0.1', 0)
+    upstream_port = upstream_server.sockets[0].getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=args.port, log_level='warning', lifespan='off'))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    tracemalloc.start()
+    print(f"[e-face] segment bench: {args.segment_kb} KB segment")
+    for mode in ('cache', 'passthrough'):
+        hls_cache.SEGMENTS_ENABLED = mode == 'cache'
+        for viewers in args.viewers:
+            hls_cache.clear()
+            session_id, _expires, _resource = devices._register_stream_session(
+                f'http://127.0.0.1:{upstream_port}/api/hls/bench/master_playlist.m3u8', 'camera.bench', 'bench-token'
+            )
+            path = f'/api/devices/cameras/streams/{session_id}/segment/0.ts'
+            requests_before = upstream.requests
+            full = await _round(args.port, path, viewers, len(upstream.body), paused=False)
+            fetched = upstream.requests - requests_before
+            held = await _round(args.port, path, viewers, len(upstream.body), paused=True)
+            print(
+                f"  {mode:<11} viewers={viewers:<4} upstream={fetched:<4} "
+                f"time={full['elapsed_ms']:8.1f}ms peak/viewer={full['peak_kb']:8.1f}KB "
+                f"held/viewer={held['held_kb']:8.1f}KB"
+            )
+    tracemalloc.stop()
+
+    server.should_exit = True
+    await serve_task
+    upstream_server.close()
+    await upstream_server.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--segment-kb', type=int, default=1024)
+    parser.add_argument('--port', type=int, default=9931)
+    asyncio.run(main(parser.parse_args()))
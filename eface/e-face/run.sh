@@ -2,4 +2,5 @@
 # Simple run script for addon/container: start FastAPI via Uvicorn
 set -e
 echo "Starting e-face API..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# permessage-deflate for /ws; set EFACE_WS_DEFLATE=false to save CPU with many panels
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --ws-per-message-deflate "${EFACE_WS_DEFLATE:-true}"